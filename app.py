@@ -1,8 +1,8 @@
-import os
-import re
-import pandas as pd
 import streamlit as st
 
+from utils.datasets import get_dataset, load_all, specs
+from utils.outofcore import enabled, iter_webscraper, stream_totals
+
 st.set_page_config(
     page_title="CoinAfrique Scraper",
     page_icon="🛒",
@@ -112,30 +112,16 @@ with st.sidebar:
 
 # ── Page d'accueil ──
 def home():
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    DATA_DIR = os.path.join(BASE_DIR, "data")
-
-    FILES = {
-        "vetements-homme":    ("vetement_hommes.csv",       ";"),
-        "chaussures-homme":   ("chaussures_hommes_ws.csv",  ","),
-        "vetements-enfants":  ("vetement_enfants.csv",      ";"),
-        "chaussures-enfants": ("chaussures_enfants_ws.csv", ","),
-    }
-
-    @st.cache_data
     def get_stats():
-        total, prix_vals = 0, []
-        for _, (filename, sep) in FILES.items():
-            path = os.path.join(DATA_DIR, filename)
-            df = pd.read_csv(path, sep=sep, encoding="utf-8", on_bad_lines="skip")
-            total += len(df)
-            prix_col = "Prix" if "Prix" in df.columns else ("prix" if "prix" in df.columns else None)
-            if prix_col:
-                for p in df[prix_col].dropna():
-                    cleaned = re.sub(r"[^\d]", "", str(p))
-                    if cleaned:
-                        prix_vals.append(int(cleaned))
-        return total, len(FILES), int(sum(prix_vals) / len(prix_vals)) if prix_vals else 0
+        nb_categories = len({spec.categorie for spec in specs().values()})
+        if enabled(avec_base=False):
+            # Données plus grosses que le budget mémoire : totaux calculés par blocs
+            t = get_dataset("totals:webscraper", lambda: stream_totals(iter_webscraper()))
+            prix_moyen = t["prix_sum"] // t["prix_count"] if t["prix_count"] else 0
+            return t["total"], nb_categories, prix_moyen
+        df = load_all()
+        prix = df["prix_num"].dropna()
+        return len(df), nb_categories, int(prix.mean()) if len(prix) else 0
 
     total_annonces, nb_categories, prix_moyen = get_stats()
 
@@ -177,5 +163,6 @@ pg = st.navigation([
     st.Page("pages/2_Telechargement.py", title="Téléchargement", icon="⬇️"),
     st.Page("pages/3_Dashboard.py",      title="Dashboard",      icon="📊"),
     st.Page("pages/4_Evaluation.py",     title="Évaluation",     icon="📝"),
+    st.Page("pages/5_Diagnostics.py",    title="Diagnostics",    icon="🩺"),
 ])
 pg.run()
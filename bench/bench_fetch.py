@@ -0,0 +1,56 @@
+"""
+Benchmark du téléchargement des pages : séquentiel vs concurrent.
+
+    python -m bench.bench_fetch --pages 20 --latency 0.2
+
+Affiche une ligne JSON par scénario (durée, pages/s, lignes).
+"""
+import argparse
+import json
+import time
+
+from bench.stub_server import StubServer
+from utils.scraper import scrape_categorie
+
+
+def run(label: str, base_url: str, slug: str, pages: int, workers: int, rate: float) -> dict:
+    start = time.perf_counter()
+    df, stats = scrape_categorie(slug, nb_pages=pages, workers=workers, rate=rate,
+                                 base_url=base_url, return_stats=True)
+    elapsed = time.perf_counter() - start
+    return {
+        "scenario": label,
+        "workers": workers,
+        "rate": rate,
+        "pages": pages,
+        "rows": len(df),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 2),
+        "retries": stats["retries"],
+        "bytes": stats["bytes"],
+        "latency_p50": stats["latency_p50"],
+        "latency_p95": stats["latency_p95"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--slug", default="vetements-homme")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=8.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with StubServer(latency=args.latency, error_rate=args.error_rate) as server:
+        scenarios = [
+            ("sequentiel", 1, 1.0),
+            ("concurrent", args.workers, args.rate),
+        ]
+        for label, workers, rate in scenarios:
+            print(json.dumps(run(label, server.base_url, args.slug, args.pages, workers, rate)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark des filtres du dashboard sur un jeu agrandi.
+
+    python -m bench.bench_filter [--rows 1000000] [--repeat 50]
+
+Réplique les données Web Scraper jusqu'à `--rows` lignes, puis compare le
+filtre pandas d'origine (isin & between) à FilterIndex, avec des fourchettes
+de prix aléatoires (index froid) puis rejouées (LRU). Une ligne JSON par
+méthode ; les positions renvoyées sont vérifiées identiques.
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.aggregates import usable
+from utils.datasets import load_all
+from utils.filters import CACHE_SIZE, FilterIndex
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    base = usable(load_all())
+    reps = -(-rows // len(base))
+    return pd.concat([base] * reps, ignore_index=True).iloc[:rows]
+
+
+def queries(df: pd.DataFrame, repeat: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    cats = list(df["categorie"].unique())
+    prix = df["prix_num"].quantile([0.05, 0.5, 0.95]).astype(int).tolist()
+    return [
+        (rng.sample(cats, rng.randint(1, len(cats))),
+         rng.randint(0, prix[1]), rng.randint(prix[1], prix[2]))
+        for _ in range(repeat)
+    ]
+
+
+def timed(fn, qs) -> tuple[float, list]:
+    start = time.perf_counter()
+    out = [fn(*q) for q in qs]
+    return (time.perf_counter() - start) / len(qs), out
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--repeat", type=int, default=50)
+    args = p.parse_args(argv)
+
+    df = make_frame(args.rows)
+    qs = queries(df, args.repeat)
+
+    def pandas_filter(cats, lo, hi):
+        mask = df["categorie"].isin(cats) & df["prix_num"].between(lo, hi)
+        return np.flatnonzero(mask.to_numpy())
+
+    start = time.perf_counter()
+    index = FilterIndex(df)
+    build = time.perf_counter() - start
+
+    t_pandas, ref = timed(pandas_filter, qs)
+    t_cold, cold = timed(index.select, qs)
+    t_warm, _ = timed(index.select, qs[-CACHE_SIZE:])
+    same = all(np.array_equal(a, b) for a, b in zip(ref, cold))
+
+    runs = (("pandas", t_pandas, len(qs)), ("index", t_cold, len(qs)),
+            ("index_lru", t_warm, len(qs[-CACHE_SIZE:])))
+    for method, seconds, nb in runs:
+        print(json.dumps({
+            "method": method, "rows": len(df), "queries": nb,
+            "ms_per_query": round(seconds * 1000, 3),
+            **({"build_s": round(build, 3), "same_output": same} if method == "index" else {}),
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark de l'historique des prix sur une base agrandie.
+
+    python -m bench.bench_history [--listings 100000] [--releves 20] [--change 0.05]
+
+Sauvegarde `--releves` fois les mêmes `--listings` annonces (une sauvegarde
+par jour simulé, `--change` d'entre elles changent de prix à chaque fois),
+puis mesure les lectures : trajectoires d'annonces, médiane glissante sur
+une semaine et sur tout l'historique. Une ligne JSON par mesure ; la taille
+de l'historique par observation est indiquée sur la ligne des sauvegardes.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import utils.database as database
+from utils.history import history_summary, most_changed, rolling_median, trajectory
+
+VILLES = ("Dakar", "Thies", "Saint-Louis", "Mbour", "Ziguinchor", "Kaolack")
+CATEGORIES = ("vetements-homme", "chaussures-homme", "vetements-enfants", "chaussures-enfants")
+
+
+def make_listings(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "categorie": rng.choice(CATEGORIES, n),
+        "nom": [f"Article {i}" for i in range(n)],
+        "prix_num": rng.integers(2, 200, n) * 500,
+        "adresse": [f"Quartier {i % 50}, {v}, Senegal" for i, v in enumerate(rng.choice(VILLES, n))],
+        # Identifiant d'image : clé d'annonce stable quel que soit le prix
+        "image_lien": [f"https://images.coinafrique.com/thumb_{i}_uploaded_image1.jpg"
+                       for i in range(n)],
+    })
+
+
+def history_bytes(conn) -> int | None:
+    """Octets de prix_historique et de son index (table virtuelle dbstat, si compilée)."""
+    try:
+        return conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name IN ('prix_historique', "
+            "'idx_prix_historique_releve')"
+        ).fetchone()[0]
+    except Exception:
+        return None
+
+
+def timed(fn, *args) -> tuple[float, object]:
+    start = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - start, out
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--listings", type=int, default=100_000)
+    p.add_argument("--releves", type=int, default=20)
+    p.add_argument("--change", type=float, default=0.05)
+    args = p.parse_args(argv)
+
+    listings = make_listings(args.listings)
+    rng = np.random.default_rng(1)
+    base = time.time()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        conn = database.get_connection(path)
+        database.init_db(conn)
+        saves = []
+        for day in range(args.releves):
+            changed = rng.random(len(listings)) < args.change
+            listings.loc[changed, "prix_num"] += 500
+            batch = listings.assign(prix=listings["prix_num"].astype(str) + " CFA")
+            # Horodatage simulé : une sauvegarde par jour
+            database._last_stamp = base + day * 86400
+            seconds, _ = timed(database.save_scraped_data, batch, conn)
+            saves.append(seconds)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        summary = history_summary(conn)
+        size = history_bytes(conn)
+        print(json.dumps({
+            "method": "save", "observations": summary["observations"],
+            "changements": summary["changements"],
+            "ms_per_save": round(1000 * sum(saves) / len(saves), 1),
+            "history_bytes_per_observation":
+                round(size / summary["observations"], 1) if size else None,
+        }))
+
+        changed = list(most_changed(conn, 1000)[["categorie", "listing_key"]]
+                       .itertuples(index=False, name=None))
+        keys = random.Random(0).sample(changed, min(50, len(changed)))
+        t_traj, _ = timed(lambda: [trajectory(conn, *k) for k in keys])
+        end = base + (args.releves - 1) * 86400
+        t_week, week = timed(rolling_median, conn, "ville", "7D", "1D", end - 7 * 86400, end)
+        t_all, full = timed(rolling_median, conn, "categorie", "7D")
+        for method, seconds, extra in (
+            ("trajectory", t_traj / len(keys), {"listings": len(keys)}),
+            ("rolling_median_week", t_week, {"points": len(week)}),
+            ("rolling_median_all", t_all, {"points": len(full)}),
+        ):
+            print(json.dumps({"method": method, "ms": round(seconds * 1000, 2), **extra}))
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
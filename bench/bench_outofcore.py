@@ -0,0 +1,124 @@
+"""
+Benchmark du mode hors mémoire (utils.outofcore) sur des CSV agrandis.
+
+    python -m bench.bench_outofcore [--rows 1000000] [--unique] [--max-ratio 0.5]
+
+Réplique les CSV Web Scraper jusqu'à `--rows` lignes dans un dossier
+temporaire, puis calcule le cube du dashboard et les totaux de l'accueil :
+par blocs depuis les CSV, en mémoire (load_all, qui écrit le cache Parquet),
+puis par blocs depuis ce Parquet. Chaque mode tourne dans un processus neuf
+(pic RSS propre). Une ligne JSON par mode.
+
+Vérifications (code de sortie 1 en cas d'échec) : cube et totaux identiques
+dans les trois modes, et surcroît de pic RSS hors mémoire inférieur à
+`--max-ratio` fois celui du mode en mémoire.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench.suite import peak_rss_kib
+from utils.datasets import DATA_DIR, specs
+
+MODES = ("hors_memoire_csv", "memoire", "hors_memoire_parquet")
+
+
+def make_data(root: str, rows: int) -> int:
+    """Écrit les CSV répliqués dans `root` ; retourne le nombre de lignes écrites."""
+    sources = {}
+    for spec in specs().values():
+        with open(os.path.join(DATA_DIR, spec.filename), encoding=spec.encoding) as f:
+            header, *lines = f.read().splitlines(keepends=True)
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        sources[spec.filename] = (spec.encoding, header, lines)
+    total = sum(len(lines) for _, _, lines in sources.values())
+    reps = max(1, -(-rows // total))
+    for filename, (encoding, header, lines) in sources.items():
+        with open(os.path.join(root, filename), "w", encoding=encoding) as f:
+            f.write(header)
+            for _ in range(reps):
+                f.writelines(lines)
+    return total * reps
+
+
+def _child(mode: str, root: str, unique: bool) -> dict:
+    import utils.datasets as datasets
+    from utils import outofcore
+    from utils.aggregates import build_cube, usable
+    from utils.export import fingerprint
+
+    # Données agrandies et cache Parquet propres au benchmark
+    datasets.DATA_DIR = os.path.join(root, "data")
+    datasets.CACHE_DIR = os.path.join(root, "cache")
+    base = peak_rss_kib()
+    start = time.perf_counter()
+    if mode == "memoire":
+        df = datasets.load_all()
+        cube = build_cube(usable(datasets.load_all_unique() if unique else df))
+        prix = df["prix_num"].dropna()
+        totals = {"total": len(df), "prix_count": len(prix),
+                  "prix_sum": int(prix.astype("int64").sum())}
+    else:
+        cube = outofcore.stream_cube(outofcore.iter_webscraper(unique))
+        totals = outofcore.stream_totals(outofcore.iter_webscraper())
+    return {
+        "mode": mode, "seconds": round(time.perf_counter() - start, 2),
+        "cube_rows": len(cube), "cube": fingerprint(cube), **totals,
+        "base_rss_kib": base, "peak_rss_kib": peak_rss_kib(),
+    }
+
+
+def run_mode(mode: str, root: str, unique: bool) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(_child, mode, root, unique).result()
+
+
+def check(results: dict[str, dict], max_ratio: float) -> list[str]:
+    """Écarts de résultat entre modes et dépassements du budget de pic RSS."""
+    errors = []
+    ref = results["memoire"]
+    for mode, out in results.items():
+        for key in ("cube", "total", "prix_count", "prix_sum"):
+            if out[key] != ref[key]:
+                errors.append(f"{mode} {key} : {out[key]} au lieu de {ref[key]}")
+    if ref["peak_rss_kib"] is None:
+        return errors  # pas de mesure RSS sur cette plateforme
+    budget = (ref["peak_rss_kib"] - ref["base_rss_kib"]) * max_ratio
+    for mode, out in results.items():
+        growth = out["peak_rss_kib"] - out["base_rss_kib"]
+        if mode != "memoire" and growth > budget:
+            errors.append(f"{mode} pic RSS +{growth} Kio > {budget:.0f} Kio")
+    return errors
+
+
+def main(argv=None) -> None:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--unique", action="store_true", help="écarter les quasi-doublons")
+    p.add_argument("--max-ratio", type=float, default=0.5,
+                   help="surcroît de pic RSS hors mémoire / en mémoire toléré")
+    args = p.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, "data"))
+        rows = make_data(os.path.join(root, "data"), args.rows)
+        results = {}
+        for mode in MODES:
+            results[mode] = run_mode(mode, root, args.unique)
+            print(json.dumps({"rows": rows, **results[mode]}), flush=True)
+
+    errors = check(results, args.max_ratio)
+    for line in errors:
+        print(f"ÉCHEC {line}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark des backends d'extraction sur les pages de bench/fixtures.
+
+    python -m bench.bench_parse [--repeat 20] [--regenerate]
+
+Affiche une ligne JSON par backend : temps moyen par page et pic mémoire
+(tracemalloc) pendant le parsing d'une page. tracemalloc ne voit que les
+allocations Python : l'arbre C de lxml n'y figure pas.
+
+Les fixtures livrées sont générées par le serveur local (render_page) ; des
+pages réelles s'enregistrent avec bench.record. Le champ « corpus » dit ce
+qui a été mesuré. « same_output » n'est qu'un contrôle de cohérence sur ce
+corpus : l'équivalence des backends est testée dans tests/test_scraper.py.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import tracemalloc
+
+from bench.stub_server import CATEGORIES, render_page
+from utils.scraper import PARSERS, extract_annonces
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def regenerate_fixtures(page: int = 1) -> None:
+    """Réécrit une page de fixture générée (render_page) par catégorie, à partir des CSV."""
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for slug in CATEGORIES:
+        path = os.path.join(FIXTURES_DIR, f"{slug}_page{page}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render_page(slug, page))
+
+
+def load_fixtures() -> list[tuple[str, str]]:
+    """Retourne [(slug, html)] pour chaque page de bench/fixtures."""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        slug = os.path.basename(path).rsplit("_page", 1)[0]
+        with open(path, encoding="utf-8") as f:
+            pages.append((slug, f.read()))
+    return pages
+
+
+def corpus() -> str:
+    """« généré » si toutes les fixtures sont celles de render_page, sinon « enregistré »."""
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        slug, _, page = os.path.basename(path)[:-len(".html")].rpartition("_page")
+        with open(path, encoding="utf-8") as f:
+            if f.read() != render_page(slug, int(page)):
+                return "enregistré"
+    return "généré"
+
+
+def bench_backend(parser: str, pages: list[tuple[str, str]], repeat: int) -> dict:
+    start = time.perf_counter()
+    rows = 0
+    for _ in range(repeat):
+        for slug, html in pages:
+            rows += len(extract_annonces(html, slug, parser=parser))
+    per_page = (time.perf_counter() - start) / (repeat * len(pages))
+
+    peak = 0
+    for slug, html in pages:
+        tracemalloc.start()
+        extract_annonces(html, slug, parser=parser)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "parser": parser,
+        "pages": len(pages),
+        "rows_per_page": rows // (repeat * len(pages)),
+        "ms_per_page": round(per_page * 1000, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--regenerate", action="store_true", help="réécrit les fixtures")
+    args = parser.parse_args()
+
+    if args.regenerate or not load_fixtures():
+        regenerate_fixtures()
+    pages = load_fixtures()
+    kind = corpus()
+
+    reference = [extract_annonces(html, slug, parser="html.parser") for slug, html in pages]
+    for backend in PARSERS:
+        output = [extract_annonces(html, slug, parser=backend) for slug, html in pages]
+        result = bench_backend(backend, pages, args.repeat)
+        result["corpus"] = kind
+        result["same_output"] = output == reference
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Enregistre des pages de catégorie du site réel comme fixtures de benchmark.
+
+    python -m bench.record vetements-homme:3 chaussures-homme:2
+
+Chaque page est écrite dans bench/fixtures/<slug>_page<N>.html, le format lu
+par bench_parse et rejoué par StubServer(fixtures=...). Les requêtes passent
+par le limiteur de débit du scraper.
+"""
+import argparse
+import os
+
+from bench.bench_parse import FIXTURES_DIR
+from utils.crawl import parse_spec
+from utils.scraper import BASE_URL, REQUESTS_PER_SECOND, extract_annonces, fetch
+
+
+def record(plan: dict[str, range], base_url: str = BASE_URL,
+           rate: float = REQUESTS_PER_SECOND, out_dir: str = FIXTURES_DIR) -> list[str]:
+    """Télécharge et enregistre les pages du plan ; retourne les chemins écrits."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for slug, pages in plan.items():
+        for page in pages:
+            html = fetch(f"{base_url}{slug}?page={page}", rate=rate).text
+            if not extract_annonces(html, slug):
+                print(f"{slug} page {page} : aucune annonce, page ignorée")
+                continue
+            path = os.path.join(out_dir, f"{slug}_page{page}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(html)
+            written.append(path)
+            print(f"{slug} page {page} -> {os.path.relpath(path)}")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("specs", nargs="+", help="slug[:N|:A-B], comme pour utils.crawl")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND)
+    args = parser.parse_args(argv)
+
+    plan = dict(parse_spec(spec) for spec in args.specs)
+    record(plan, base_url=args.base_url, rate=args.rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Serveur HTTP local imitant les pages de catégorie CoinAfrique.
+
+Les pages sont générées à partir des CSV Web Scraper de `data/` avec le même
+balisage que le site (cartes `div.col.s6.m4.l3`), ce qui permet de mesurer
+le scraper sans toucher au site réel. Avec `fixtures`, les pages d'un dossier
+(bench.record pour des pages réelles) sont rejouées telles quelles quand elles
+existent.
+
+Avec `js_rate`, une partie des pages n'a ses annonces qu'après exécution du
+JS : StubRenderer tient lieu de navigateur headless pour les rendre.
+
+Le serveur sert aussi des images JPEG générées (`/images/<n>.jpg`, voir
+StubServer.image_url) pour le pipeline de miniatures de utils.images.
+"""
+import csv
+import glob
+import hashlib
+import io
+import os
+import random
+import threading
+import time
+
+import requests
+from functools import lru_cache
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from utils.datasets import CAT_LABELS, DATA_DIR, specs
+
+# Catégories servies ; les annonces viennent des CSV de data/ de chaque catégorie
+CATEGORIES = tuple(CAT_LABELS)
+
+PER_PAGE = 84
+
+CARD = """
+<div class="col s6 m4 l3">
+  <div class="card ad__card round">
+    <a class="card-image ad__card-image" href="/annonce/{slug}/{id}" title="{nom}">
+      <img class="ad__card-img" src="{image}" alt="{nom}">
+    </a>
+    <div class="card-content ad__card-content">
+      <p class="ad__card-price">{prix}</p>
+      <p class="ad__card-description"><a href="/annonce/{slug}/{id}">{nom}</a></p>
+      <p class="ad__card-location"><span class="material-icons">location_on</span>
+        <span>{adresse}</span></p>
+    </div>
+  </div>
+</div>"""
+
+# Habillage de la page (menus, filtres, scripts) : le parseur doit le traverser
+SIDEBAR = "".join(
+    f'<li class="collection-item"><a href="/categorie/{slug}-{i}">Sous-catégorie {i}</a>'
+    f'<span class="badge">{i * 37}</span></li>'
+    for i in range(60)
+    for slug in ("mode", "maison")
+)
+SCRIPT = "window.__STATE__ = {%s};" % ",".join(f'"k{i}": "{"x" * 40}"' for i in range(300))
+
+PAGE = """<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>{slug} - CoinAfrique</title>
+<script>{script}</script></head>
+<body><header><nav class="nav-wrapper"><a href="/">CoinAfrique</a></nav></header>
+<main><div class="container"><div class="row">
+<aside class="col l3"><ul class="collection">{sidebar}</ul></aside>
+<div class="col l9"><div class="row adcards">{cards}
+</div></div></div></div></main><footer><p>CoinAfrique Sénégal</p></footer></body></html>"""
+
+# Page « JS seulement » : les cartes sont construites par le script côté client
+JS_SCRIPT = SCRIPT + " document.querySelector('.adcards').innerHTML = window.__CARDS__;"
+
+IMAGE_SIZE = (600, 450)   # dimensions des images générées
+IMAGE_VARIANTS = 50        # images distinctes : n et n + IMAGE_VARIANTS ont la même
+
+# En-tête envoyé par StubRenderer : le serveur répond la page telle qu'après rendu
+RENDER_HEADER = "X-Stub-Render"
+
+
+@lru_cache(maxsize=None)
+def load_rows(slug: str) -> tuple[dict, ...]:
+    """Lit les annonces d'une catégorie dans ses CSV (en-têtes détectés par utils.ingest)."""
+    rows = []
+    for spec in specs().values():
+        if spec.categorie != slug:
+            continue
+        names = {column: header for header, column in spec.columns.items()}
+        with open(os.path.join(DATA_DIR, spec.filename), encoding=spec.encoding, newline="") as f:
+            for raw in csv.DictReader(f, delimiter=spec.sep):
+                rows.append({key: raw.get(names.get(column)) or "" for key, column in (
+                    ("nom", "nom"), ("prix", "prix"), ("adresse", "adresse"),
+                    ("image", "image_lien"))})
+    return tuple(rows)
+
+
+def is_js_only(slug: str, page: int, js_rate: float) -> bool:
+    """Tirage stable par page : une page reste « JS seulement » d'une requête à l'autre."""
+    return js_rate > 0 and random.Random(f"{slug}:{page}").random() < js_rate
+
+
+def render_page(slug: str, page: int, per_page: int = PER_PAGE, js_only: bool = False) -> str:
+    """Construit le HTML de la page `page` ; les annonces bouclent sur le CSV."""
+    if js_only:
+        return PAGE.format(slug=slug, cards="", sidebar=SIDEBAR, script=JS_SCRIPT)
+    rows = load_rows(slug)
+    cards = []
+    for i in range((page - 1) * per_page, page * per_page):
+        row = rows[i % len(rows)]
+        cards.append(CARD.format(
+            slug=slug, id=i,
+            nom=escape(row["nom"]), prix=escape(row["prix"]),
+            adresse=escape(row["adresse"]), image=escape(row["image"]),
+        ))
+    return PAGE.format(slug=slug, cards="".join(cards), sidebar=SIDEBAR, script=SCRIPT)
+
+
+@lru_cache(maxsize=IMAGE_VARIANTS)
+def render_image(n: int) -> bytes:
+    """Image JPEG déterministe (dégradé et rectangles) ; dépend de n % IMAGE_VARIANTS."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(n % IMAGE_VARIANTS)
+    width, height = IMAGE_SIZE
+    img = Image.linear_gradient("L").resize(IMAGE_SIZE).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(6):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.rectangle((x, y, x + rng.randrange(40, 200), y + rng.randrange(40, 200)),
+                       fill=tuple(rng.randrange(256) for _ in range(3)))
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+def load_fixture_pages(directory: str) -> dict[tuple[str, int], bytes]:
+    """Pages d'un dossier de fixtures : {(slug, page): html}."""
+    pages = {}
+    for path in glob.glob(os.path.join(directory, "*_page*.html")):
+        slug, _, page = os.path.basename(path)[:-len(".html")].rpartition("_page")
+        if slug in CATEGORIES and page.isdigit():
+            with open(path, "rb") as f:
+                pages[(slug, int(page))] = f.read()
+    return pages
+
+
+class StubServer:
+    """
+    Serveur de pages de catégorie en thread de fond.
+
+    Usage :
+        with StubServer(latency=0.2, error_rate=0.1) as server:
+            scrape_categorie("vetements-homme", 20, base_url=server.base_url)
+
+    `error_rate` : part des requêtes répondues en 503 (avec Retry-After: 0).
+    `fixtures`   : dossier de pages (<slug>_page<N>.html), servies
+                   à la place des pages générées.
+    `js_rate`    : part des pages dont les annonces ne sont visibles qu'après
+                   rendu (servies complètes aux requêtes de StubRenderer).
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, seed: int = 0,
+                 fixtures: str | None = None, js_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.js_rate = js_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self.recorded = load_fixture_pages(fixtures) if fixtures else {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                parts = urlsplit(self.path)
+                if parts.path.startswith("/images/"):
+                    self.send_image(parts.path[len("/images/"):])
+                    return
+                slug = parts.path.rstrip("/").rsplit("/", 1)[-1]
+                if slug not in CATEGORIES:
+                    self.send_error(404)
+                    return
+                if stub.error_rate and stub._random.random() < stub.error_rate:
+                    self.send_response(503)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                page = int(parse_qs(parts.query).get("page", ["1"])[0])
+                js_only = is_js_only(slug, page, stub.js_rate) and not self.headers.get(RENDER_HEADER)
+                body = stub.recorded.get((slug, page)) or \
+                    render_page(slug, page, js_only=js_only).encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_image(self, name: str):
+                stem, ext = os.path.splitext(name)
+                if ext != ".jpg" or not stem.isdigit():
+                    self.send_error(404)
+                    return
+                if stub.error_rate and stub._random.random() < stub.error_rate:
+                    self.send_response(503)
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = render_image(int(stem))
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/categorie/"
+
+    def image_url(self, n: int) -> str:
+        """URL de l'image générée n ; une URL non numérique répond 404."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/images/{n}.jpg"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class StubRenderer:
+    """
+    Moteur de rendu local pour utils.render.RendererPool (tient lieu de Chromium).
+
+    Le démarrage coûte `startup` secondes, comme le lancement d'un navigateur ;
+    chaque rendu demande la page complète au StubServer.
+    """
+
+    started = 0   # moteurs démarrés (tous confondus), pour les benchmarks
+
+    def __init__(self, startup: float = 0.5):
+        time.sleep(startup)
+        StubRenderer.started += 1
+        self._session = requests.Session()
+
+    def render(self, url: str) -> str:
+        response = self._session.get(url, headers={RENDER_HEADER: "1"}, timeout=15)
+        response.raise_for_status()
+        return response.text
+
+    def close(self) -> None:
+        self._session.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serveur local de pages CoinAfrique")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="latence par requête (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="part de réponses 503")
+    args = parser.parse_args()
+    with StubServer(latency=args.latency, error_rate=args.error_rate, port=args.port) as server:
+        print(f"Pages servies sur {server.base_url}<slug>?page=N — Ctrl+C pour arrêter")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
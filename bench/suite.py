@@ -0,0 +1,245 @@
+"""
+Suite de benchmarks du scraper : téléchargement, extraction, sauvegarde, images.
+
+    python -m bench.suite [--only fetch_concurrent parse_lxml] [--output bench.json]
+                          [--compare bench.json] [--latency 0.1] [--pages 20]
+
+Chaque scénario tourne dans un processus neuf (mesure du pic mémoire RSS) et
+produit une ligne JSON : pages/s, lignes/s, latence p50/p95 par page ou par
+requête, pic RSS. Les pages viennent de bench/fixtures (générées par le
+serveur local, ou pages réelles enregistrées avec bench.record) et, au-delà,
+du serveur local.
+
+--output écrit tous les résultats dans un fichier ; --compare signale (code
+de sortie 1) les scénarios plus lents que ce fichier de référence au-delà de
+--tolerance.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure RSS
+    resource = None
+
+BENCH_KEYS = ("pages_per_sec", "rows_per_sec")
+
+
+def peak_rss_kib() -> int | None:
+    """Pic RSS du processus courant, en Kio."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 4) if values else 0.0
+
+
+def result(scenario: str, pages: int, rows: int, seconds: float, latencies=None, **extra) -> dict:
+    latencies = latencies or []
+    return {
+        "scenario": scenario,
+        "pages": pages,
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(pages / seconds, 2) if seconds else 0.0,
+        "rows_per_sec": round(rows / seconds, 1) if seconds else 0.0,
+        "latency_p50": pct(latencies, 0.50),
+        "latency_p95": pct(latencies, 0.95),
+        **extra,
+    }
+
+
+# ── Scénarios (exécutés dans le processus fils) ──
+
+def fetch_scenario(name: str, opts: dict, workers: int, rate: float, error_rate: float) -> dict:
+    from bench.bench_parse import FIXTURES_DIR
+    from bench.stub_server import StubServer
+    from utils.scraper import FetchStats, iter_scrape
+
+    stats = FetchStats()
+    with StubServer(latency=opts["latency"], error_rate=error_rate, seed=1,
+                    fixtures=FIXTURES_DIR) as server:
+        start = time.perf_counter()
+        rows = sum(len(batch) for _, batch in iter_scrape(
+            opts["slug"], opts["pages"], workers=workers, rate=rate,
+            base_url=server.base_url, stats=stats))
+        seconds = time.perf_counter() - start
+    s = stats.as_dict()
+    return result(name, opts["pages"], rows, seconds, stats.latencies,
+                  workers=workers, requests=s["requests"], retries=s["retries"],
+                  failed_pages=len(s["failed_pages"]))
+
+
+def render_scenario(name: str, opts: dict, js_rate: float, startup: float) -> dict:
+    """Pages « JS seulement » rendues par un pool de StubRenderer (démarrage `startup` s)."""
+    from bench.stub_server import StubRenderer, StubServer
+    from utils.render import RendererPool
+    from utils.scraper import FetchStats, iter_scrape
+
+    stats = FetchStats()
+    with StubServer(latency=opts["latency"], js_rate=js_rate) as server, \
+            RendererPool(lambda: StubRenderer(startup), size=2) as pool:
+        start = time.perf_counter()
+        rows = sum(len(batch) for _, batch in iter_scrape(
+            opts["slug"], opts["pages"], workers=opts["workers"], rate=opts["rate"],
+            base_url=server.base_url, stats=stats, renderer=pool))
+        seconds = time.perf_counter() - start
+        pool_stats = pool.stats()
+    return result(name, opts["pages"], rows, seconds, stats.latencies,
+                  rendered=stats.rendered, renderers_started=pool_stats["started"],
+                  failed_pages=len(stats.failed_pages))
+
+
+def images_scenario(name: str, opts: dict, per_page: int = 25) -> dict:
+    """Miniatures et empreintes de `pages` × `per_page` images servies par le StubServer."""
+    from bench.stub_server import StubServer
+    from utils.images import IMAGE_WORKERS, ThumbnailCache, iter_images
+    from utils.scraper import FetchStats
+
+    stats = FetchStats()
+    with tempfile.TemporaryDirectory() as tmp, StubServer(latency=opts["latency"]) as server:
+        cache = ThumbnailCache(tmp)
+        urls = [server.image_url(i) for i in range(opts["pages"] * per_page)]
+        start = time.perf_counter()
+        done = sum(info is not None for _, info, _ in iter_images(
+            urls, cache, workers=IMAGE_WORKERS, rate=opts["rate"], stats=stats))
+        seconds = time.perf_counter() - start
+        files = cache.stats()["files"]
+        cache.close()
+    return result(name, len(urls), done, seconds, stats.latencies, thumbnails=files)
+
+
+def parse_scenario(name: str, opts: dict, parser: str) -> dict:
+    from bench.bench_parse import load_fixtures, regenerate_fixtures
+    from utils.scraper import extract_annonces
+
+    if not load_fixtures():
+        regenerate_fixtures()
+    pages = load_fixtures() * opts["repeat"]
+    latencies, rows = [], 0
+    start = time.perf_counter()
+    for slug, html in pages:
+        t = time.perf_counter()
+        rows += len(extract_annonces(html, slug, parser=parser))
+        latencies.append(time.perf_counter() - t)
+    return result(name, len(pages), rows, time.perf_counter() - start, latencies, parser=parser)
+
+
+def save_scenario(name: str, opts: dict, per_page: bool) -> dict:
+    import pandas as pd
+
+    from bench.bench_parse import load_fixtures, regenerate_fixtures
+    from utils.database import get_connection, init_db, save_scraped_data
+    from utils.scraper import extract_annonces
+
+    if not load_fixtures():
+        regenerate_fixtures()
+    pages = [pd.DataFrame(extract_annonces(html, slug)) for slug, html in load_fixtures()]
+    # Pages distinctes : le nom est suffixé par le numéro de répétition
+    batches = [page.assign(nom=page["nom"] + f" #{i}", image_lien="")
+               for i in range(opts["repeat"] * 10) for page in pages]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = get_connection(os.path.join(tmp, "bench.db"))
+        init_db(conn)
+        latencies = []
+        start = time.perf_counter()
+        for batch in (batches if per_page else [pd.concat(batches, ignore_index=True)]):
+            t = time.perf_counter()
+            save_scraped_data(batch, conn)
+            latencies.append(time.perf_counter() - t)
+        seconds = time.perf_counter() - start
+        conn.close()
+    return result(name, len(batches), sum(map(len, batches)), seconds, latencies)
+
+
+SCENARIOS = {
+    "fetch_sequential": lambda o: fetch_scenario("fetch_sequential", o, 1, 1000.0, 0.0),
+    "fetch_concurrent": lambda o: fetch_scenario("fetch_concurrent", o, o["workers"], o["rate"], 0.0),
+    "fetch_errors":     lambda o: fetch_scenario("fetch_errors", o, o["workers"], o["rate"], 0.1),
+    "fetch_render":     lambda o: render_scenario("fetch_render", o, 0.25, 0.5),
+    "images":           lambda o: images_scenario("images", o),
+    "parse_html.parser": lambda o: parse_scenario("parse_html.parser", o, "html.parser"),
+    "parse_lxml":       lambda o: parse_scenario("parse_lxml", o, "lxml"),
+    "parse_strainer":   lambda o: parse_scenario("parse_strainer", o, "strainer"),
+    "parse_css":        lambda o: parse_scenario("parse_css", o, "css"),
+    "save_bulk":        lambda o: save_scenario("save_bulk", o, per_page=False),
+    "save_per_page":    lambda o: save_scenario("save_per_page", o, per_page=True),
+}
+
+
+def _child(name: str, opts: dict) -> dict:
+    base = peak_rss_kib()
+    out = SCENARIOS[name](opts)
+    out["base_rss_kib"], out["peak_rss_kib"] = base, peak_rss_kib()
+    return out
+
+
+def run_scenario(name: str, opts: dict) -> dict:
+    """Exécute un scénario dans un processus neuf (pic RSS propre au scénario)."""
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(_child, name, opts).result()
+
+
+def compare(results: list[dict], reference: list[dict], tolerance: float) -> list[str]:
+    """Scénarios dont un débit a baissé de plus de `tolerance` par rapport à la référence."""
+    ref = {r["scenario"]: r for r in reference}
+    regressions = []
+    for r in results:
+        old = ref.get(r["scenario"])
+        for key in BENCH_KEYS if old else ():
+            if old[key] and r[key] < old[key] * (1 - tolerance):
+                regressions.append(f"{r['scenario']} {key} : {old[key]} -> {r[key]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--slug", default="vetements-homme")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=100.0)
+    parser.add_argument("--repeat", type=int, default=10, help="répétitions des fixtures")
+    parser.add_argument("--output", help="fichier JSON des résultats")
+    parser.add_argument("--compare", help="fichier JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    opts = {k: getattr(args, k) for k in ("slug", "pages", "latency", "workers", "rate", "repeat")}
+    results = []
+    for name in args.only:
+        out = run_scenario(name, opts)
+        results.append(out)
+        print(json.dumps(out), flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "python": platform.python_version(),
+                       "platform": platform.platform(), "sqlite": sqlite3.sqlite_version,
+                       "options": opts, "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for line in regressions:
+            print(f"RÉGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,120 @@
-import os
+import time
+
 import pandas as pd
 import streamlit as st
 
-from utils.scraper import CATEGORIES, scrape_categorie
-from utils.database import get_connection, init_db, save_scraped_data
-
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH  = os.path.join(BASE_DIR, "coinafrique_bs4.db")
+from utils.datasets import CAT_LABELS, DB_PATH
+from utils.export import FORMAT_LABELS, available_formats, download_args
+from utils.jobs import ACTIVE, STATUS_LABELS, get_job_manager
+from utils.normalize import split_adresses
+from utils.render import available as rendu_disponible
+from utils.scraper import CATEGORIES
+from utils.database import (
+    count_annonces, count_by_categorie, get_shared_connection, query_annonces,
+)
 
 
-def to_csv_bytes(df):
-    return df.to_csv(index=False).encode("utf-8")
+def resume_sauvegarde(res):
+    return (
+        f"{res['inserted']:,} nouvelles annonces, {res['updated']:,} mises à jour, "
+        f"{res['unchanged']:,} inchangées dans `coinafrique_bs4.db`."
+    )
 
 
 def get_db_stats():
     """Retourne le nb d'entrées par catégorie dans la DB."""
     try:
-        conn = get_connection(DB_PATH)
-        init_db(conn)
-        df = pd.read_sql_query(
-            "SELECT categorie, COUNT(*) as nb FROM annonces GROUP BY categorie",
-            conn
-        )
-        conn.close()
-        return df
+        conn, lock = get_shared_connection(DB_PATH)
+        with lock:
+            return count_by_categorie(conn)
     except Exception:
         return pd.DataFrame(columns=["categorie", "nb"])
 
 
+def libelle_tache(job):
+    debut = time.strftime("%H:%M:%S", time.localtime(job["created_at"]))
+    return (f"{debut} · {CAT_LABELS.get(job['categorie'], job['categorie'])} · "
+            f"{job['pages']} pages · {STATUS_LABELS[job['status']]}")
+
+
+def afficher_tache(job):
+    """Progression, statistiques et résultats d'une tâche de scraping."""
+    job_id, options = job["job_id"], job["options"]
+    stats = job["stats"] or {}
+    actif = job["status"] in ACTIVE
+
+    texte = f"Page {job['pages_done']}/{job['pages']} — {job['rows']:,} annonces"
+    st.progress(1.0 if not actif else job["pages_done"] / job["pages"],
+                text=f"{STATUS_LABELS[job['status']]} · {texte}")
+    if stats:
+        fin = job["finished_at"] if not pd.isna(job["finished_at"]) else time.time()
+        debut = job["started_at"] if not pd.isna(job["started_at"]) else fin
+        st.caption(
+            f"{stats['requests']} requêtes · {stats['retries']} reprises · "
+            f"{stats['cache_hits'] + stats['not_modified']} pages en cache · "
+            f"{stats.get('rendered', 0)} pages rendues · "
+            f"{stats['bytes'] / 1024:,.0f} Ko · latence p50 {stats['latency_p50'] * 1000:.0f} ms "
+            f"· {fin - debut:.1f} s"
+        )
+        if stats["failed_pages"]:
+            pages = [str(p[-1] if isinstance(p, list) else p) for p in stats["failed_pages"]]
+            st.error(f"Pages en échec : {', '.join(pages)}")
+
+    if actif:
+        if st.button("⏹️ Annuler la tâche", key=f"cancel_{job_id}"):
+            get_job_manager(DB_PATH).cancel(job_id)
+            st.info("Annulation demandée : arrêt à la fin de la page en cours.")
+    elif job["status"] == "failed":
+        st.error(f"La tâche a échoué : {job['error']}")
+    elif job["status"] == "cancelled":
+        st.warning(f"Tâche annulée après {job['pages_done']} page(s).")
+    elif options["incremental"] and job["pages_done"] < job["pages"]:
+        st.info(f"Arrêt à la page {job['pages_done']} : "
+                "toutes les annonces suivantes sont déjà connues.")
+
+    df = get_job_manager(DB_PATH).results(job_id)
+    if df.empty:
+        if actif:
+            return
+        if options["incremental"] and not stats.get("failed_pages"):
+            st.success("Aucune nouvelle annonce depuis le dernier scraping.")
+        else:
+            st.warning("Aucune donnée collectée. Vérifie ta connexion ou réessaie.")
+        return
+
+    # ── Métriques rapides ──
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Annonces collectées", f"{len(df):,}")
+    c2.metric("Doublons détectés",
+              f"{stats.get('duplicates', 0) + stats.get('near_duplicates', 0):,}",
+              help=f"{stats.get('duplicates', 0):,} identiques, "
+                   f"{stats.get('near_duplicates', 0):,} quasi-doublons écartés")
+    c3.metric("Villes uniques",      split_adresses(df["adresse"])["ville"].nunique())
+    c4.metric("Pages scrapées",      job["pages_done"])
+
+    st.dataframe(df, width="stretch")
+    if actif:
+        return
+
+    # ── Boutons ──
+    col_dl, col_db = st.columns(2)
+    with col_dl:
+        st.download_button(
+            f"⬇️ Télécharger {FORMAT_LABELS[fmt]}",
+            **download_args(df, f"{job['categorie']}_{job['pages']}pages", fmt, version=job_id),
+            key=f"dl_{job_id}",
+            width="stretch",
+        )
+    with col_db:
+        if job["saved"]:
+            st.success(resume_sauvegarde(job["saved"]))
+        elif st.button("💾 Sauvegarder en base de données", key=f"save_{job_id}",
+                       width="stretch"):
+            st.success(resume_sauvegarde(get_job_manager(DB_PATH).save(job_id)))
+
+
+jobs = get_job_manager(DB_PATH)
+
 # ── Titre ──
 st.title("🔍 Scraper des données en direct")
 st.markdown("Scraping en temps réel depuis [CoinAfrique Sénégal](https://sn.coinafrique.com) via `requests + BeautifulSoup`.")
@@ -41,47 +128,75 @@ with col1:
     slug     = CATEGORIES[label]
 with col2:
     nb_pages = st.slider("Nombre de pages", min_value=1, max_value=20, value=3)
+    fmt      = st.radio("Format d'export", available_formats(),
+                        format_func=FORMAT_LABELS.get, horizontal=True)
+
+col_opt1, col_opt2, col_opt3 = st.columns(3)
+with col_opt1:
+    hors_ligne = st.checkbox(
+        "Mode hors-ligne (rejouer les pages en cache)",
+        help="Aucune requête réseau : seules les pages déjà en cache sont utilisées.",
+    )
+with col_opt2:
+    sauvegarde_auto = st.checkbox(
+        "Sauvegarder en base à la fin",
+        help="Les annonces sont écrites dans la base dès que la tâche se termine.",
+    )
+with col_opt3:
+    incremental = st.checkbox(
+        "Mode incrémental (nouvelles annonces seulement)",
+        help="S'arrête à la première page dont toutes les annonces sont déjà en base.",
+    )
+col_opt4, col_opt5, _ = st.columns(3)
+with col_opt4:
+    quasi_doublons = st.checkbox(
+        "Écarter les quasi-doublons",
+        value=True,
+        help="Même prix et titre / adresse presque identiques à une annonce déjà en base "
+             "ou déjà collectée (titre retouché, espaces, casse).",
+    )
+with col_opt5:
+    rendu = st.checkbox(
+        "Rendu navigateur des pages incomplètes",
+        disabled=not rendu_disponible(),
+        help="Les pages sans annonces ou sans images en HTTP simple sont rendues par un "
+             "navigateur headless (Playwright) gardé ouvert entre les pages.",
+    )
+
+# Le scraping tourne en arrière-plan : on peut quitter la page ou en lancer d'autres
+if st.button("🚀 Lancer le scraping", width="stretch"):
+    st.session_state["tache"] = jobs.submit(
+        slug, nb_pages, offline=hors_ligne, incremental=incremental, auto_save=sauvegarde_auto,
+        render=rendu, near_dedupe=quasi_doublons,
+    )
 
-if st.button("🚀 Lancer le scraping", use_container_width=True):
-    progress_bar = st.progress(0, text="Démarrage...")
+st.markdown("---")
 
-    def update_progress(p, total):
-        progress_bar.progress(p / total, text=f"Page {p}/{total}...")
+# ── Suivi des tâches (rafraîchi chaque seconde tant qu'une tâche tourne) ──
+st.subheader("Tâches de scraping")
 
-    df = scrape_categorie(slug, nb_pages=nb_pages, progress_callback=update_progress)
-    progress_bar.progress(1.0, text="Terminé !")
+suivi_actif = jobs.has_active()
+
+
+@st.fragment(run_every=1.0 if suivi_actif else None)
+def suivi_taches():
+    liste = jobs.list_jobs()
+    if liste.empty:
+        st.info("Aucune tâche pour l'instant. Choisis une catégorie et lance un scraping.")
+        return
+    taches = {row.job_id: row._asdict() for row in liste.itertuples(index=False)}
+    if st.session_state.get("tache") not in taches:
+        st.session_state["tache"] = liste["job_id"].iloc[0]
+    job_id = st.selectbox("Tâche", list(taches), key="tache",
+                          format_func=lambda j: libelle_tache(taches[j]))
+    afficher_tache(jobs.status(job_id))
+
+    # Plus rien ne tourne : un rerun complet arrête le rafraîchissement et met la base à jour
+    if suivi_actif and not jobs.has_active():
+        st.rerun()
 
-    if df.empty:
-        st.warning("Aucune donnée collectée. Vérifie ta connexion ou réessaie.")
-    else:
-        # ── Métriques rapides ──
-        c1, c2, c3, c4 = st.columns(4)
-        c1.metric("Annonces collectées", f"{len(df):,}")
-        c2.metric("Doublons détectés",   f"{df.duplicated().sum():,}")
-        c3.metric("Villes uniques",      df["adresse"].str.split(",").str[0].nunique())
-        c4.metric("Pages scrapées",      nb_pages)
-
-        st.dataframe(df, use_container_width=True)
-
-        # ── Boutons ──
-        col_dl, col_db = st.columns(2)
-        with col_dl:
-            st.download_button(
-                "⬇️ Télécharger CSV",
-                data=to_csv_bytes(df),
-                file_name=f"{slug}_{nb_pages}pages.csv",
-                mime="text/csv",
-                use_container_width=True,
-            )
-        with col_db:
-            st.session_state["scraped_df"] = df
-            if st.button("💾 Sauvegarder en base de données", use_container_width=True):
-                conn = get_connection(DB_PATH)
-                init_db(conn)
-                n = save_scraped_data(df, conn)
-                conn.close()
-                st.success(f"{n} lignes sauvegardées dans `coinafrique_bs4.db`.")
-                st.cache_data.clear()
+
+suivi_taches()
 
 st.markdown("---")
 
@@ -90,13 +205,6 @@ st.subheader("État de la base de données")
 
 db_stats = get_db_stats()
 
-CAT_LABELS = {
-    "vetements-homme":    "Vêtements Homme",
-    "chaussures-homme":   "Chaussures Homme",
-    "vetements-enfants":  "Vêtements Enfants",
-    "chaussures-enfants": "Chaussures Enfants",
-}
-
 if db_stats.empty:
     st.info("La base de données est vide. Lance un scraping et sauvegarde les résultats.")
 else:
@@ -108,3 +216,34 @@ else:
         row = db_stats[db_stats["categorie"] == slug_key]
         nb  = int(row["nb"].values[0]) if not row.empty else 0
         col.metric(label_key, f"{nb:,}")
+
+    # ── Consultation de la base (filtres et pagination faits par SQLite) ──
+    with st.expander("Parcourir la base"):
+        PAR_PAGE = 50
+        f1, f2, f3, f4 = st.columns(4)
+        with f1:
+            cats = st.multiselect(
+                "Catégorie", list(CAT_LABELS), format_func=CAT_LABELS.get, key="db_cats"
+            )
+        with f2:
+            prix_min = st.number_input("Prix min (CFA)", min_value=0, value=0, step=1000)
+        with f3:
+            prix_max = st.number_input("Prix max (CFA, 0 = sans limite)", min_value=0, value=0, step=1000)
+        with f4:
+            ville = st.text_input("Ville (ex : Dakar)").strip()
+
+        filtres = {
+            "categories": cats or None,
+            "prix_min":   prix_min or None,
+            "prix_max":   prix_max or None,
+            "villes":     [ville] if ville else None,
+        }
+        conn, lock = get_shared_connection(DB_PATH)
+        with lock:
+            nb_resultats = count_annonces(conn, **filtres)
+        nb_pages_db = max(1, -(-nb_resultats // PAR_PAGE))
+        page_db = st.number_input(f"Page (sur {nb_pages_db})", min_value=1, max_value=nb_pages_db, value=1)
+        with lock:
+            resultats = query_annonces(conn, **filtres, limit=PAR_PAGE, offset=(page_db - 1) * PAR_PAGE)
+        st.caption(f"{nb_resultats:,} annonces correspondantes")
+        st.dataframe(resultats, width="stretch")
@@ -1,64 +1,61 @@
-import os
 import streamlit as st
-import pandas as pd
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-
-CAT_LABELS = {
-    "vetements-homme":    "Vêtements Homme",
-    "chaussures-homme":   "Chaussures Homme",
-    "vetements-enfants":  "Vêtements Enfants",
-    "chaussures-enfants": "Chaussures Enfants",
-}
-
-FILES = {
-    "vetements-homme":    ("vetement_hommes.csv",       ";"),
-    "chaussures-homme":   ("chaussures_hommes_ws.csv",  ","),
-    "vetements-enfants":  ("vetement_enfants.csv",      ";"),
-    "chaussures-enfants": ("chaussures_enfants_ws.csv", ","),
-}
-
-
-def to_csv_bytes(df):
-    return df.to_csv(index=False).encode("utf-8")
+from utils.datasets import (
+    CAT_LABELS, dataset_stats, dataset_version, ignored_files, load_raw, preview, specs,
+)
+from utils.export import FORMAT_LABELS, available_formats, download_args
 
 
 st.title("⬇️ Télécharger les données Web Scraper")
 st.markdown("Données **brutes (non nettoyées)** collectées avec Web Scraper.")
 
-# ── Cartes de résumé global ──
-cols = st.columns(len(FILES))
-totals = {}
-for col, (slug, (filename, sep)) in zip(cols, FILES.items()):
-    path = os.path.join(DATA_DIR, filename)
-    df_tmp = pd.read_csv(path, sep=sep, encoding="utf-8", on_bad_lines="skip")
-    totals[slug] = df_tmp
-    col.metric(CAT_LABELS[slug], f"{len(df_tmp):,} lignes")
+fmt = st.radio("Format", available_formats(), format_func=FORMAT_LABELS.get, horizontal=True)
+
+# CSV détectés dans data/ ; le nom du fichier départage plusieurs CSV d'une même catégorie
+fichiers = specs()
+par_categorie = [spec.categorie for spec in fichiers.values()]
+labels = {
+    key: CAT_LABELS[spec.categorie] + (f" ({spec.filename})"
+                                       if par_categorie.count(spec.categorie) > 1 else "")
+    for key, spec in fichiers.items()
+}
+
+# ── Cartes de résumé global (statistiques en cache, sans charger les fichiers) ──
+stats = {key: dataset_stats(spec) for key, spec in fichiers.items()}
+cols = st.columns(len(fichiers))
+for col, key in zip(cols, fichiers):
+    col.metric(labels[key], f"{stats[key]['rows']:,} lignes")
+if ignored_files():
+    st.caption("CSV ignorés (catégorie ou colonnes non reconnues) : " + ", ".join(ignored_files()))
 
 st.markdown("---")
 
-# ── Détail par dataset ──
-for slug, df in totals.items():
-    nb_manquants = df.isnull().sum().sum()
-    pct_manquants = nb_manquants / (df.shape[0] * df.shape[1]) * 100
+# ── Détail par dataset (rendu seulement quand l'expander est ouvert) ──
+for key, infos in stats.items():
+    spec = fichiers[key]
+    pct_manquants = infos["missing"] / max(infos["rows"] * infos["columns"], 1) * 100
 
-    with st.expander(f"📦 {CAT_LABELS[slug]} — {len(df):,} lignes", expanded=False):
+    detail = st.expander(
+        f"📦 {labels[key]} — {infos['rows']:,} lignes",
+        expanded=False, key=f"exp_{key}", on_change="rerun",
+    )
+    if not detail.open:
+        continue
 
+    with detail:
         # Stats rapides
         c1, c2, c3 = st.columns(3)
-        c1.metric("Lignes", f"{len(df):,}")
-        c2.metric("Colonnes", df.shape[1])
-        c3.metric("Valeurs manquantes", f"{nb_manquants:,} ({pct_manquants:.1f}%)")
+        c1.metric("Lignes", f"{infos['rows']:,}")
+        c2.metric("Colonnes", infos["columns"])
+        c3.metric("Valeurs manquantes", f"{infos['missing']:,} ({pct_manquants:.1f}%)")
 
         st.markdown("**Aperçu (20 premières lignes)**")
-        st.dataframe(df.head(20), use_container_width=True)
+        st.dataframe(preview(spec, 20), width="stretch")
 
         st.download_button(
-            label=f"⬇️ Télécharger {CAT_LABELS[slug]} (CSV)",
-            data=to_csv_bytes(df),
-            file_name=f"{slug}_webscraper.csv",
-            mime="text/csv",
-            key=f"dl_{slug}",
-            use_container_width=True,
+            label=f"⬇️ Télécharger {labels[key]} ({FORMAT_LABELS[fmt]})",
+            **download_args(lambda s=spec: load_raw(s), f"{key}_webscraper", fmt,
+                            version=dataset_version(spec)),
+            key=f"dl_{key}",
+            width="stretch",
         )
@@ -1,72 +1,109 @@
-import re
 import os
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
+
+from utils.aggregates import (
+    box_stats, build_cube, counts_by, filter_cube, histogram, merge_cubes, summary, usable,
+)
+from utils.database import get_shared_connection
+from utils.datasets import (
+    CAT_LABELS, DB_PATH, get_dataset, load_all, load_all_unique, load_price_medians,
+    load_scraped, load_scraped_cube,
+)
+from utils.export import FORMAT_LABELS, available_formats, download_args
+from utils.filters import FilterIndex
+from utils.history import history_summary, most_changed, trajectory
+from utils.images import thumbnails
+from utils.outofcore import (
+    enabled, iter_sources, iter_webscraper, sources_version, stream_cube, stream_rows,
+)
+
+COULEURS = dict(zip(CAT_LABELS.values(), px.colors.qualitative.Set2))
+MINIATURES = 100   # lignes du tableau avec miniature (téléchargées au besoin)
+TABLE_ROWS = 1_000  # lignes affichées en mode hors mémoire (le téléchargement a tout)
+EXPORT_COLUMNS = ["categorie", "nom", "prix", "adresse", "image_lien"]
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-
-CAT_LABELS = {
-    "vetements-homme":    "Vêtements Homme",
-    "chaussures-homme":   "Chaussures Homme",
-    "vetements-enfants":  "Vêtements Enfants",
-    "chaussures-enfants": "Chaussures Enfants",
-}
-
-FILES = {
-    "vetements-homme":    ("vetement_hommes.csv",       ";"),
-    "chaussures-homme":   ("chaussures_hommes_ws.csv",  ","),
-    "vetements-enfants":  ("vetement_enfants.csv",      ";"),
-    "chaussures-enfants": ("chaussures_enfants_ws.csv", ","),
-}
-
-
-def clean_prix(prix_str):
-    cleaned = re.sub(r"[^\d]", "", str(prix_str))
-    return int(cleaned) if cleaned else None
-
-
-def to_csv_bytes(df):
-    return df.to_csv(index=False).encode("utf-8")
-
-
-def normalize(df, slug):
-    df = df.copy()
-    rename_map = {}
-    for old, new in [("type_habits", "nom"), ("Type chaussure", "nom"),
-                     ("Prix", "prix"), ("Adresse", "adresse"), ("Image-src", "image_lien")]:
-        if old in df.columns:
-            rename_map[old] = new
-    df = df.rename(columns=rename_map)
-    if "image_lien" not in df.columns:
-        df["image_lien"] = ""
-    df["categorie"] = slug
-    cols = [c for c in ["categorie", "nom", "prix", "adresse", "image_lien"] if c in df.columns]
-    return df[cols]
-
-
-@st.cache_data
-def load_data():
-    frames = []
-    for slug, (filename, sep) in FILES.items():
-        path = os.path.join(DATA_DIR, filename)
-        df = pd.read_csv(path, sep=sep, encoding="utf-8", on_bad_lines="skip")
-        frames.append(normalize(df, slug))
-    df_all = pd.concat(frames, ignore_index=True)
-    df_all = df_all[~df_all["prix"].str.contains("demande", case=False, na=True)]
-    df_all["prix_num"] = df_all["prix"].apply(clean_prix)
-    df_all = df_all.dropna(subset=["prix_num", "nom"]).reset_index(drop=True)
-    df_all = df_all[df_all["nom"].str.strip() != ""]
+
+def prepare(df_all):
+    df_all = usable(df_all)
     df_all["categorie_label"] = df_all["categorie"].map(CAT_LABELS)
     return df_all
 
 
-df_all = load_data()
+def web_scraper(unique: bool):
+    """Données Web Scraper, sans les quasi-doublons si `unique` (voir utils.neardup)."""
+    return load_all_unique() if unique else load_all()
+
+
+def load_data(avec_base: bool, unique: bool):
+    """
+    Données du dashboard, partagées par toutes les sessions (registre de
+    utils.datasets) ; la variante avec la base est oubliée à chaque sauvegarde.
+    """
+    # Schéma canonique (prix_num, quartier, ville, pays) lu depuis le cache Parquet
+    suffix = ":unique" if unique else ""
+    if not avec_base:
+        return get_dataset("dashboard" + suffix, lambda: prepare(web_scraper(unique)))
+    return get_dataset(
+        "dashboard:base" + suffix,
+        lambda: prepare(pd.concat([web_scraper(unique), load_scraped()], ignore_index=True)),
+        tags=("scraped",),
+    )
+
+
+def load_index(avec_base: bool, unique: bool):
+    """Index catégorie / prix des lignes de load_data, construit une fois par chargement."""
+    name = ("index:base" if avec_base else "index") + (":unique" if unique else "")
+    tags = ("scraped",) if avec_base else ()
+    return get_dataset(name, lambda: FilterIndex(load_data(avec_base, unique)), tags=tags)
+
+
+def load_cube(avec_base: bool, unique: bool, hors_memoire: bool = False):
+    """
+    Cube (catégorie, localité, prix) -> nb : les figures et métriques sont
+    calculées dessus, jamais sur les lignes. La partie base est tenue à jour
+    par triggers SQLite et relue après chaque sauvegarde ; les quasi-doublons
+    y sont écartés dès le scraping. En mode hors mémoire, la partie CSV est
+    agrégée par blocs (utils.outofcore) : même cube, sans charger les lignes.
+    """
+    suffix = ":unique" if unique else ""
+
+    def build():
+        if hors_memoire:
+            return stream_cube(iter_webscraper(unique))
+        return build_cube(usable(web_scraper(unique)))
+
+    cube = get_dataset("cube" + suffix, build)
+    if not avec_base:
+        return cube
+    return get_dataset(
+        "cube:base" + suffix, lambda: merge_cubes(cube, load_scraped_cube()), tags=("scraped",)
+    )
+
 
 # ── Filtres sidebar ──
 st.sidebar.markdown("### Filtres")
 
+avec_base = st.sidebar.checkbox(
+    "Inclure les annonces scrapées",
+    help="Ajoute les annonces sauvegardées en base depuis la page Scraping.",
+)
+unique = st.sidebar.checkbox(
+    "Écarter les quasi-doublons",
+    value=True,
+    help="Même annonce comptée deux fois dans les CSV Web Scraper : même identifiant, "
+         "ou même prix avec un titre / une adresse presque identiques.",
+)
+# Données plus grosses que le budget mémoire : cube par blocs, pas de lignes en mémoire
+hors_memoire = enabled(avec_base=avec_base)
+if not hors_memoire:
+    df_all = load_data(avec_base, unique)
+    index = load_index(avec_base, unique)
+cube_all = load_cube(avec_base, unique, hors_memoire)
+
 all_labels = list(CAT_LABELS.values())
 selected_labels = st.sidebar.multiselect(
     "Catégorie",
@@ -74,8 +111,8 @@ selected_labels = st.sidebar.multiselect(
     default=all_labels,
 )
 
-prix_min_abs = int(df_all["prix_num"].min())
-prix_max_abs = int(df_all["prix_num"].max())
+bornes = summary(cube_all)
+prix_min_abs, prix_max_abs = bornes["prix_min"], bornes["prix_max"]
 prix_range = st.sidebar.slider(
     "Fourchette de prix (CFA)",
     min_value=prix_min_abs,
@@ -84,22 +121,30 @@ prix_range = st.sidebar.slider(
     step=500,
 )
 
-df = df_all[
-    df_all["categorie_label"].isin(selected_labels if selected_labels else all_labels) &
-    df_all["prix_num"].between(prix_range[0], prix_range[1])
-]
+selected_slugs = [slug for slug, label in CAT_LABELS.items()
+                  if label in (selected_labels or all_labels)]
+# Positions des lignes filtrées : les lignes ne sont extraites que pour le tableau
+rows = None if hors_memoire else index.select(selected_slugs, *prix_range)
+cube = filter_cube(cube_all, selected_slugs, *prix_range)
+cube = cube.assign(categorie_label=cube["categorie"].map(CAT_LABELS))
+resume = summary(cube)
+ordre = [l for l in all_labels if l in set(cube["categorie_label"])]
 
 # ── Titre ──
 st.title("📊 Dashboard — Données CoinAfrique")
 st.markdown("Visualisation des données **nettoyées** issues de Web Scraper.")
 
+if cube.empty:
+    st.info("Aucune annonce ne correspond à ces filtres.")
+    st.stop()
+
 # ── Métriques ──
 c1, c2, c3, c4, c5 = st.columns(5)
-c1.metric("Total annonces",   f"{len(df):,}")
-c2.metric("Catégories",       len(df["categorie"].unique()))
-c3.metric("Prix moyen (CFA)", f"{int(df['prix_num'].mean()):,}")
-c4.metric("Prix min (CFA)",   f"{int(df['prix_num'].min()):,}")
-c5.metric("Prix max (CFA)",   f"{int(df['prix_num'].max()):,}")
+c1.metric("Total annonces",   f"{resume['total']:,}")
+c2.metric("Catégories",       resume["categories"])
+c3.metric("Prix moyen (CFA)", f"{resume['prix_moyen']:,}")
+c4.metric("Prix min (CFA)",   f"{resume['prix_min']:,}")
+c5.metric("Prix max (CFA)",   f"{resume['prix_max']:,}")
 st.markdown("---")
 
 # ── Ligne 1 : Répartition + Distribution ──
@@ -107,46 +152,53 @@ col_a, col_b = st.columns(2)
 
 with col_a:
     st.subheader("Annonces par catégorie")
-    count_df = df["categorie_label"].value_counts().reset_index()
+    count_df = counts_by(cube, "categorie_label").reset_index()
     count_df.columns = ["categorie", "nb_annonces"]
     fig1 = px.bar(
         count_df, x="categorie", y="nb_annonces", color="categorie",
         labels={"categorie": "Catégorie", "nb_annonces": "Nombre d'annonces"},
-        color_discrete_sequence=px.colors.qualitative.Set2,
+        color_discrete_map=COULEURS,
     )
     fig1.update_layout(showlegend=False)
-    st.plotly_chart(fig1, use_container_width=True, key="fig_bar_cat")
+    st.plotly_chart(fig1, width="stretch", key="fig_bar_cat")
 
 with col_b:
     st.subheader("Distribution des prix par catégorie")
-    fig2 = px.box(
-        df, x="categorie_label", y="prix_num", color="categorie_label",
-        labels={"categorie_label": "Catégorie", "prix_num": "Prix (CFA)"},
-        color_discrete_sequence=px.colors.qualitative.Set2,
-    )
-    fig2.update_layout(showlegend=False)
-    st.plotly_chart(fig2, use_container_width=True, key="fig_box_prix")
+    # Boîtes pré-calculées : quartiles et moustaches seulement, pas les points
+    boxes = box_stats(cube, "categorie_label").set_index("categorie_label")
+    fig2 = go.Figure([
+        go.Box(
+            name=label, x=[label], q1=[b["q1"]], median=[b["median"]], q3=[b["q3"]],
+            lowerfence=[b["lowerfence"]], upperfence=[b["upperfence"]], mean=[b["mean"]],
+            marker_color=COULEURS[label],
+        )
+        for label, b in boxes.reindex(ordre).iterrows()
+    ])
+    fig2.update_layout(showlegend=False, xaxis_title="Catégorie", yaxis_title="Prix (CFA)")
+    st.plotly_chart(fig2, width="stretch", key="fig_box_prix")
 
 # ── Ligne 2 : Histogram + Top villes ──
 col_c, col_d = st.columns(2)
 
 with col_c:
     st.subheader("Histogramme des prix")
-    fig3 = px.histogram(
-        df, x="prix_num", color="categorie_label", nbins=50,
-        labels={"prix_num": "Prix (CFA)", "categorie_label": "Catégorie"},
-        color_discrete_sequence=px.colors.qualitative.Set2,
-        barmode="overlay", opacity=0.75,
+    bins = histogram(cube, "categorie_label", nbins=50)
+    fig3 = go.Figure([
+        go.Bar(
+            name=label, x=part["x"], y=part["nb"], width=part["width"],
+            marker_color=COULEURS[label], opacity=0.75,
+        )
+        for label, part in ((l, bins[bins["categorie_label"] == l]) for l in ordre)
+    ])
+    fig3.update_layout(
+        barmode="overlay", legend_title="Catégorie",
+        xaxis_title="Prix (CFA)", yaxis_title="count",
     )
-    fig3.update_layout(legend_title="Catégorie")
-    st.plotly_chart(fig3, use_container_width=True, key="fig_hist_prix")
+    st.plotly_chart(fig3, width="stretch", key="fig_hist_prix")
 
 with col_d:
     st.subheader("Top 10 villes")
-    top_villes = (
-        df["adresse"].str.split(",").str[0].str.strip()
-        .value_counts().head(10).reset_index()
-    )
+    top_villes = counts_by(cube, "localite").head(10).reset_index()
     top_villes.columns = ["ville", "nb_annonces"]
     fig4 = px.bar(
         top_villes, x="nb_annonces", y="ville", orientation="h",
@@ -154,17 +206,93 @@ with col_d:
         color="nb_annonces", color_continuous_scale="Oranges",
     )
     fig4.update_layout(yaxis={"categoryorder": "total ascending"}, coloraxis_showscale=False)
-    st.plotly_chart(fig4, use_container_width=True, key="fig_bar_villes")
+    st.plotly_chart(fig4, width="stretch", key="fig_bar_villes")
+
+# ── Historique des prix (base scrapée) ──
+if os.path.exists(DB_PATH):
+    st.markdown("---")
+    st.subheader("Historique des prix")
+    conn, lock = get_shared_connection(DB_PATH)
+    with lock:
+        suivi = history_summary(conn)
+        changes = most_changed(conn)
+    if not suivi["releves"]:
+        st.caption("Aucun relevé : les prix sont historisés à chaque sauvegarde du scraping.")
+    else:
+        h1, h2, h3, h4 = st.columns(4)
+        h1.metric("Annonces suivies",      f"{suivi['annonces']:,}")
+        h2.metric("Relevés",               f"{suivi['releves']:,}")
+        h3.metric("Changements de prix",   f"{suivi['changements']:,}")
+        h4.metric("Durée en ligne (jours)", f"{suivi['duree_moyenne_jours']:.1f}")
+
+        col_e, col_f = st.columns(2)
+        with col_e:
+            by = st.radio("Regrouper par", ["categorie", "ville"], horizontal=True,
+                          format_func={"categorie": "Catégorie", "ville": "Ville"}.get)
+            window = st.select_slider("Fenêtre glissante", ["1D", "3D", "7D", "14D", "30D"],
+                                      value="7D", format_func=lambda w: f"{w[:-1]} j")
+            medians = load_price_medians(by, window)
+            if by == "categorie":
+                medians = medians[medians["categorie"].isin(selected_slugs)]
+                medians = medians.assign(groupe=medians["categorie"].map(CAT_LABELS))
+            else:
+                top = medians.groupby("ville")["nb_annonces"].sum().nlargest(8).index
+                medians = medians[medians["ville"].isin(top)].assign(groupe=medians["ville"])
+            fig5 = px.line(
+                medians, x="date", y="prix_median", color="groupe", markers=True,
+                hover_data=["nb_annonces"],
+                labels={"date": "Date", "prix_median": "Prix médian (CFA)", "groupe": ""},
+            )
+            st.plotly_chart(fig5, width="stretch", key="fig_prix_median")
+        with col_f:
+            if changes.empty:
+                st.caption("Aucun changement de prix relevé pour l'instant.")
+            else:
+                choix = st.selectbox(
+                    "Annonces dont le prix a changé", changes.index,
+                    format_func=lambda i: f"{changes.at[i, 'nom']} "
+                                          f"({changes.at[i, 'nb_changements']} changements)",
+                )
+                with lock:
+                    points = trajectory(conn, changes.at[choix, "categorie"],
+                                        changes.at[choix, "listing_key"])
+                fig6 = px.line(points, x="t", y="prix_num", markers=True, line_shape="hv",
+                               labels={"t": "Relevé", "prix_num": "Prix (CFA)"},
+                               color_discrete_sequence=["#FF6B35"])
+                st.plotly_chart(fig6, width="stretch", key="fig_trajectoire")
 
 # ── Tableau ──
+def filtered_chunks(limit=None):
+    """Lignes filtrées par blocs, relues à chaque appel (mode hors mémoire)."""
+    return stream_rows(iter_sources(unique, avec_base), selected_slugs, *prix_range, limit=limit)
+
+
 with st.expander("Voir les données filtrées"):
-    st.dataframe(
-        df[["categorie_label", "nom", "prix", "adresse"]].reset_index(drop=True),
-        use_container_width=True,
-    )
-    st.download_button(
-        "⬇️ Télécharger les données nettoyées",
-        data=to_csv_bytes(df.drop(columns=["prix_num", "categorie_label"])),
-        file_name="coinafrique_nettoye.csv",
-        mime="text/csv",
-    )
+    if hors_memoire:
+        st.caption(f"Données volumineuses : {TABLE_ROWS:,} premières lignes affichées, "
+                   "le téléchargement contient toutes les lignes filtrées.")
+        df = pd.concat(filtered_chunks(TABLE_ROWS), ignore_index=True)
+        df["categorie_label"] = df["categorie"].map(CAT_LABELS)
+    else:
+        df = df_all.iloc[rows]
+    table = df[["categorie_label", "nom", "prix", "adresse"]].reset_index(drop=True)
+    config = None
+    if st.checkbox("Miniatures", help=f"Images des {MINIATURES} premières lignes, "
+                                      "mises en cache sur disque (utils.images)."):
+        with st.spinner("Chargement des miniatures…"):
+            images = thumbnails(df["image_lien"].head(MINIATURES).tolist())
+        table.insert(0, "image", images + [None] * (len(table) - len(images)))
+        config = {"image": st.column_config.ImageColumn("Image", width="small")}
+    st.dataframe(table, width="stretch", column_config=config)
+    fmt = st.radio("Format", available_formats(), format_func=FORMAT_LABELS.get, horizontal=True)
+    if hors_memoire:
+        # Relu par blocs au clic ; la version évite de tout relire pour l'empreinte
+        export = download_args(
+            lambda: (chunk[EXPORT_COLUMNS] for chunk in filtered_chunks()),
+            "coinafrique_nettoye", fmt,
+            version=sources_version(unique, avec_base, (*selected_slugs, *prix_range)),
+            dtypes=dict.fromkeys(EXPORT_COLUMNS, "str"),
+        )
+    else:
+        export = download_args(df[EXPORT_COLUMNS], "coinafrique_nettoye", fmt)
+    st.download_button(f"⬇️ Télécharger les données nettoyées ({FORMAT_LABELS[fmt]})", **export)
@@ -14,7 +14,7 @@ with col1:
     st.link_button(
         "📋 Ouvrir Google Forms",
         GOOGLE_FORM_URL,
-        use_container_width=True,
+        width="stretch",
     )
 
 with col2:
@@ -23,7 +23,7 @@ with col2:
     st.link_button(
         "📋 Ouvrir Kobo Toolbox",
         KOBO_FORM_URL,
-        use_container_width=True,
+        width="stretch",
     )
 
 
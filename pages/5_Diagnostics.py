@@ -0,0 +1,67 @@
+import pandas as pd
+import streamlit as st
+import plotly.express as px
+
+from utils.metrics import METRICS, RUN_SPANS
+
+st.title("🩺 Diagnostics")
+st.markdown(
+    "Temps passé par étape (réseau, parsing, dédoublonnage, écriture SQLite, chargements) "
+    "depuis le démarrage du serveur, toutes sessions confondues."
+)
+
+resume = pd.DataFrame(METRICS.summary())
+
+# ── Métriques globales ──
+c1, c2, c3 = st.columns(3)
+c1.metric("Étapes mesurées", f"{int(resume['count'].sum()) if len(resume) else 0:,}")
+c2.metric("Erreurs",         f"{int(resume['errors'].sum()) if len(resume) else 0:,}")
+c3.metric("Exécutions",      f"{len(METRICS.events(RUN_SPANS)):,}")
+
+if resume.empty:
+    st.info("Aucune mesure pour l'instant : lancez un scraping ou ouvrez le dashboard.")
+else:
+    # ── Latence et erreurs par étape ──
+    st.markdown("---")
+    st.subheader("Latence et erreurs par étape")
+    table = resume.rename(columns={
+        "span": "Étape", "count": "Appels", "errors": "Erreurs", "error_rate": "Taux d'erreur",
+    })
+    for col, label in (("mean", "Moyenne"), ("p50", "p50"), ("p95", "p95"), ("max", "Max")):
+        table[f"{label} (ms)"] = (table.pop(col) * 1000).round(1)
+    table["Taux d'erreur"] = (table["Taux d'erreur"] * 100).round(1).astype(str) + " %"
+    st.dataframe(table, width="stretch", hide_index=True)
+
+    etape = st.selectbox("Histogramme de latence", resume["span"],
+                         index=int((resume["count"] * resume["mean"]).argmax()))
+    seaux = pd.DataFrame(METRICS.histogram(etape), columns=["Durée", "Appels"])
+    fig = px.bar(seaux, x="Durée", y="Appels", color_discrete_sequence=["#FF6B35"])
+    fig.update_layout(plot_bgcolor="white", paper_bgcolor="white", margin=dict(t=20))
+    st.plotly_chart(fig, width="stretch")
+
+    # ── Exécutions récentes ──
+    st.markdown("---")
+    st.subheader("Exécutions récentes")
+    runs = pd.DataFrame(METRICS.events(RUN_SPANS, limit=50))
+    if runs.empty:
+        st.caption("Aucun scraping terminé depuis le démarrage.")
+    else:
+        runs["start"] = pd.to_datetime(runs["start"], unit="s").dt.strftime("%d/%m %H:%M:%S")
+        st.dataframe(runs.dropna(axis=1, how="all"), width="stretch", hide_index=True)
+
+    erreurs = pd.DataFrame([e for e in METRICS.events() if not e["ok"]][:50])
+    if not erreurs.empty:
+        st.subheader("Erreurs récentes")
+        erreurs["start"] = pd.to_datetime(erreurs["start"], unit="s").dt.strftime("%d/%m %H:%M:%S")
+        st.dataframe(erreurs.dropna(axis=1, how="all"), width="stretch", hide_index=True)
+
+# ── Export ──
+st.markdown("---")
+c1, c2, c3 = st.columns(3)
+c1.download_button("⬇️ Prometheus", data=METRICS.to_prometheus, file_name="coinafrique_metrics.prom",
+                   mime="text/plain", width="stretch")
+c2.download_button("⬇️ JSON lines", data=METRICS.to_jsonl, file_name="coinafrique_metrics.jsonl",
+                   mime="application/x-ndjson", width="stretch")
+if c3.button("🗑️ Réinitialiser", width="stretch"):
+    METRICS.reset()
+    st.rerun()
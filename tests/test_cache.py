@@ -0,0 +1,56 @@
+import os
+import time
+import zlib
+
+import pytest
+
+from utils.cache import PageCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.db"), ttl=60)
+    yield cache
+    cache.close()
+
+
+def test_roundtrip(cache):
+    rows = [{"nom": "Chemise", "prix": "5 000 CFA"}]
+    cache.put("u1", "<html>é</html>".encode(), rows, etag='"abc"', last_modified="Mon")
+    entry = cache.get("u1")
+    assert entry.text == "<html>é</html>"
+    assert entry.rows == rows
+    assert entry.validators() == {"If-None-Match": '"abc"', "If-Modified-Since": "Mon"}
+    assert cache.get("absente") is None
+
+
+def test_ttl(cache, monkeypatch):
+    cache.put("u1", b"page", None)
+    entry = cache.get("u1")
+    assert entry.is_fresh(cache.ttl)
+
+    later = time.time() + cache.ttl + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert not entry.is_fresh(cache.ttl)
+    # Revalidation (304) : l'entrée redevient fraîche, corps et parsing gardés
+    cache.touch("u1")
+    entry = cache.get("u1")
+    assert entry.is_fresh(cache.ttl) and entry.body == b"page" and entry.rows is None
+
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    body = os.urandom(1000)             # incompressible : taille stockée connue
+    size = len(zlib.compress(body))
+    cache = PageCache(str(tmp_path / "pages.db"), max_bytes=3 * size)
+    clock = iter(range(1, 100))
+    monkeypatch.setattr(time, "time", lambda: float(next(clock)))
+    try:
+        for url in ("a", "b", "c"):
+            cache.put(url, body, None)
+        cache.get("a")                  # « b » devient la moins récemment lue
+        cache.put("d", body, None)
+        assert cache.get("b") is None
+        assert all(cache.get(url) is not None for url in ("a", "c", "d"))
+        assert cache.stats() == {"entries": 3, "bytes": 3 * size}
+    finally:
+        cache.close()
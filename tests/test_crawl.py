@@ -0,0 +1,57 @@
+import pytest
+
+from bench.stub_server import StubServer
+from utils.crawl import crawl, main
+from utils.database import get_connection
+
+PLAN = {"vetements-homme": range(1, 4), "chaussures-enfants": range(1, 4)}
+LONG_PLAN = {slug: range(1, 9) for slug in PLAN}
+
+
+@pytest.fixture(scope="module")
+def server():
+    with StubServer() as server:
+        yield server
+
+
+def test_one_save_per_category(server, tmp_path):
+    db = str(tmp_path / "annonces.db")
+    report = crawl(PLAN, db_path=db, workers=4, rate=1000, base_url=server.base_url,
+                   use_cache=False)
+    conn = get_connection(db)
+    try:
+        # Un relevé de prix par catégorie, pas un par page
+        assert conn.execute("SELECT COUNT(*) FROM prix_releves").fetchone()[0] == len(PLAN)
+        stored = conn.execute("SELECT COUNT(*) FROM annonces").fetchone()[0]
+    finally:
+        conn.close()
+    assert report["total"]["pages"] == 6
+    # Lignes de même clé d'annonce dans une catégorie : une seule en base
+    assert 0 < report["total"]["inserted"] == stored <= report["total"]["rows"]
+
+
+def test_failed_pages_name_category(tmp_path):
+    with StubServer(error_rate=1.0) as server:
+        report = crawl(PLAN, workers=4, rate=1000, base_url=server.base_url, use_cache=False)
+    assert report["fetch"]["failed_pages"] == sorted(
+        (slug, page) for slug, pages in PLAN.items() for page in pages)
+
+
+def test_incremental_stops_at_first_known_page(server, tmp_path):
+    db = str(tmp_path / "annonces.db")
+    crawl(PLAN, db_path=db, workers=4, rate=1000, base_url=server.base_url, use_cache=False)
+
+    before = server.requests
+    report = crawl(LONG_PLAN, db_path=db, workers=4, rate=1000, base_url=server.base_url,
+                   use_cache=False, incremental=True)
+    # Page 1 entièrement connue : chaque catégorie s'arrête là, sans demander la page 2
+    assert all(c["stopped_early"] and c["pages"] == 1 and c["rows"] == 0
+               for c in report["categories"])
+    assert server.requests - before == len(LONG_PLAN)
+
+
+def test_incremental_requires_db(server):
+    with pytest.raises(ValueError):
+        crawl(PLAN, base_url=server.base_url, use_cache=False, incremental=True)
+    with pytest.raises(SystemExit):
+        main(["--incremental", "--no-db"])
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import utils.database as database
+from utils.database import (
+    count_annonces, get_connection, init_db, iter_annonces, load_cube, query_annonces,
+    save_scraped_data,
+)
+
+
+def annonces(*rows) -> pd.DataFrame:
+    """(n, prix, adresse) -> lignes d'annonces de la catégorie vetements-homme."""
+    return pd.DataFrame([
+        {"categorie": "vetements-homme", "nom": f"Article {n}", "prix": prix,
+         "adresse": adresse, "image_lien": f"https://img/{n}_uploaded_image.jpg"}
+        for n, prix, adresse in rows
+    ])
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = get_connection(str(tmp_path / "annonces.db"))
+    init_db(conn)
+    yield conn
+    conn.close()
+
+
+def test_upsert_counts(conn):
+    first = annonces((1, "1 000 CFA", "Dakar"), (2, "2 000 CFA", "Thiès"))
+    assert save_scraped_data(first, conn) == {"inserted": 2, "updated": 0, "unchanged": 0}
+    # Même passage rejoué : rien de neuf
+    assert save_scraped_data(first, conn) == {"inserted": 0, "updated": 0, "unchanged": 2}
+
+    again = annonces((1, "1 500 CFA", "Dakar"), (2, "2 000 CFA", "Thiès"), (3, "3 000 CFA", "Dakar"))
+    assert save_scraped_data(again, conn) == {"inserted": 1, "updated": 1, "unchanged": 1}
+    assert conn.execute("SELECT COUNT(*) FROM annonces").fetchone()[0] == 3
+    assert save_scraped_data(annonces(), conn) == {"inserted": 0, "updated": 0, "unchanged": 0}
+
+
+def test_cube_follows_upserts(conn):
+    save_scraped_data(annonces((1, "1 000 CFA", "Dakar"), (2, "1 000 CFA", "Dakar")), conn)
+    save_scraped_data(annonces((2, "Prix sur demande", "Dakar")), conn)
+    cube = load_cube(conn)
+    assert cube[["prix_num", "nb"]].values.tolist() == [[1000, 1]]
+
+
+def test_batch_stamps_unique_across_threads(monkeypatch):
+    # Horloge figée : seul le verrou garantit des horodatages distincts
+    monkeypatch.setattr(database.time, "time", lambda: 1_700_000_000.0)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        stamps = list(pool.map(lambda _: database._batch_stamp(), range(2_000)))
+    assert len(set(stamps)) == len(stamps)
+
+
+@pytest.fixture
+def filled(conn):
+    """Six annonces sur deux catégories, dont une sans prix."""
+    homme = annonces((1, "1 000 CFA", "Ngor, Dakar, Sénégal"), (2, "5 000 CFA", "Thiès, Sénégal"),
+                     (3, "Prix sur demande", "Dakar, Sénégal"))
+    enfant = annonces((4, "2 000 CFA", "Dakar, Sénégal"), (5, "8 000 CFA", "Thiès, Sénégal"),
+                      (6, "3 000 CFA", "Mbour, Sénégal"))
+    enfant["categorie"] = "vetements-enfants"
+    save_scraped_data(pd.concat([homme, enfant], ignore_index=True), conn)
+    return conn
+
+
+@pytest.mark.parametrize("filters, noms", [
+    ({}, [1, 2, 3, 4, 5, 6]),
+    ({"categories": ["vetements-enfants"]}, [4, 5, 6]),
+    ({"prix_min": 2_000}, [2, 4, 5, 6]),
+    ({"prix_max": 2_000}, [1, 4]),
+    ({"prix_min": 2_000, "prix_max": 5_000, "villes": ["Thiès", "Dakar"]}, [2, 4]),
+    ({"quartiers": ["Ngor"]}, [1]),
+    ({"categories": []}, [1, 2, 3, 4, 5, 6]),
+])
+def test_filters_agree_with_count(filled, filters, noms):
+    df = query_annonces(filled, limit=None, order="prix_asc", **filters)
+    assert sorted(df["nom"]) == [f"Article {n}" for n in noms]
+    assert count_annonces(filled, **filters) == len(df)
+
+
+def test_pagination(filled):
+    pages = [query_annonces(filled, limit=2, offset=offset, order="prix_desc",
+                            columns=["nom", "prix_num"]) for offset in (0, 2, 4)]
+    assert [df["prix_num"].tolist() for df in pages][:2] == [[8000, 5000], [3000, 2000]]
+    assert pd.concat(pages)["nom"].tolist() == query_annonces(
+        filled, limit=None, order="prix_desc")["nom"].tolist()
+    chunks = list(iter_annonces(filled, chunk_rows=4, columns=["nom"]))
+    assert [len(chunk) for chunk in chunks] == [4, 2]
+
+
+def test_unknown_columns_rejected(filled):
+    with pytest.raises(ValueError):
+        query_annonces(filled, columns=["nom", "1; DROP TABLE annonces"])
+    with pytest.raises(ValueError):
+        next(iter_annonces(filled, columns=["sqlite_version()"]))
+    assert count_annonces(filled) == 6
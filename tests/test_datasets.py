@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+import utils.datasets as datasets
+from utils.database import get_connection, init_db, save_scraped_data
+
+CSV = "vetements_hommes.csv"
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    """Dossier data/ d'un seul CSV et cache vide, dans tmp_path."""
+    directory = tmp_path / "data"
+    directory.mkdir()
+    (directory / CSV).write_text(
+        "nom,prix,adresse\nChemise,1 000 CFA,Dakar\nPantalon,,Thiès\n", encoding="utf-8")
+    monkeypatch.setattr(datasets, "DATA_DIR", str(directory))
+    monkeypatch.setattr(datasets, "CACHE_DIR", str(tmp_path / "cache"))
+    datasets.STORE.invalidate()
+    yield directory / CSV
+    monkeypatch.undo()
+    datasets.STORE.invalidate()
+
+
+def stored_names() -> set[str]:
+    return set(datasets.STORE._frames)
+
+
+def test_csv_edit_invalidates_store(data):
+    key = data.stem
+    assert datasets.dataset_stats(key)["rows"] == 2
+    assert len(datasets.preview(key)) == 2
+    assert len(datasets.load_all()) == 2
+
+    with open(data, "a", encoding="utf-8") as f:
+        f.write("Veste,5 000 CFA,Dakar\n")
+    assert datasets.dataset_stats(key)["rows"] == 3
+    assert len(datasets.preview(key)) == 3
+    assert len(datasets.load_all()) == 3
+    # Une entrée par jeu, pas une par version du CSV
+    assert {name for name in stored_names() if key in name} == {
+        f"stats:{key}", f"preview:{key}:20", f"canonical:{key}"}
+
+
+def test_db_save_invalidates_store(tmp_path):
+    db = str(tmp_path / "annonces.db")
+    conn = get_connection(db)
+    init_db(conn)
+    try:
+        assert datasets.load_scraped(db).empty
+        save_scraped_data(pd.DataFrame([{
+            "categorie": "vetements-homme", "nom": "Chemise", "prix": "1 000 CFA",
+            "adresse": "Dakar", "image_lien": "https://img/1_uploaded_image.jpg"}]), conn)
+        assert datasets.load_scraped(db)["nom"].tolist() == ["Chemise"]
+    finally:
+        conn.close()
+        datasets.STORE.invalidate("scraped")
+
+
+def test_store_views_are_independent(data):
+    view = datasets.load_all()
+    view.loc[0, "nom"] = "Modifié"
+    assert datasets.load_all().loc[0, "nom"] == "Chemise"
+
+
+def test_dataset_stats_by_chunks(data, monkeypatch):
+    monkeypatch.setattr(datasets, "STATS_CHUNK_ROWS", 1)
+    key = data.stem
+    assert datasets.dataset_stats(key) == {
+        "rows": 2, "columns": 3, "nulls": {"nom": 0, "prix": 1, "adresse": 0}, "missing": 1}
+
+    # Gardées sur disque : un nouveau processus (registre vide) ne relit pas le CSV
+    datasets.STORE.invalidate()
+    monkeypatch.setattr(datasets, "_compute_stats", lambda spec: pytest.fail("CSV relu"))
+    assert datasets.dataset_stats(key)["rows"] == 2
+
+
+def test_preview_reads_only_the_head(data):
+    with open(data, "a", encoding="utf-8") as f:
+        f.writelines(f"Article {n},{n} 000 CFA,Dakar\n" for n in range(100))
+    head = datasets.preview(data.stem, 5)
+    assert len(head) == 5
+    assert head.columns.tolist() == ["nom", "prix", "adresse"]
+    assert head["nom"].tolist()[:2] == ["Chemise", "Pantalon"]
@@ -0,0 +1,68 @@
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import utils.export as export
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+DTYPES = {"nom": "str", "prix": "str"}
+
+
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def frame(n, prix="1 000 CFA") -> pd.DataFrame:
+    return pd.DataFrame({"nom": [f"Article {i}" for i in range(n)], "prix": [prix] * n})
+
+
+@pytest.mark.parametrize("fmt", export.available_formats())
+def test_empty_chunks(fmt):
+    path = export.export_file(iter([]), "vide", fmt, version="v1", dtypes=DTYPES)
+    df = pd.read_parquet(path) if fmt == "parquet" else pd.read_csv(path)
+    assert list(df.columns) == list(DTYPES) and df.empty
+    # Sans types : fichier créé quand même
+    assert os.path.exists(export.export_file(iter([]), "vide", fmt, version="v2"))
+
+
+def test_parquet_schema_from_dtypes():
+    # Second bloc entièrement vide : type objet / null au lieu de chaîne
+    chunks = [frame(3), pd.DataFrame({"nom": ["x"], "prix": [None]}, dtype=object)]
+    path = export.export_file(iter(chunks), "nulls", "parquet", version="v1", dtypes=DTYPES)
+    df = pd.read_parquet(path)
+    assert len(df) == 4 and df["prix"].isna().sum() == 1
+
+
+def test_concurrent_exports_same_version():
+    df = frame(20_000)
+    paths, errors = [], []
+
+    def run():
+        try:
+            paths.append(export.export_file(iter([df]), "meme", "csv", version="v1"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and len(set(paths)) == 1
+    pd.testing.assert_frame_equal(pd.read_csv(paths[0]), df)
+    assert not [n for n in os.listdir(export.EXPORT_DIR) if n.endswith(".tmp")]
+
+
+def test_keeps_last_versions(export_dir):
+    for i in range(export.KEEP_VERSIONS + 2):
+        path = export.export_file(frame(1), "hist", "csv", version=f"v{i}")
+        os.utime(path, (i, i))
+    export.export_file(frame(1), "hist-autre", "csv", version="v0")
+    names = sorted(os.listdir(export_dir))
+    kept = [f"hist-v{i}.csv" for i in range(2, export.KEEP_VERSIONS + 2)]
+    assert names == sorted(kept + ["hist-autre-v0.csv"])
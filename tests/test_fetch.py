@@ -0,0 +1,105 @@
+import gzip
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import utils.scraper as scraper
+from bench.stub_server import StubServer
+from utils.scraper import FetchStats, fetch
+
+
+class ScriptedServer:
+    """Serveur local répondant dans l'ordre les (statut, en-têtes, corps) de `script`."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.requests += 1
+                status, headers, body = stub.script.pop(0)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        self.url = "http://127.0.0.1:%d/categorie/vetements-homme" % self._httpd.server_address[1]
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Délais demandés entre deux tentatives, sans attendre."""
+    delays = []
+    monkeypatch.setattr(scraper.time, "sleep", delays.append)
+    return delays
+
+
+def test_503_recovered_within_retry_budget():
+    stats = FetchStats()
+    with StubServer(error_rate=0.5, seed=3) as server:
+        for page in range(1, 21):
+            response = fetch(f"{server.base_url}vetements-homme?page={page}", stats=stats,
+                             max_retries=10)
+            assert response.status_code == 200
+        requests_made = server.requests
+    assert stats.retries > 0
+    assert stats.requests == requests_made == 20 + stats.retries
+
+
+@pytest.mark.parametrize("http_date", [False, True])
+def test_retry_after(sleeps, http_date):
+    # Date HTTP à la seconde près : délai entre 18 et 20 s
+    retry_after, low, high = "7", 7, 7
+    if http_date:
+        retry_after, low, high = formatdate(time.time() + 20, usegmt=True), 18, 20
+    server = ScriptedServer((503, {"Retry-After": retry_after}, b""), (200, {}, b"ok"))
+    stats = FetchStats()
+    try:
+        assert fetch(server.url, stats=stats).text == "ok"
+    finally:
+        server.close()
+    assert len(sleeps) == 1 and low <= sleeps[0] <= high
+    assert (stats.requests, stats.retries) == (2, 1)
+
+
+def test_permanent_4xx_not_retried(sleeps):
+    server = ScriptedServer((404, {}, b"absente"), (200, {}, b"ok"))
+    stats = FetchStats()
+    try:
+        with pytest.raises(requests.HTTPError):
+            fetch(server.url, stats=stats)
+        assert server.requests == 1
+    finally:
+        server.close()
+    assert sleeps == []
+    assert (stats.requests, stats.retries) == (1, 0)
+
+
+def test_bytes_counted_on_the_wire():
+    body = gzip.compress(b"<html></html>" * 1000)
+    server = ScriptedServer((200, {"Content-Encoding": "gzip"}, body))
+    stats = FetchStats()
+    try:
+        assert len(fetch(server.url, stats=stats).content) == 13000
+    finally:
+        server.close()
+    assert stats.bytes == len(body)
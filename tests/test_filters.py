@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.filters import FilterIndex
+
+DF = pd.DataFrame({
+    "categorie": ["a", "b", None, "c", "a", "c", None, "b"],
+    "prix_num": pd.array([1_000, 5_000, 2_000, None, 3_000, 8_000, None, 2_000], dtype="Int64"),
+})
+
+
+def pandas_filter(categories, prix_min, prix_max) -> np.ndarray:
+    mask = DF["prix_num"].notna()
+    if categories is not None:
+        mask &= DF["categorie"].isin(categories)
+    if prix_min is not None:
+        mask &= DF["prix_num"] >= prix_min
+    if prix_max is not None:
+        mask &= DF["prix_num"] <= prix_max
+    return np.flatnonzero(mask.fillna(False).to_numpy(dtype=bool))
+
+
+@pytest.mark.parametrize("categories", [None, [], ["a"], ["c"], ["a", "c"], ["b", "inconnue"]])
+@pytest.mark.parametrize("prix_min, prix_max", [
+    (None, None), (2_000, None), (None, 2_000), (2_000, 5_000), (6_000, 1_000)])
+def test_matches_pandas_filter(categories, prix_min, prix_max):
+    index = FilterIndex(DF)
+    expected = pandas_filter(categories, prix_min, prix_max)
+    assert index.select(categories, prix_min, prix_max).tolist() == expected.tolist()
+    # Deuxième appel servi par le cache : même résultat
+    assert index.select(categories, prix_min, prix_max).tolist() == expected.tolist()
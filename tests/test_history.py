@@ -0,0 +1,78 @@
+import time
+
+import pandas as pd
+import pytest
+
+import utils.database as database
+from utils.history import history_summary, rolling_median, trajectory
+from utils.normalize import listing_keys
+
+DAY = 86400
+T0 = pd.Timestamp("2024-01-01 12:00").timestamp()
+
+
+def annonces(*rows) -> pd.DataFrame:
+    """(n, prix) -> annonces de la catégorie vetements-homme, à Dakar."""
+    return pd.DataFrame([
+        {"categorie": "vetements-homme", "nom": f"Article {n}", "prix": prix,
+         "adresse": "Dakar", "image_lien": f"https://img/{n}_uploaded_image.jpg"}
+        for n, prix in rows
+    ])
+
+
+@pytest.fixture
+def save(tmp_path, monkeypatch):
+    """save(jour, *lignes) : sauvegarde datée de T0 + jour."""
+    conn = database.get_connection(str(tmp_path / "annonces.db"))
+    database.init_db(conn)
+    monkeypatch.setattr(database, "_last_stamp", 0.0)
+    clock = [T0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+
+    def save(day, *rows):
+        clock[0] = T0 + day * DAY
+        database.save_scraped_data(annonces(*rows), conn)
+
+    save.conn = conn
+    yield save
+    conn.close()
+
+
+def key(n) -> str:
+    return listing_keys(annonces((n, "")))[0]
+
+
+def test_trajectory(save):
+    save(0, (1, "1 000 CFA"))
+    save(1, (1, "1 000 CFA"))
+    save(2, (1, "1 500 CFA"))
+    save(3, (1, "Prix sur demande"))
+
+    traj = trajectory(save.conn, "vetements-homme", key(1))
+    assert traj["prix_num"].tolist() == [1000, 1000, 1500, pd.NA]
+    assert traj["change"].tolist() == [True, False, True, True]
+    assert traj["t"].tolist() == [pd.Timestamp(T0 + d * DAY, unit="s") for d in range(4)]
+
+    summary = history_summary(save.conn)
+    assert (summary["annonces"], summary["releves"], summary["observations"],
+            summary["changements"]) == (1, 4, 4, 2)
+    # Prix inchangé : aucun prix écrit dans l'historique
+    assert save.conn.execute(
+        "SELECT COUNT(*) FROM prix_historique WHERE prix IS NULL").fetchone()[0] == 1
+
+
+def test_rolling_median(save):
+    save(0, (1, "1 000 CFA"), (2, "3 000 CFA"))
+    save(2, (1, "2 000 CFA"))
+    save(10, (2, "4 000 CFA"))
+
+    out = rolling_median(save.conn, window="7D", freq="1D").set_index("date")
+    day = lambda d: pd.Timestamp(T0 + d * DAY, unit="s").floor("1D")
+    # Jour 1 : pas de relevé, la fenêtre reprend ceux du jour 0
+    assert out.loc[day(0), ["prix_median", "nb_annonces"]].tolist() == [2000, 2]
+    assert out.loc[day(1), ["prix_median", "nb_annonces"]].tolist() == [2000, 2]
+    # Annonce 1 comptée une fois, à son dernier prix
+    assert out.loc[day(2), ["prix_median", "nb_annonces"]].tolist() == [2500, 2]
+    # Jour 10 : les relevés des jours 0 et 2 sont sortis de la fenêtre
+    assert out.loc[day(10), ["prix_median", "nb_annonces"]].tolist() == [4000, 1]
+    assert day(9) not in out.index
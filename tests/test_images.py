@@ -0,0 +1,32 @@
+import io
+
+import pytest
+import requests
+from PIL import Image
+
+from utils.images import ImageDecodeError, hamming, is_permanent, make_thumbnail
+
+
+def jpeg(size=(400, 300), color=(200, 40, 40)) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", size, color).save(out, "JPEG")
+    return out.getvalue()
+
+
+def test_thumbnail():
+    thumb, phash, width, height = make_thumbnail(jpeg())
+    assert (width, height) == (400, 300)
+    assert max(Image.open(io.BytesIO(thumb)).size) <= 160
+    assert hamming(phash, make_thumbnail(jpeg(color=(201, 40, 40)))[1]) <= 4
+
+
+@pytest.mark.parametrize("data", [b"pas une image", jpeg()[:600]], ids=["inconnu", "tronque"])
+def test_unreadable_images_are_permanent(data):
+    with pytest.raises(ImageDecodeError) as info:
+        make_thumbnail(data)
+    assert is_permanent(info.value)
+
+
+def test_network_errors_are_retried():
+    assert not is_permanent(requests.ConnectionError("reset"))
+    assert not is_permanent(OSError("disque plein"))
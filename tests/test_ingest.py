@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from utils.datasets import CAT_LABELS
+from utils.ingest import discover, read
+
+START_URL = "https://sn.coinafrique.com/categorie/chaussures-enfants"
+
+
+@pytest.fixture
+def data(tmp_path):
+    """discover(fichiers) : écrit les CSV {nom: (octets)} dans tmp_path/data et les détecte."""
+    directory = tmp_path / "data"
+    directory.mkdir()
+
+    def discover_files(files: dict) -> dict:
+        for name, content in files.items():
+            (directory / name).write_bytes(content)
+        specs = discover(str(directory), str(tmp_path / "cache"), CAT_LABELS)
+        return {spec.filename: spec for spec in specs}
+
+    discover_files.dir = str(directory)
+    return discover_files
+
+
+def test_encoding_and_separator(data):
+    specs = data({
+        "vetements_hommes.csv": "\ufeffnom,prix,adresse\nChemise,1 000 CFA,Dakar\n".encode(),
+        "vetements_enfants.csv": "Titre;Prix;Localisation\nRobe été;2 000 CFA;Thiès\n".encode("cp1252"),
+    })
+    hommes, enfants = specs["vetements_hommes.csv"], specs["vetements_enfants.csv"]
+    assert (hommes.encoding, hommes.sep) == ("utf-8-sig", ",")
+    assert (enfants.encoding, enfants.sep) == ("cp1252", ";")
+    df = read(enfants, data.dir)
+    assert df.to_dict("records") == [{"nom": "Robe été", "prix": "2 000 CFA", "adresse": "Thiès"}]
+
+
+def test_header_aliases(data):
+    spec = data({
+        "chaussures_hommes.csv": (
+            "web-scraper-order,Type chaussure,Prix,Localisation,Image-src\n"
+            "1-1,Basket,5 000 CFA,Dakar,https://img/1.jpg\n").encode(),
+    })["chaussures_hommes.csv"]
+    assert spec.columns == {"Type chaussure": "nom", "Prix": "prix",
+                            "Localisation": "adresse", "Image-src": "image_lien"}
+    # Les métadonnées Web Scraper ne sont pas lues
+    assert list(read(spec, data.dir).columns) == ["nom", "prix", "adresse", "image_lien"]
+
+
+def test_category_from_start_url_then_file_name(data):
+    specs = data({
+        # URL de départ prioritaire sur le nom du fichier
+        "export_1.csv": f"web-scraper-start-url,nom,prix\n{START_URL},Sandale,1 000 CFA\n".encode(),
+        "chaussures_hommes_ws.csv": b"nom,prix\nBasket,5 000 CFA\n",
+    })
+    assert specs["export_1.csv"].categorie == "chaussures-enfants"
+    assert specs["chaussures_hommes_ws.csv"].categorie == "chaussures-homme"
+
+
+def test_rejected_files(data):
+    specs = data({
+        "meubles.csv": b"nom,prix\nTable,10 000 CFA\n",                  # catégorie inconnue
+        "vetements_hommes.csv": b"nom,adresse\nChemise,Dakar\n",          # pas de prix
+    })
+    assert {name: spec.categorie for name, spec in specs.items()} == {
+        "meubles.csv": None, "vetements_hommes.csv": None}
+
+
+def test_changed_file_is_inspected_again(data):
+    name = "vetements_hommes.csv"
+    assert data({name: b"nom,prix\nChemise,1 000 CFA\n"})[name].sep == ","
+    spec = data({name: b"nom;prix;adresse\nChemise;1 000 CFA;Dakar\n"})[name]
+    assert spec.sep == ";" and spec.signature[0] == os.path.getsize(os.path.join(data.dir, name))
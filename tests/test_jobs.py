@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+import utils.jobs as jobs
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """JobManager à une tâche à la fois ; le scraping factice attend `release` à chaque page."""
+    started, release, calls = threading.Event(), threading.Event(), []
+
+    def iter_scrape(slug, pages, **kwargs):
+        calls.append(slug)
+        for page in range(1, pages + 1):
+            started.set()
+            release.wait(5)
+            yield page, [{"categorie": slug, "nom": f"Article {page}", "prix": "1 000 CFA"}]
+
+    monkeypatch.setattr(jobs, "iter_scrape", iter_scrape)
+    monkeypatch.setattr(jobs, "get_page_cache", lambda offline: None)
+    manager = jobs.JobManager(str(tmp_path / "jobs.db"), max_jobs=1)
+    manager.started, manager.release, manager.calls = started, release, calls
+    yield manager
+    release.set()
+    manager._pool.shutdown(wait=True)
+
+
+def test_cancel_queued_job_never_runs(manager):
+    first = manager.submit("vetements-homme", 2, auto_save=False, near_dedupe=False)
+    assert manager.started.wait(5)
+    queued = manager.submit("chaussures-homme", 2, auto_save=False, near_dedupe=False)
+    assert manager.cancel(queued)
+    manager.release.set()
+    manager._pool.shutdown(wait=True)
+
+    assert manager.status(first)["status"] == "done"
+    assert manager.status(queued)["status"] == "cancelled"
+    assert manager.calls == ["vetements-homme"]
+    assert manager.results(queued).empty
+    assert not manager.has_active()
@@ -0,0 +1,54 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.metrics import PREFIX, Metrics
+
+
+def test_span_timing_and_errors():
+    metrics = Metrics()
+    with metrics.span("fetch", categorie="vetements-homme") as labels:
+        time.sleep(0.02)
+        labels["rows"] = 84
+    with pytest.raises(RuntimeError):
+        with metrics.span("fetch"):
+            raise RuntimeError("503")
+
+    (row,) = metrics.summary()
+    assert (row["span"], row["count"], row["errors"], row["error_rate"]) == ("fetch", 2, 1, 0.5)
+    assert 0.02 <= row["max"] < 1
+    ok, failed = metrics.events()[::-1]
+    assert ok["ok"] and ok["categorie"] == "vetements-homme" and ok["rows"] == 84
+    assert not failed["ok"] and failed["error"] == "RuntimeError: 503"
+
+
+def test_prometheus_format():
+    metrics = Metrics()
+    metrics.record("save", 0.003)
+    metrics.record("save", 0.2, error="OperationalError: locked")
+    text = metrics.to_prometheus()
+    assert f"# TYPE {PREFIX}_span_seconds histogram" in text
+    assert f'{PREFIX}_span_seconds_bucket{{span="save",le="0.001"}} 0' in text
+    assert f'{PREFIX}_span_seconds_bucket{{span="save",le="0.005"}} 1' in text
+    assert f'{PREFIX}_span_seconds_bucket{{span="save",le="0.25"}} 2' in text
+    assert f'{PREFIX}_span_seconds_bucket{{span="save",le="+Inf"}} 2' in text
+    assert f'{PREFIX}_span_seconds_count{{span="save"}} 2' in text
+    assert f'{PREFIX}_span_seconds_sum{{span="save"}} 0.203000' in text
+    assert f'{PREFIX}_span_errors_total{{span="save"}} 1' in text
+    assert text.endswith("\n")
+
+
+def test_jsonl_log_from_threads(tmp_path):
+    log = tmp_path / "metrics.jsonl"
+    metrics = Metrics(str(log))
+    labels = {f"label_{i}": "x" * 200 for i in range(20)}   # lignes longues
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: metrics.record("page", 0.01, labels={"page": i, **labels}),
+                      range(400)))
+    lines = log.read_text(encoding="utf-8").splitlines()
+    assert sorted(json.loads(line)["page"] for line in lines) == list(range(400))
+    # Export JSONL : mêmes événements, ordre chronologique
+    exported = [json.loads(line) for line in metrics.to_jsonl().splitlines()]
+    assert [e["page"] for e in exported] == [e["page"] for e in reversed(metrics.events())]
@@ -0,0 +1,70 @@
+import pandas as pd
+
+from utils.neardup import NearDupIndex
+
+
+def annonces(*rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["nom", "prix", "adresse", "image_lien"])
+
+
+BASE = annonces(("Chemise en lin blanche manches longues", "10 000 CFA", "Ngor, Dakar, Sénégal",
+                 "https://img/1_uploaded_image.jpg"))
+
+
+def test_parent_index():
+    parent = NearDupIndex()
+    parent.add(BASE)
+    index = NearDupIndex(parent=parent)
+    batch = annonces(
+        # Même annonce que la base (même clé) : mise à jour, pas un doublon
+        ("Chemise en lin blanche manches longues", "9 000 CFA", "Ngor, Dakar, Sénégal",
+         "https://img/1_uploaded_image.jpg"),
+        # Titre retouché, autre clé : quasi-doublon de l'annonce de la base
+        ("Chemise en lin blanche manches longues !", "10 000 CFA", "Ngor, Dakar, Sénégal", None),
+        ("Sandales cuir enfant", "5 000 CFA", "Thiès, Sénégal", None),
+    )
+    assert index.add(batch).tolist() == [False, True, False]
+    # Le parent n'est pas modifié
+    assert len(parent) == 1
+
+
+def reposted(phash_a, phash_b) -> pd.DataFrame:
+    """Annonce republiée : autre identifiant d'image, titre retouché, même prix."""
+    df = annonces(
+        ("Chemise en lin blanche manches longues", "10 000 CFA", "Ngor, Dakar, Sénégal",
+         "https://img/1_uploaded_image.jpg"),
+        ("Chemise lin blanche manches longues !", "10 000 CFA", "Ngor, Dakar, Sénégal",
+         "https://img/2_uploaded_image.jpg"),
+    )
+    df["image_phash"] = [phash_a, phash_b]
+    return df
+
+
+def test_reposted_listing_across_image_ids():
+    phash = 0x0F0F_3C3C_A5A5_5A5A
+    # Empreintes à 3 bits près : même photo, recompressée
+    assert NearDupIndex().add(reposted(phash, phash ^ 0b1011)).tolist() == [False, True]
+    # Autre photo, ou empreinte inconnue : deux annonces distinctes
+    assert NearDupIndex().add(reposted(phash, ~phash)).tolist() == [False, False]
+    assert NearDupIndex().add(reposted(phash, None)).tolist() == [False, False]
+    # Même photo, autre prix : distinctes aussi
+    df = reposted(phash, phash)
+    df.loc[1, "prix"] = "12 000 CFA"
+    assert NearDupIndex().add(df).tolist() == [False, False]
+
+
+def test_image_hashes_resolver_and_parent():
+    phash = 0x0F0F_3C3C_A5A5_5A5A
+    df = reposted(None, None)
+    asked = []
+
+    def image_hashes(urls):
+        asked.extend(urls)
+        return dict.fromkeys(urls, phash)
+
+    parent = NearDupIndex(image_hashes=image_hashes)
+    assert parent.add(df.iloc[:1]).tolist() == [False]
+    # Empreinte lue sur la colonne quand elle est connue : pas de demande
+    child = NearDupIndex(parent=parent, image_hashes=image_hashes)
+    assert child.add(reposted(None, phash).iloc[1:]).tolist() == [True]
+    assert asked == ["https://img/1_uploaded_image.jpg"]
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from utils.normalize import prix_to_int, split_adresses
+
+
+def test_prix_to_int():
+    prix = pd.Series(["45 000 CFA", "8 000CFA", "1.250.000 FCFA", "Prix sur demande", None,
+                      "45 000 CFA"])
+    assert prix_to_int(prix).tolist() == [45000, 8000, 1250000, pd.NA, pd.NA, 45000]
+    assert str(prix_to_int(prix).dtype) == "Int64"
+
+
+def test_split_adresses():
+    adresse = pd.Series(["Ngor, Dakar, Sénégal", " Dakar ,Sénégal", "Sénégal", None])
+    parts = split_adresses(adresse)
+    assert parts.columns.tolist() == ["quartier", "ville", "pays"]
+    assert parts.values.tolist() == [
+        ["Ngor", "Dakar", "Sénégal"],
+        [pd.NA, "Dakar", "Sénégal"],
+        [pd.NA, pd.NA, "Sénégal"],
+        [pd.NA, pd.NA, pd.NA],
+    ]
@@ -0,0 +1,87 @@
+import os
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+import utils.datasets as datasets
+from utils import outofcore
+from utils.aggregates import build_cube, usable
+
+CHUNK_ROWS = 2_000
+REPEAT = 10     # copies des CSV de data/ : ~116 000 lignes, ~60 blocs
+
+
+@pytest.fixture
+def big_data(tmp_path, monkeypatch):
+    """CSV de data/ répliqués REPEAT fois, cache Parquet vide, dans tmp_path."""
+    data, cache = tmp_path / "data", tmp_path / "cache"
+    data.mkdir()
+    for spec in datasets.specs().values():
+        src = os.path.join(datasets.DATA_DIR, spec.filename)
+        with open(src, encoding=spec.encoding) as f:
+            header, *lines = f.read().splitlines(keepends=True)
+        if lines and not lines[-1].endswith("\n"):
+            lines[-1] += "\n"
+        with open(data / spec.filename, "w", encoding=spec.encoding) as f:
+            f.write(header)
+            for _ in range(REPEAT):
+                f.writelines(lines)
+    monkeypatch.setattr(datasets, "DATA_DIR", str(data))
+    monkeypatch.setattr(datasets, "CACHE_DIR", str(cache))
+    datasets.STORE.invalidate()
+    yield data
+    monkeypatch.undo()
+    datasets.STORE.invalidate()
+
+
+def traced_peak(fn):
+    """(résultat, pic d'allocations Python en octets) de fn()."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_budget_selects_out_of_core(big_data, monkeypatch):
+    monkeypatch.delenv(outofcore.ENV, raising=False)
+    monkeypatch.setenv(outofcore.BUDGET_ENV, "1")
+    assert outofcore.enabled(avec_base=False)
+    monkeypatch.setenv(outofcore.BUDGET_ENV, "100000")
+    assert not outofcore.enabled(avec_base=False)
+
+
+def test_stream_cube_bounded_memory(big_data):
+    # Flux CSV d'abord : le cache Parquet n'existe pas encore
+    cube, peak = traced_peak(
+        lambda: outofcore.stream_cube(outofcore.iter_webscraper(chunk_rows=CHUNK_ROWS)))
+
+    df = datasets.load_all()
+    assert len(df) > 50 * CHUNK_ROWS
+    full = int(df.memory_usage(deep=True).sum())
+    # Un bloc et le cube, pas les données : bien moins qu'un chargement complet
+    assert peak < full / 4, f"pic {peak} o pour {full} o en mémoire"
+    pd.testing.assert_frame_equal(cube, build_cube(usable(df)))
+
+    # Flux Parquet (écrit par load_all) : même cube, même borne
+    cube, peak = traced_peak(
+        lambda: outofcore.stream_cube(outofcore.iter_webscraper(chunk_rows=CHUNK_ROWS)))
+    assert peak < full / 4, f"pic {peak} o pour {full} o en mémoire"
+    pd.testing.assert_frame_equal(cube, build_cube(usable(df)))
+
+
+def test_stream_totals_and_rows(big_data):
+    df = datasets.load_all()
+    totals = outofcore.stream_totals(outofcore.iter_webscraper(chunk_rows=CHUNK_ROWS))
+    prix = df["prix_num"].dropna()
+    assert totals == {"total": len(df), "prix_count": len(prix),
+                      "prix_sum": int(prix.astype("int64").sum())}
+
+    rows = pd.concat(outofcore.stream_rows(outofcore.iter_webscraper(chunk_rows=CHUNK_ROWS),
+                                           categories=["chaussures-homme"], prix_max=10_000,
+                                           limit=5_000), ignore_index=True)
+    assert len(rows) == 5_000
+    assert set(rows["categorie"]) == {"chaussures-homme"}
+    assert rows["prix_num"].max() <= 10_000
@@ -0,0 +1,68 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bench.stub_server import StubRenderer, StubServer, render_page
+from utils.render import RendererPool
+from utils.scraper import FetchStats, scrape_page
+
+SLUG = "vetements-homme"
+
+
+class Renderer(StubRenderer):
+    """StubRenderer sans délai de démarrage, qui note ses fermetures."""
+
+    closed = []
+
+    def __init__(self):
+        super().__init__(startup=0)
+
+    def close(self):
+        Renderer.closed.append(self)
+        super().close()
+
+
+class BrokenRenderer(Renderer):
+    def render(self, url):
+        raise RuntimeError("navigateur planté")
+
+
+@pytest.fixture
+def fixtures(tmp_path):
+    """Page 1 aux images non résolues, page 2 au-delà de la dernière (sans grille)."""
+    page = re.sub(r'src="[^"]*"', 'src=""', render_page(SLUG, 1))
+    (tmp_path / f"{SLUG}_page1.html").write_text(page, encoding="utf-8")
+    (tmp_path / f"{SLUG}_page2.html").write_text(
+        "<html><body><p>Aucune annonce</p></body></html>", encoding="utf-8")
+    return str(tmp_path)
+
+
+def test_pool_reuses_renderers():
+    Renderer.closed = []
+    with StubServer(js_rate=1.0) as server, RendererPool(Renderer, size=2) as pool:
+        with ThreadPoolExecutor(max_workers=6) as workers:
+            pages = list(workers.map(
+                lambda page: scrape_page(SLUG, page, base_url=server.base_url, renderer=pool),
+                range(1, 25)))
+        assert all(len(rows) == 84 for rows in pages)
+        assert pool.stats()["rendered"] == 24
+        assert 1 <= pool.stats()["started"] <= 2
+    # Fermés à la sortie du pool
+    assert pool.stats()["open"] == 0
+    assert len(Renderer.closed) == pool.stats()["started"]
+
+
+def test_render_failure_keeps_http_rows(fixtures):
+    stats = FetchStats()
+    with StubServer(fixtures=fixtures) as server, RendererPool(BrokenRenderer, size=1) as pool:
+        rows = scrape_page(SLUG, 1, base_url=server.base_url, renderer=pool, stats=stats)
+        assert len(rows) == 84 and not any(row["image_lien"] for row in rows)
+        assert pool.stats()["failures"] == 1 and pool.stats()["open"] == 0
+    assert stats.failed_pages == [] and stats.rendered == 0
+
+
+def test_page_past_the_end_not_rendered(fixtures):
+    with StubServer(fixtures=fixtures) as server, RendererPool(Renderer, size=1) as pool:
+        assert scrape_page(SLUG, 2, base_url=server.base_url, renderer=pool) == []
+        assert pool.stats()["started"] == 0
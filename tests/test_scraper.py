@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from bench.stub_server import StubServer
+from utils.scraper import (
+    HAS_LXML, PARSERS, extract_annonces, get_rate_limiter, iter_scrape, scrape_categorie,
+)
+
+SLUG = "vetements-homme"
+
+CARD = """
+<div class="{cls}">
+  <a href="/annonce/{n}" title="Article {n}"><img class="ad__card-img" src="/img/{n}.jpg"></a>
+  <p class="ad__card-price">{n} 000 CFA</p>
+  <p class="ad__card-location"><span class="material-icons">location_on</span> Dakar</p>
+</div>"""
+
+# Variantes de l'attribut class rencontrées : espaces superflus, classes en plus, ordre
+CLASSES = [
+    "col s6 m4 l3",
+    "col s6 m4 l3 ",
+    "col  s6 m4 l3",
+    " col s6\tm4 l3",
+    "col s6 m4 l3 featured",
+    "l3 m4 s6 col",
+]
+# Ni l'une ni l'autre n'est une carte
+NOT_CARDS = ["col s6 m4", "col-s6 m4 l3"]
+
+
+def page(classes) -> str:
+    cards = "".join(CARD.format(cls=cls, n=n) for n, cls in enumerate(classes, 1))
+    return f"<html><body><div class='row'>{cards}</div></body></html>"
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_backends_find_every_card_variant(parser):
+    if parser == "lxml" and not HAS_LXML:
+        pytest.skip("lxml absent")
+    rows = extract_annonces(page(CLASSES + NOT_CARDS), "vetements-homme", parser)
+    assert [r["nom"] for r in rows] == [f"Article {n}" for n in range(1, len(CLASSES) + 1)]
+
+
+def test_backends_agree():
+    html = page(CLASSES + NOT_CARDS)
+    parsers = [p for p in PARSERS if p != "lxml" or HAS_LXML]
+    reference = extract_annonces(html, "vetements-homme", "html.parser")
+    assert reference
+    for parser in parsers:
+        assert extract_annonces(html, "vetements-homme", parser) == reference, parser
+
+
+def test_rate_limiter_per_host():
+    pages = get_rate_limiter("https://pages.example/categorie/a", 2.0)
+    assert get_rate_limiter("https://pages.example/categorie/b", 2.0) is pages
+    # Même hôte à un autre débit : même seau, au plus bas des débits
+    assert get_rate_limiter("https://pages.example/categorie/c", 4.0) is pages
+    assert pages.rate == 2.0
+    assert get_rate_limiter("https://pages.example/categorie/d", 1.0) is pages
+    assert (pages.rate, pages.capacity) == (1.0, 1.0)
+    images = get_rate_limiter("https://images.example/1.jpg", 8.0)
+    assert images is not pages and images.rate == 8.0
+    assert get_rate_limiter("http://127.0.0.1:1/categorie/a", 2.0) is not pages
+
+
+@pytest.fixture(scope="module")
+def slow_server():
+    with StubServer(latency=0.05) as server:
+        yield server
+
+
+def test_stream_in_page_order(slow_server):
+    base_url = slow_server.base_url
+    pages = [page for page, _ in iter_scrape(SLUG, 12, workers=6, rate=1000, base_url=base_url)]
+    assert pages == list(range(1, 13))
+    # Mêmes lignes, dans le même ordre, qu'un parcours séquentiel
+    streamed = [row for _, rows in iter_scrape(SLUG, 6, workers=6, rate=1000, base_url=base_url)
+                for row in rows]
+    sequential = scrape_categorie(SLUG, 6, workers=1, rate=1000, base_url=base_url)
+    assert streamed == sequential.to_dict("records")
+
+
+def test_stream_window_and_early_close(slow_server):
+    before = slow_server.requests
+    batches = iter_scrape(SLUG, 40, workers=2, rate=1000, base_url=slow_server.base_url)
+    next(batches)
+    time.sleep(0.5)
+    # Consommateur arrêté : au plus 2 × workers pages en vol ou prêtes, plus la page remise
+    assert slow_server.requests - before <= 2 * 2 + 1
+    batches.close()
+    time.sleep(0.3)
+    after_close = slow_server.requests
+    time.sleep(0.3)
+    assert slow_server.requests == after_close < before + 40
+
+
+def test_progress_from_calling_thread(slow_server):
+    calls = []
+    scrape_categorie(SLUG, 5, workers=3, rate=1000, base_url=slow_server.base_url,
+                     progress_callback=lambda done, total: calls.append(
+                         (done, total, threading.get_ident())))
+    assert [(done, total) for done, total, _ in calls] == [(n, 5) for n in range(1, 6)]
+    assert {ident for *_, ident in calls} == {threading.get_ident()}
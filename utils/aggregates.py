@@ -0,0 +1,125 @@
+"""
+Agrégats pré-calculés du dashboard.
+
+Un cube compte les annonces par (catégorie, localité, prix). Il est bien plus
+petit que les données (les prix se répètent) et suffit à répondre exactement
+aux filtres du dashboard : métriques, comptes par catégorie, top localités,
+histogramme et boîtes à moustaches. Les figures reçoivent ces résumés au lieu
+de toutes les lignes.
+
+Le cube des CSV Web Scraper est calculé une fois ; celui de la base est tenu à
+jour par triggers SQLite (utils.database.load_cube).
+"""
+import numpy as np
+import pandas as pd
+
+CUBE_KEYS = ["categorie", "localite", "prix_num"]
+
+
+def usable(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Annonces exploitables au schéma canonique (prix numérique, nom non vide),
+    avec la localité : quartier, sinon ville. Même règle que le cube en base.
+    """
+    df = df.dropna(subset=["prix_num", "nom"]).reset_index(drop=True)
+    df = df[df["nom"].str.strip() != ""]
+    return df.assign(localite=df["quartier"].fillna(df["ville"]))
+
+
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """Cube d'un DataFrame préparé (colonnes categorie, localite, prix_num)."""
+    cube = df.groupby(CUBE_KEYS, dropna=False, observed=True).size().reset_index(name="nb")
+    return cube.astype({"prix_num": "int64"})
+
+
+def merge_cubes(*cubes: pd.DataFrame) -> pd.DataFrame:
+    """Somme de plusieurs cubes (ex : CSV + base)."""
+    cube = pd.concat(cubes, ignore_index=True).astype({"prix_num": "int64"})
+    return cube.groupby(CUBE_KEYS, dropna=False).sum().reset_index()
+
+
+def filter_cube(cube: pd.DataFrame, categories=None, prix_min=None, prix_max=None) -> pd.DataFrame:
+    """Lignes du cube correspondant aux filtres (bornes de prix incluses)."""
+    mask = pd.Series(True, index=cube.index)
+    if categories is not None:
+        mask &= cube["categorie"].isin(categories)
+    if prix_min is not None:
+        mask &= cube["prix_num"] >= prix_min
+    if prix_max is not None:
+        mask &= cube["prix_num"] <= prix_max
+    return cube[mask]
+
+
+def summary(cube: pd.DataFrame) -> dict:
+    """Total, nombre de catégories, prix moyen / min / max."""
+    nb = int(cube["nb"].sum())
+    if not nb:
+        return {"total": 0, "categories": 0, "prix_moyen": 0, "prix_min": 0, "prix_max": 0}
+    return {
+        "total":      nb,
+        "categories": cube["categorie"].nunique(),
+        "prix_moyen": int((cube["prix_num"] * cube["nb"]).sum() / nb),
+        "prix_min":   int(cube["prix_num"].min()),
+        "prix_max":   int(cube["prix_num"].max()),
+    }
+
+
+def counts_by(cube: pd.DataFrame, column: str) -> pd.Series:
+    """Nombre d'annonces par valeur de `column`, décroissant (NaN exclus)."""
+    return cube.groupby(column)["nb"].sum().sort_values(ascending=False, kind="stable")
+
+
+def _prices(cube: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """Prix distincts triés et effectifs cumulés."""
+    by_prix = cube.groupby("prix_num")["nb"].sum()
+    return by_prix.index.to_numpy(), by_prix.to_numpy().cumsum()
+
+
+def quantiles(cube: pd.DataFrame, qs) -> np.ndarray:
+    """Quantiles pondérés des prix (interpolation linéaire, comme numpy)."""
+    prix, cum = _prices(cube)
+    pos = (cum[-1] - 1) * np.asarray(qs, dtype=float)
+    lo, hi = np.floor(pos), np.ceil(pos)
+    v_lo = prix[np.searchsorted(cum, lo, side="right")]
+    v_hi = prix[np.searchsorted(cum, hi, side="right")]
+    return v_lo + (v_hi - v_lo) * (pos - lo)
+
+
+def box_stats(cube: pd.DataFrame, by: str) -> pd.DataFrame:
+    """
+    Boîtes à moustaches pré-calculées par valeur de `by`.
+
+    Moustaches à 1,5 × IQR, ramenées au prix observé le plus proche (règle
+    par défaut de plotly).
+    """
+    rows = []
+    for key, part in cube.groupby(by, sort=False):
+        q1, med, q3 = quantiles(part, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        prix = part["prix_num"]
+        rows.append({
+            by: key, "q1": q1, "median": med, "q3": q3,
+            "lowerfence": prix[prix >= q1 - 1.5 * iqr].min(),
+            "upperfence": prix[prix <= q3 + 1.5 * iqr].max(),
+            "mean": (prix * part["nb"]).sum() / part["nb"].sum(),
+        })
+    return pd.DataFrame(rows)
+
+
+def histogram(cube: pd.DataFrame, by: str, nbins: int = 50) -> pd.DataFrame:
+    """
+    Histogramme des prix par valeur de `by`, bacs communs de largeur égale.
+
+    Returns:
+        DataFrame : by, x (centre du bac), width, nb
+    """
+    lo, hi = cube["prix_num"].min(), cube["prix_num"].max()
+    edges = np.linspace(lo, hi if hi > lo else lo + 1, nbins + 1)
+    frames = []
+    for key, part in cube.groupby(by, sort=False):
+        counts, _ = np.histogram(part["prix_num"], bins=edges, weights=part["nb"])
+        frames.append(pd.DataFrame({
+            by: key, "x": (edges[:-1] + edges[1:]) / 2, "width": np.diff(edges), "nb": counts,
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=[by, "x", "width", "nb"])
@@ -0,0 +1,161 @@
+"""
+Cache disque des pages de catégorie, avec GET conditionnel (ETag / Last-Modified).
+
+Chaque entrée garde le corps HTML compressé, ses validateurs et le résultat
+du parsing. Une entrée plus jeune que `ttl` est servie sans requête ; au-delà
+elle est revalidée et, sur un 304, le parsing en cache est réutilisé tel quel.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import NamedTuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(BASE_DIR, ".cache", "pages.db")
+
+DEFAULT_TTL = 3600                  # secondes sans revalidation
+DEFAULT_MAX_BYTES = 50 * 1024 ** 2  # taille max du cache avant éviction LRU
+
+
+class CacheMiss(LookupError):
+    """Page absente du cache en mode hors-ligne."""
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    etag: str | None
+    last_modified: str | None
+    body: bytes
+    rows: list[dict] | None
+    stored_at: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.stored_at < ttl
+
+    def validators(self) -> dict:
+        """En-têtes de requête conditionnelle."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    @property
+    def text(self) -> str:
+        return self.body.decode("utf-8")
+
+
+class PageCache:
+    """
+    Cache LRU borné en taille, stocké dans une base SQLite.
+
+    Args:
+        path     : fichier SQLite du cache
+        ttl      : durée (s) pendant laquelle une entrée est servie sans revalidation
+        max_bytes: taille totale max des corps compressés
+        offline  : mode « cache uniquement », aucune requête réseau
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, offline: bool = False):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url           TEXT PRIMARY KEY,
+                etag          TEXT,
+                last_modified TEXT,
+                body          BLOB,
+                rows          TEXT,
+                size          INTEGER,
+                stored_at     REAL,
+                accessed_at   REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed ON pages(accessed_at)")
+        self._conn.commit()
+
+    def get(self, url: str) -> CacheEntry | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, body, rows, stored_at FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        url, etag, last_modified, body, rows, stored_at = row
+        return CacheEntry(url, etag, last_modified, zlib.decompress(body),
+                          json.loads(rows) if rows is not None else None, stored_at)
+
+    def put(self, url: str, body: bytes, rows: list[dict] | None,
+            etag: str | None = None, last_modified: str | None = None) -> None:
+        blob = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, blob,
+                 json.dumps(rows, ensure_ascii=False) if rows is not None else None,
+                 len(blob), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url: str) -> None:
+        """Marque une entrée comme revalidée (réponse 304)."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, url)
+            )
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._conn.execute(
+            "SELECT url, size FROM pages ORDER BY accessed_at"
+        ).fetchall():
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages"
+            ).fetchone()
+        return {"entries": count, "bytes": size}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_default_caches: dict[bool, PageCache] = {}
+_default_lock = threading.Lock()
+
+
+def get_page_cache(offline: bool = False) -> PageCache:
+    """Cache partagé par le processus (fichier `.cache/pages.db`)."""
+    with _default_lock:
+        if offline not in _default_caches:
+            _default_caches[offline] = PageCache(offline=offline)
+        return _default_caches[offline]
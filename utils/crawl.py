@@ -0,0 +1,269 @@
+"""
+Crawl multi-catégories : toutes les pages de plusieurs catégories sur un seul
+pool de threads, avec écriture directe en base.
+
+Utilisable sans l'interface Streamlit (cron) :
+
+    python -m utils.crawl                               # 4 catégories, pages 1 à 9
+    python -m utils.crawl vetements-homme:1-20 chaussures-enfants:5 --workers 8
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from collections.abc import Callable
+from functools import partial
+
+import pandas as pd
+
+from utils.cache import get_page_cache
+from utils.database import DB_PATH, get_connection, init_db, load_known_keys, save_scraped_data
+from utils.datasets import load_neardup_index
+from utils.images import image_hashes
+from utils.metrics import span
+from utils.neardup import NearDupIndex
+from utils.render import RendererPool, available as render_available, get_renderer_pool
+from utils.scraper import (
+    BASE_URL, CATEGORIES, DEFAULT_PARSER, MAX_WORKERS, REQUESTS_PER_SECOND,
+    FetchStats, dedupe_rows, iter_pages,
+)
+from utils.normalize import listing_key
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FLUSH_ROWS = 20_000   # lignes gardées par catégorie avant une sauvegarde anticipée
+
+
+def parse_spec(spec: str) -> tuple[str, range]:
+    """
+    Lit une spécification « slug:pages ».
+
+    Exemples : "vetements-homme" (pages 1 à 9), "vetements-homme:5" (pages 1 à 5),
+    "vetements-homme:3-7" (pages 3 à 7).
+    """
+    slug, _, pages = spec.partition(":")
+    if slug not in CATEGORIES.values():
+        raise ValueError(f"Catégorie inconnue : {slug!r}")
+    if not pages:
+        return slug, range(1, 10)
+    first, _, last = pages.partition("-")
+    if last:
+        return slug, range(int(first), int(last) + 1)
+    return slug, range(1, int(first) + 1)
+
+
+def rounds(plan: dict[str, range]) -> list[list[tuple[str, int]]]:
+    """Tours de tâches : page 1 de chaque catégorie, puis page 2, etc."""
+    queues = {slug: list(pages) for slug, pages in plan.items()}
+    return [[(slug, pages[i]) for slug, pages in queues.items() if i < len(pages)]
+            for i in range(max((len(q) for q in queues.values()), default=0))]
+
+
+def interleave(plan: dict[str, range]) -> list[tuple[str, int]]:
+    """Ordonne les tâches en tourniquet : page 1 de chaque catégorie, puis page 2, etc."""
+    return [task for tasks in rounds(plan) for task in tasks]
+
+
+def crawl(plan: dict[str, range], db_path: str | None = None,
+          workers: int = MAX_WORKERS, rate: float = REQUESTS_PER_SECOND,
+          base_url: str = BASE_URL, offline: bool = False, use_cache: bool = True,
+          parser: str = DEFAULT_PARSER, incremental: bool = False,
+          progress_callback: Callable | None = None,
+          renderer: RendererPool | None = None, near_dedupe: bool = False) -> dict:
+    """
+    Scrape plusieurs catégories en une seule passe.
+
+    Toutes les tâches (slug, page) partagent le même pool de `workers` threads
+    et le même budget de politesse (`rate` requêtes/s vers l'hôte). Les
+    catégories sont entrelacées pour progresser ensemble. Chaque page est
+    dédoublonnée dès qu'elle arrive ; ses lignes sont gardées par catégorie et
+    écrites en base quand la catégorie est terminée (ou tous les FLUSH_ROWS) :
+    une sauvegarde, donc un relevé de prix, par catégorie et non par page.
+
+    En mode incrémental, seules les annonces absentes de l'index de la base
+    sont gardées et une catégorie s'arrête à sa première page entièrement
+    connue ; ses pages restantes ne sont pas demandées. Les pages sont alors
+    demandées tour par tour (page N de chaque catégorie, puis N + 1).
+
+    Args:
+        plan             : {slug: range de pages}
+        db_path          : base SQLite de destination (None = pas d'écriture)
+        offline          : rejoue uniquement les pages en cache
+        use_cache        : passe par le cache disque des pages
+        incremental      : s'arrête aux annonces déjà en base (nécessite db_path)
+        progress_callback: fonction(done, total) appelée après chaque page
+        renderer         : pool de rendu navigateur pour les pages incomplètes
+        near_dedupe      : écarte les quasi-doublons (de la base et du crawl),
+                           voir utils.neardup
+
+    Returns:
+        dict : {"categories": [stats par catégorie], "total": stats globales, "fetch": compteurs réseau}
+    """
+    if incremental and not db_path:
+        raise ValueError("Mode incrémental : db_path obligatoire (annonces connues en base)")
+    tasks = interleave(plan)
+    stats = FetchStats()
+    cache = get_page_cache(offline=offline) if use_cache or offline else None
+    conn = None
+    known: dict[str, set[str]] = {}
+    if db_path:
+        conn = get_connection(db_path)
+        init_db(conn)
+        if incremental:
+            known = {slug: load_known_keys(conn, slug) for slug in plan}
+    neardup = None
+    if near_dedupe:
+        neardup = NearDupIndex(parent=load_neardup_index(db_path) if db_path else None,
+                               image_hashes=image_hashes)
+    stopped: set[str] = set()
+
+    per_cat = {slug: {"categorie": slug, "pages": 0, "rows": 0, "duplicates": 0,
+                      "near_duplicates": 0,
+                      "inserted": 0, "updated": 0, "unchanged": 0,
+                      "stopped_early": False}
+               for slug in plan}
+    seen = {slug: set() for slug in plan}
+    remaining = Counter(slug for slug, _ in tasks)
+    pending: dict[str, list[dict]] = {slug: [] for slug in plan}
+
+    def flush(slug: str) -> None:
+        if conn is not None and pending[slug]:
+            for key, count in save_scraped_data(pd.DataFrame(pending[slug]), conn).items():
+                per_cat[slug][key] += count
+        pending[slug] = []
+
+    start = time.perf_counter()
+    last_seen = {slug: start for slug in plan}
+    with span("crawl", categories=len(plan), pages=len(tasks)) as run:
+        try:
+            pages_of = partial(iter_pages, workers=workers, rate=rate, base_url=base_url,
+                               cache=cache, parser=parser, stats=stats, renderer=renderer)
+            if known:
+                # Incrémental : tour par tour, la page suivante d'une catégorie n'est
+                # demandée qu'une fois la précédente examinée
+                results = itertools.chain.from_iterable(
+                    pages_of([task for task in tour if task[0] not in stopped])
+                    for tour in rounds(plan))
+            else:
+                results = pages_of(tasks)
+            for done, (slug, _, rows) in enumerate(results, start=1):
+                remaining[slug] -= 1
+                if slug in stopped:
+                    continue
+                with span("dedupe", categorie=slug):
+                    batch = dedupe_rows(rows, seen[slug])
+                    cat = per_cat[slug]
+                    cat["pages"] += 1
+                    cat["duplicates"] += len(rows) - len(batch)
+                    stats.duplicates += len(rows) - len(batch)
+                    if neardup is not None and batch:
+                        near = neardup.add(pd.DataFrame(batch))
+                        batch = [row for row, dup in zip(batch, near) if not dup]
+                        cat["near_duplicates"] += int(near.sum())
+                        stats.near_duplicates += int(near.sum())
+                    if slug in known:
+                        keys = [listing_key(row) for row in batch]
+                        batch = [row for row, key in zip(batch, keys) if key not in known[slug]]
+                        known[slug].update(keys)
+                        if rows and not batch:
+                            stopped.add(slug)
+                cat["rows"] += len(batch)
+                pending[slug].extend(batch)
+                if not remaining[slug] or slug in stopped or len(pending[slug]) >= FLUSH_ROWS:
+                    flush(slug)
+                last_seen[slug] = time.perf_counter()
+                if progress_callback:
+                    progress_callback(done, len(tasks))
+        finally:
+            # Catégories interrompues : les lignes déjà collectées sont gardées
+            for slug in plan:
+                flush(slug)
+            if conn is not None:
+                conn.close()
+        run.update(rows=sum(c["rows"] for c in per_cat.values()),
+                   failed_pages=len(stats.failed_pages))
+
+    elapsed = time.perf_counter() - start
+    categories = []
+    for slug, cat in per_cat.items():
+        cat["stopped_early"] = slug in stopped
+        seconds = max(last_seen[slug] - start, 1e-9)
+        categories.append({
+            **cat,
+            "seconds": round(seconds, 3),
+            "pages_per_sec": round(cat["pages"] / seconds, 2),
+            "rows_per_sec": round(cat["rows"] / seconds, 1),
+        })
+    pages = sum(c["pages"] for c in categories)
+    rows = sum(c["rows"] for c in categories)
+    total = {
+        "pages": pages,
+        "rows": rows,
+        "inserted": sum(c["inserted"] for c in categories),
+        "updated": sum(c["updated"] for c in categories),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / max(elapsed, 1e-9), 2),
+        "rows_per_sec": round(rows / max(elapsed, 1e-9), 1),
+    }
+    return {"categories": categories, "total": total, "fetch": stats.as_dict()}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Crawl multi-catégories CoinAfrique")
+    parser.add_argument("specs", nargs="*",
+                        help="slug[:N | :A-B] ; par défaut toutes les catégories, pages 1 à --pages")
+    parser.add_argument("--pages", type=int, default=9, help="pages par catégorie sans spécification")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND,
+                        help="requêtes/s maximum vers le site (toutes catégories)")
+    parser.add_argument("--base-url", default=BASE_URL, help="racine des URLs (serveur de test)")
+    parser.add_argument("--db", default=os.path.join(BASE_DIR, DB_PATH))
+    parser.add_argument("--no-db", action="store_true", help="n'écrit pas en base")
+    parser.add_argument("--offline", action="store_true", help="rejoue uniquement le cache")
+    parser.add_argument("--no-cache", action="store_true", help="ignore le cache disque")
+    parser.add_argument("--incremental", action="store_true",
+                        help="s'arrête aux annonces déjà en base")
+    parser.add_argument("--render", action="store_true",
+                        help="rend les pages incomplètes dans un navigateur headless (Playwright)")
+    parser.add_argument("--near-dedupe", action="store_true",
+                        help="écarte les quasi-doublons (titre retouché, même prix et adresse)")
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    args = parser.parse_args(argv)
+    if args.render and not render_available():
+        parser.error("--render nécessite Playwright (pip install playwright)")
+    if args.incremental and args.no_db:
+        parser.error("--incremental compare à la base : incompatible avec --no-db")
+
+    if args.specs:
+        plan = dict(parse_spec(spec) for spec in args.specs)
+    else:
+        plan = {slug: range(1, args.pages + 1) for slug in CATEGORIES.values()}
+
+    report = crawl(plan, db_path=None if args.no_db else args.db, workers=args.workers,
+                   rate=args.rate, base_url=args.base_url, offline=args.offline,
+                   use_cache=not args.no_cache, incremental=args.incremental,
+                   renderer=get_renderer_pool() if args.render else None,
+                   near_dedupe=args.near_dedupe)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+        return
+    for cat in report["categories"]:
+        print(f"{cat['categorie']:<20} {cat['pages']:>4} pages {cat['rows']:>6} lignes "
+              f"{cat['inserted']:>6} nouvelles {cat['pages_per_sec']:>6.2f} pages/s "
+              f"{cat['rows_per_sec']:>8.1f} lignes/s"
+              + ("  (arrêt incrémental)" if cat["stopped_early"] else ""))
+    total = report["total"]
+    print(f"{'TOTAL':<20} {total['pages']:>4} pages {total['rows']:>6} lignes "
+          f"{total['inserted']:>6} nouvelles {total['pages_per_sec']:>6.2f} pages/s "
+          f"{total['rows_per_sec']:>8.1f} lignes/s  ({total['seconds']:.1f} s)")
+    failed = report["fetch"]["failed_pages"]
+    if failed:
+        print(f"Pages en échec : {len(failed)} "
+              f"({', '.join(f'{slug} p.{page}' for slug, page in failed)})")
+
+
+if __name__ == "__main__":
+    main()
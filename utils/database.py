@@ -1,34 +1,441 @@
 import sqlite3
+import threading
+import time
 import pandas as pd
 
+from utils.history import init_history, record_releve
+from utils.metrics import span
+from utils.normalize import NORMALIZED_COLUMNS, listing_keys, normalize_annonces
+
 DB_PATH = "coinafrique_bs4.db"
 
+COLUMNS = ["categorie", "nom", "prix", "adresse", "image_lien"]
+
+# Colonnes calculées à l'insertion (utils.normalize), indexées pour les filtres
+DERIVED_COLUMNS = {
+    "prix_num": "INTEGER",
+    "quartier": "TEXT",
+    "ville":    "TEXT",
+    "pays":     "TEXT",
+}
+
+# Empreinte de l'image (utils.images), remise à NULL quand image_lien change
+IMAGE_COLUMNS = {
+    "image_phash":      "INTEGER",   # dHash 64 bits signé
+    "image_checked_at": "REAL",      # NULL : image à traiter
+}
+
+# Colonnes de la table annonces lisibles par query_annonces et consorts
+SELECTABLE_COLUMNS = frozenset(
+    ["listing_key", *COLUMNS, *DERIVED_COLUMNS, *IMAGE_COLUMNS,
+     "first_seen", "updated_at", "scraped_at"]
+)
+
+# Réglages SQLite pour des écritures en masse : WAL (lecteurs non bloqués),
+# fsync allégé, tables temporaires en mémoire, cache de pages de 64 Mo
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
+
+
+# Fonctions appelées après chaque save_scraped_data (invalidation des caches, agrégats)
+_save_listeners: list = []
+
+
+def on_save(callback):
+    """
+    Enregistre `callback(frame, result)` appelé après chaque sauvegarde.
+
+    `frame` contient les lignes écrites (normalisées, avec listing_key et
+    scraped_at) ; `result` est le dict retourné par save_scraped_data.
+    Utilisable comme décorateur.
+    """
+    _save_listeners.append(callback)
+    return callback
+
 
 def get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
-    return sqlite3.connect(db_path, check_same_thread=False)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
 
 def init_db(conn: sqlite3.Connection) -> None:
+    """Crée le schéma ; migre l'ancienne table annonces (sans clé) si besoin."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(annonces)")]
+    legacy = bool(columns) and "listing_key" not in columns
+    if legacy:
+        conn.execute("ALTER TABLE annonces RENAME TO annonces_legacy")
+
     conn.execute("""
         CREATE TABLE IF NOT EXISTS annonces (
-            categorie  TEXT,
-            nom        TEXT,
-            prix       TEXT,
-            adresse    TEXT,
-            image_lien TEXT
+            categorie   TEXT NOT NULL,
+            listing_key TEXT NOT NULL,
+            nom         TEXT,
+            prix        TEXT,
+            adresse     TEXT,
+            image_lien  TEXT,
+            prix_num    INTEGER,
+            quartier    TEXT,
+            ville       TEXT,
+            pays        TEXT,
+            image_phash INTEGER,
+            image_checked_at REAL,
+            first_seen  REAL NOT NULL,
+            updated_at  REAL NOT NULL,
+            scraped_at  REAL NOT NULL
         )
     """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_annonces_key
+        ON annonces(categorie, listing_key)
+    """)
+    _add_derived_columns(conn)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(annonces)")}
+    for col, sql_type in IMAGE_COLUMNS.items():
+        if col not in columns:
+            conn.execute(f"ALTER TABLE annonces ADD COLUMN {col} {sql_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_annonces_scraped ON annonces(scraped_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_annonces_cat_prix ON annonces(categorie, prix_num)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_annonces_prix ON annonces(prix_num)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_annonces_ville ON annonces(ville, quartier)")
+    # Index partiel : seules les annonces dont l'image reste à traiter y figurent
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_annonces_image_pending ON annonces(image_lien)
+        WHERE image_checked_at IS NULL
+    """)
+    _init_cube(conn)
+    init_history(conn)
     conn.commit()
 
+    if legacy:
+        old = pd.read_sql_query("SELECT * FROM annonces_legacy", conn)
+        save_scraped_data(old, conn)
+        conn.execute("DROP TABLE annonces_legacy")
+        conn.commit()
+
+
+def _add_derived_columns(conn: sqlite3.Connection) -> None:
+    """Ajoute et remplit les colonnes dérivées absentes d'une base existante."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(annonces)")}
+    missing = [col for col in DERIVED_COLUMNS if col not in columns]
+    if not missing:
+        return
+    for col in missing:
+        conn.execute(f"ALTER TABLE annonces ADD COLUMN {col} {DERIVED_COLUMNS[col]}")
+    old = normalize_annonces(pd.read_sql_query("SELECT rowid, prix, adresse FROM annonces", conn))
+    old = _to_sql_values(old[NORMALIZED_COLUMNS + ["rowid"]])
+    conn.executemany(
+        "UPDATE annonces SET prix_num = ?, quartier = ?, ville = ?, pays = ? WHERE rowid = ?",
+        old.itertuples(index=False, name=None),
+    )
+
+
+# ── Cube du dashboard ──
+# Nombre d'annonces par (catégorie, localité, prix), tenu à jour par triggers :
+# chaque insert / update / delete sur annonces ajuste le compteur concerné.
+# Seules les annonces exploitables (prix numérique, nom non vide) sont comptées.
+
+_CUBE_ROW = {
+    "ok":       "{r}.prix_num IS NOT NULL AND trim(COALESCE({r}.nom, '')) <> ''",
+    "localite": "COALESCE({r}.quartier, {r}.ville, '')",
+}
+
+
+def _cube_sql(row: str, delta: str) -> str:
+    """Instruction de trigger ajoutant `delta` au compteur de la ligne old/new."""
+    ok, localite = (_CUBE_ROW[k].format(r=row) for k in ("ok", "localite"))
+    return f"""
+        INSERT INTO annonces_cube (categorie, localite, prix_num, nb)
+        SELECT {row}.categorie, {localite}, {row}.prix_num, {delta} WHERE {ok}
+        ON CONFLICT (categorie, localite, prix_num) DO UPDATE SET nb = nb + ({delta});
+    """
+
+
+def _init_cube(conn: sqlite3.Connection) -> None:
+    """Crée la table annonces_cube et ses triggers ; la remplit si elle est neuve."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'annonces_cube'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS annonces_cube (
+            categorie TEXT NOT NULL,
+            localite  TEXT NOT NULL,
+            prix_num  INTEGER NOT NULL,
+            nb        INTEGER NOT NULL,
+            PRIMARY KEY (categorie, localite, prix_num)
+        ) WITHOUT ROWID
+    """)
+    changed = " OR ".join(
+        f"({expr.format(r='old')}) IS NOT ({expr.format(r='new')})"
+        for expr in (*_CUBE_ROW.values(), "{r}.categorie", "{r}.prix_num")
+    )
+    conn.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cube_insert AFTER INSERT ON annonces
+        BEGIN {_cube_sql("new", "1")} END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_cube_delete AFTER DELETE ON annonces
+        BEGIN {_cube_sql("old", "-1")} END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_cube_update AFTER UPDATE ON annonces
+        WHEN {changed}
+        BEGIN {_cube_sql("old", "-1")} {_cube_sql("new", "1")} END;
+    """)
+    if not exists:
+        conn.execute(f"""
+            INSERT INTO annonces_cube (categorie, localite, prix_num, nb)
+            SELECT categorie, {_CUBE_ROW["localite"].format(r="a")}, prix_num, COUNT(*)
+            FROM annonces AS a WHERE {_CUBE_ROW["ok"].format(r="a")}
+            GROUP BY 1, 2, 3
+        """)
+
+
+def load_cube(conn: sqlite3.Connection) -> pd.DataFrame:
+    """Cube de la base : colonnes categorie, localite (NaN si inconnue), prix_num, nb."""
+    return pd.read_sql_query(
+        """
+        SELECT categorie, NULLIF(localite, '') AS localite, prix_num, nb
+        FROM annonces_cube WHERE nb > 0
+        """,
+        conn,
+    )
+
+
+def _to_sql_values(df: pd.DataFrame) -> pd.DataFrame:
+    """Valeurs Python natives, manquants en None (NaN / <NA> -> NULL)."""
+    return df.astype(object).where(df.notna(), None)
+
+
+_last_stamp = 0.0
+_stamp_lock = threading.Lock()   # sauvegardes concurrentes (tâches, bouton de la page)
 
-def save_scraped_data(df: pd.DataFrame, conn: sqlite3.Connection) -> int:
-    """Insère le DataFrame dans la table annonces. Retourne le nombre de lignes insérées."""
+
+def _batch_stamp() -> float:
+    """Horodatage strictement croissant : identifie les lignes d'un appel à save_scraped_data."""
+    global _last_stamp
+    with _stamp_lock:
+        _last_stamp = max(time.time(), _last_stamp + 1e-6)
+        return _last_stamp
+
+
+def save_scraped_data(df: pd.DataFrame, conn: sqlite3.Connection) -> dict:
+    """
+    Enregistre le DataFrame dans la table annonces (upsert sur la clé d'annonce).
+
+    Une seule transaction, un seul executemany : les annonces nouvelles sont
+    insérées, les connues mises à jour si nom/prix/adresse/image ont changé.
+    Toutes sont horodatées (scraped_at) du passage courant et relevées dans
+    l'historique des prix.
+
+    Returns:
+        dict : {"inserted", "updated", "unchanged"}
+    """
     if df.empty:
-        return 0
-    df.to_sql("annonces", conn, if_exists="append", index=False)
-    conn.commit()
-    return len(df)
+        return {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    with span("save_scraped_data", rows=len(df)) as labels:
+        with span("normalize", rows=len(df)):
+            frame = normalize_annonces(df.reindex(columns=COLUMNS))
+            frame.insert(1, "listing_key", listing_keys(frame))
+            now = _batch_stamp()
+            frame["first_seen"] = frame["updated_at"] = frame["scraped_at"] = now
+            params = list(_to_sql_values(frame).itertuples(index=False, name=None))
+        with span("upsert", rows=len(params)), conn:
+            conn.executemany(
+                """
+                INSERT INTO annonces (categorie, listing_key, nom, prix, adresse, image_lien,
+                                      prix_num, quartier, ville, pays,
+                                      first_seen, updated_at, scraped_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (categorie, listing_key) DO UPDATE SET
+                    nom        = excluded.nom,
+                    prix       = excluded.prix,
+                    adresse    = excluded.adresse,
+                    image_lien = excluded.image_lien,
+                    image_phash = CASE WHEN image_lien IS excluded.image_lien
+                                       THEN image_phash END,
+                    image_checked_at = CASE WHEN image_lien IS excluded.image_lien
+                                            THEN image_checked_at END,
+                    prix_num   = excluded.prix_num,
+                    quartier   = excluded.quartier,
+                    ville      = excluded.ville,
+                    pays       = excluded.pays,
+                    updated_at = CASE
+                        WHEN nom IS NOT excluded.nom OR prix IS NOT excluded.prix
+                          OR adresse IS NOT excluded.adresse OR image_lien IS NOT excluded.image_lien
+                        THEN excluded.updated_at ELSE updated_at END,
+                    scraped_at = excluded.scraped_at
+                """,
+                params,
+            )
+            inserted, updated = conn.execute(
+                """
+                SELECT COALESCE(SUM(first_seen = :t), 0),
+                       COALESCE(SUM(first_seen < :t AND updated_at = :t), 0)
+                FROM annonces WHERE scraped_at = :t
+                """,
+                {"t": now},
+            ).fetchone()
+            # Relevé de prix de toutes les lignes, même inchangées (utils.history)
+            with span("releve", rows=len(params)):
+                labels["prix_changes"] = record_releve(conn, now)
+        result = {"inserted": inserted, "updated": updated,
+                  "unchanged": len(params) - inserted - updated}
+        for callback in _save_listeners:
+            callback(frame, result)
+        labels.update(result)
+    return result
+
+
+def load_known_keys(conn: sqlite3.Connection, categorie: str) -> set[str]:
+    """Clés des annonces déjà en base pour une catégorie."""
+    cur = conn.execute("SELECT listing_key FROM annonces WHERE categorie = ?", (categorie,))
+    return {key for (key,) in cur}
 
 
 def load_all_data(conn: sqlite3.Connection) -> pd.DataFrame:
+    """
+    Toute la table. Préférer query_annonces pour ne charger que le nécessaire,
+    ou iter_annonces pour la parcourir à mémoire bornée.
+    """
     return pd.read_sql_query("SELECT * FROM annonces", conn)
+
+
+_shared: dict[str, tuple[sqlite3.Connection, threading.Lock]] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_connection(db_path: str = DB_PATH) -> tuple[sqlite3.Connection, threading.Lock]:
+    """
+    Connexion longue durée par fichier, partagée par le processus.
+
+    Le schéma est initialisé une seule fois, à l'ouverture. Le verrou retourné
+    doit entourer chaque utilisation (les sessions Streamlit sont des threads).
+    """
+    with _shared_lock:
+        if db_path not in _shared:
+            conn = get_connection(db_path)
+            init_db(conn)
+            _shared[db_path] = (conn, threading.Lock())
+        return _shared[db_path]
+
+
+def _select(columns: list[str] | None) -> str:
+    """Liste SELECT des colonnes demandées, refusées si absentes de SELECTABLE_COLUMNS."""
+    columns = list(columns or COLUMNS + list(DERIVED_COLUMNS))
+    unknown = [col for col in columns if col not in SELECTABLE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues : {', '.join(map(repr, unknown))}")
+    return ", ".join(columns)
+
+
+def _where(categories=None, prix_min=None, prix_max=None, villes=None,
+           quartiers=None) -> tuple[str, list]:
+    """Construit la clause WHERE paramétrée des filtres de query_annonces."""
+    clauses, params = [], []
+    for col, values in (("categorie", categories), ("ville", villes), ("quartier", quartiers)):
+        if values:
+            values = list(values)
+            clauses.append(f"{col} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if prix_min is not None:
+        clauses.append("prix_num >= ?")
+        params.append(prix_min)
+    if prix_max is not None:
+        clauses.append("prix_num <= ?")
+        params.append(prix_max)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+ORDERS = {
+    "recent":    "scraped_at DESC",
+    "prix_asc":  "prix_num ASC",
+    "prix_desc": "prix_num DESC",
+}
+
+
+def query_annonces(conn: sqlite3.Connection, categories=None, prix_min: int | None = None,
+                   prix_max: int | None = None, villes=None, quartiers=None,
+                   limit: int | None = 100, offset: int = 0, order: str = "recent",
+                   columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Annonces filtrées, triées et paginées par SQLite.
+
+    Args:
+        categories         : slugs à garder (None = toutes)
+        prix_min, prix_max : bornes incluses sur le prix numérique
+        villes, quartiers  : valeurs exactes à garder
+        limit, offset      : pagination (limit=None = tout)
+        order              : clé de ORDERS
+        columns            : colonnes renvoyées (défaut : colonnes d'origine + dérivées)
+    """
+    cols = _select(columns)
+    where, params = _where(categories, prix_min, prix_max, villes, quartiers)
+    sql = f"SELECT {cols} FROM annonces{where} ORDER BY {ORDERS[order]}"
+    if limit is not None:
+        sql += " LIMIT ? OFFSET ?"
+        params += [limit, offset]
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def iter_annonces(conn: sqlite3.Connection, chunk_rows: int = 50_000,
+                  columns: list[str] | None = None, order: str = "recent"):
+    """Toute la table par blocs de `chunk_rows` lignes (DataFrames), triée comme query_annonces."""
+    cols = _select(columns)
+    yield from pd.read_sql_query(f"SELECT {cols} FROM annonces ORDER BY {ORDERS[order]}",
+                                 conn, chunksize=chunk_rows)
+
+
+def query_scraped_since(conn: sqlite3.Connection, since: float,
+                        columns: list[str] | None = None) -> pd.DataFrame:
+    """Annonces vues par une sauvegarde postérieure à `since` (index sur scraped_at)."""
+    cols = _select(columns)
+    return pd.read_sql_query(
+        f"SELECT {cols}, scraped_at FROM annonces WHERE scraped_at > ? ORDER BY scraped_at",
+        conn, params=(since,),
+    )
+
+
+def pending_images(conn: sqlite3.Connection, limit: int | None = None) -> list[str]:
+    """URLs d'images des annonces sans empreinte (index partiel, sans parcours de la table)."""
+    sql = """
+        SELECT DISTINCT image_lien FROM annonces
+        WHERE image_checked_at IS NULL AND image_lien LIKE 'http%'
+    """
+    params = ()
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = (limit,)
+    return [url for (url,) in conn.execute(sql, params)]
+
+
+def save_image_hashes(conn: sqlite3.Connection, hashes: dict[str, int | None]) -> None:
+    """Écrit l'empreinte de chaque URL sur ses annonces (None : échec définitif)."""
+    if not hashes:
+        return
+    now = time.time()
+    with conn:
+        conn.executemany(
+            """
+            UPDATE annonces SET image_phash = ?, image_checked_at = ?
+            WHERE image_lien = ? AND image_checked_at IS NULL
+            """,
+            [(phash, now, url) for url, phash in hashes.items()],
+        )
+
+
+def count_annonces(conn: sqlite3.Connection, **filters) -> int:
+    """Nombre d'annonces correspondant aux filtres de query_annonces."""
+    where, params = _where(**filters)
+    return conn.execute(f"SELECT COUNT(*) FROM annonces{where}", params).fetchone()[0]
+
+
+def count_by_categorie(conn: sqlite3.Connection) -> pd.DataFrame:
+    """Nombre d'annonces par catégorie (colonnes categorie, nb)."""
+    return pd.read_sql_query(
+        "SELECT categorie, COUNT(*) AS nb FROM annonces GROUP BY categorie", conn
+    )
@@ -0,0 +1,451 @@
+"""
+Chargement partagé des CSV Web Scraper de `data/` et de la base scrapée.
+
+Les CSV sont découverts dans `data/` par utils.ingest (séparateur, encodage,
+en-têtes et catégorie détectés une fois par fichier). Chaque CSV est lu une
+seule fois puis converti en Parquet dans `.cache/datasets/`, clé sur la
+taille et la date de modification du fichier source (sha1 en secours). Les
+chargements suivants lisent le Parquet en mémoire mappée : pas de
+re-parsing CSV, et un schéma canonique commun à toutes les pages.
+
+Les DataFrames chargés sont gardés dans un registre unique pour tout le
+processus (toutes sessions et pages Streamlit confondues) et distribués en
+vues sans copie. Le registre est invalidé à chaque save_scraped_data.
+"""
+import hashlib
+import json
+import os
+import threading
+from functools import partial
+
+import pandas as pd
+
+from utils.database import (
+    get_shared_connection, load_cube, on_save, query_annonces, query_scraped_since,
+)
+from utils.history import rolling_median
+from utils.images import image_hashes
+from utils.ingest import CsvSpec, discover, read as read_columns_of
+from utils.metrics import span
+from utils.neardup import NearDupIndex, near_duplicates
+from utils.normalize import normalize_annonces
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sans pyarrow : lecture CSV directe, sans cache
+    pa = pq = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CACHE_DIR = os.path.join(BASE_DIR, ".cache", "datasets")
+DB_PATH = os.path.join(BASE_DIR, "coinafrique_bs4.db")
+
+CAT_LABELS = {
+    "vetements-homme":    "Vêtements Homme",
+    "chaussures-homme":   "Chaussures Homme",
+    "vetements-enfants":  "Vêtements Enfants",
+    "chaussures-enfants": "Chaussures Enfants",
+}
+
+# Schéma canonique : colonnes d'origine harmonisées + colonnes normalisées
+CANONICAL_COLUMNS = [
+    "categorie", "nom", "prix", "adresse", "image_lien",
+    "prix_num", "quartier", "ville", "pays",
+]
+
+# Taille des blocs pour les passes statistiques sur les CSV
+STATS_CHUNK_ROWS = 50_000
+
+# Incrémenter pour invalider les caches après un changement de schéma
+SCHEMA_VERSION = 2
+
+# Copy-on-write par défaut à partir de pandas 3 : les vues du registre peuvent
+# être superficielles. Avant, chaque session reçoit sa propre copie (l'option
+# globale n'est pas modifiée, elle vaudrait pour tout le processus).
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3
+
+
+# ── Registre partagé ──
+
+class DatasetStore:
+    """
+    Registre des DataFrames partagé par toutes les sessions du processus.
+
+    Chaque entrée est construite une seule fois (un verrou par nom évite les
+    constructions concurrentes) puis servie en copie : superficielle avec le
+    copy-on-write de pandas 3 (les données ne sont pas dupliquées), complète
+    avant ; une session qui modifie sa vue ne touche pas l'original. Les
+    autres objets (index, agrégats) sont servis tels quels et doivent rester
+    en lecture seule.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames: dict[str, pd.DataFrame] = {}
+        self._tags: dict[str, set[str]] = {}
+        self._builders: dict[str, threading.Lock] = {}
+        self._versions: dict[str, int] = {}
+
+    def get(self, name: str, build, tags: tuple = ()) -> pd.DataFrame:
+        """
+        Retourne la vue du jeu `name`, construit par `build()` au premier appel.
+
+        Args:
+            tags : étiquettes supplémentaires pour invalidate (ex : "scraped"
+                   pour un jeu dérivé de la base).
+        """
+        with self._lock:
+            df = self._frames.get(name)
+            builder = self._builders.setdefault(name, threading.Lock())
+        if df is None:
+            with builder:
+                with self._lock:
+                    df = self._frames.get(name)
+                    version = self._versions.get(name, 0)
+                if df is None:
+                    # Seules les constructions sont mesurées (les accès au registre sont immédiats)
+                    with span("load_dataset", dataset=name):
+                        df = build()
+                    with self._lock:
+                        # Invalidé pendant la construction : on sert sans garder
+                        if self._versions.get(name, 0) == version:
+                            self._frames[name] = df
+                            self._tags[name] = {name.split(":")[0], *tags}
+        return df.copy(deep=not _COPY_ON_WRITE) if isinstance(df, pd.DataFrame) else df
+
+    def version(self, name: str) -> int:
+        """Compteur incrémenté à chaque invalidation de `name`."""
+        with self._lock:
+            return self._versions.get(name, 0)
+
+    def invalidate(self, *tags: str) -> None:
+        """Oublie les jeux portant une des étiquettes (tout si aucune)."""
+        with self._lock:
+            for name in list(self._frames) if not tags else [
+                n for n, t in self._tags.items() if t.intersection(tags)
+            ]:
+                self._frames.pop(name, None)
+                self._tags.pop(name, None)
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+
+STORE = DatasetStore()
+
+
+@on_save
+def _invalidate_scraped(frame, result) -> None:
+    # Chaque sauvegarde ajoute un relevé de prix, même sans changement d'annonce
+    STORE.invalidate("history")
+    if result["inserted"] or result["updated"]:
+        STORE.invalidate("scraped")
+
+
+def get_dataset(name: str, build, tags: tuple = ()) -> pd.DataFrame:
+    """Raccourci vers STORE.get, pour les jeux dérivés propres à une page."""
+    return STORE.get(name, build, tags)
+
+
+# ── Web Scraper (CSV) ──
+
+_specs_lock = threading.Lock()
+_specs_seen = None
+
+
+def specs() -> dict[str, CsvSpec]:
+    """
+    CSV de `data/` de catégorie reconnue (utils.ingest), par clé de jeu, dans
+    l'ordre de CAT_LABELS. Un CSV ajouté, modifié ou retiré vide le registre.
+    """
+    global _specs_seen
+    order = list(CAT_LABELS)
+    found = sorted((s for s in discover(DATA_DIR, CACHE_DIR, CAT_LABELS) if s.categorie),
+                   key=lambda s: (order.index(s.categorie), s.filename))
+    version = [(s.filename, *s.signature) for s in found]
+    with _specs_lock:
+        changed = _specs_seen is not None and version != _specs_seen
+        _specs_seen = version
+    if changed:
+        STORE.invalidate()
+    return {s.key: s for s in found}
+
+
+def resolve(key: "str | CsvSpec") -> CsvSpec:
+    """
+    Spécification d'un CSV par clé ; une spécification est rendue telle quelle.
+
+    Les fonctions ci-dessous acceptent l'une ou l'autre : un appelant qui
+    enchaîne plusieurs lectures résout la clé une fois (un seul parcours de
+    `data/`) et transmet la spécification.
+    """
+    return key if isinstance(key, CsvSpec) else specs()[key]
+
+
+def ignored_files() -> list[str]:
+    """CSV de `data/` ignorés : catégorie ou colonnes nom / prix non reconnues."""
+    return [s.filename for s in discover(DATA_DIR, CACHE_DIR, CAT_LABELS) if not s.categorie]
+
+
+def source_path(key: "str | CsvSpec") -> str:
+    """Chemin du CSV `key` dans `data/`."""
+    return os.path.join(DATA_DIR, resolve(key).filename)
+
+
+def read_csv(key: "str | CsvSpec", **kwargs):
+    """Lit un CSV brut (toutes les colonnes d'origine) ; kwargs : nrows, chunksize..."""
+    spec = resolve(key)
+    return pd.read_csv(os.path.join(DATA_DIR, spec.filename), sep=spec.sep,
+                       encoding=spec.encoding, on_bad_lines="skip", **kwargs)
+
+
+def read_columns(key: "str | CsvSpec", **kwargs):
+    """Lit les seules colonnes utiles d'un CSV, déjà renommées au schéma (utils.ingest)."""
+    return read_columns_of(resolve(key), DATA_DIR, **kwargs)
+
+
+def to_canonical(df: pd.DataFrame, key: "str | CsvSpec") -> pd.DataFrame:
+    """Ajoute la catégorie du CSV `key` et les colonnes normalisées à un bloc de read_columns."""
+    df = df.reindex(columns=["nom", "prix", "adresse", "image_lien"])
+    df.insert(0, "categorie", resolve(key).categorie)
+    return normalize_annonces(df)[CANONICAL_COLUMNS]
+
+
+def _source_signature(path: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "schema": SCHEMA_VERSION}
+
+
+def _sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fresh_parquet(key: "str | CsvSpec", kind: str) -> str | None:
+    """
+    Chemin du Parquet `kind` ("raw" ou "canonical") d'un CSV s'il est à jour.
+
+    Le Parquet en cache est réutilisé tant que la signature du CSV source ne
+    change pas ; si seule la date change, le sha1 du contenu tranche.
+    """
+    if pq is None:
+        return None
+    spec = resolve(key)
+    source = source_path(spec)
+    parquet = os.path.join(CACHE_DIR, f"{spec.key}.{kind}.parquet")
+    sidecar = parquet + ".json"
+    signature = _source_signature(source)
+    try:
+        with open(sidecar, encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        stored = {}
+
+    fresh = stored.get("signature") == signature
+    if not fresh and stored.get("signature", {}).get("schema") == SCHEMA_VERSION \
+            and os.path.exists(parquet) and stored.get("sha1") == _sha1(source):
+        fresh = True
+        stored["signature"] = signature
+        _write_sidecar(sidecar, stored)
+    return parquet if fresh and os.path.exists(parquet) else None
+
+
+def _cached(spec: CsvSpec, kind: str, build) -> pd.DataFrame:
+    """Retourne le DataFrame `kind` d'un CSV, depuis le Parquet s'il est à jour."""
+    if pq is None:
+        return build()
+    parquet = fresh_parquet(spec, kind)
+    if parquet:
+        with span("read_parquet", slug=spec.key, kind=kind):
+            return pq.read_table(parquet, memory_map=True).to_pandas()
+
+    with span("read_csv", slug=spec.key, kind=kind):
+        df = build()
+    parquet = os.path.join(CACHE_DIR, f"{spec.key}.{kind}.parquet")
+    source = source_path(spec)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), parquet)
+        _write_sidecar(parquet + ".json",
+                       {"signature": _source_signature(source), "sha1": _sha1(source)})
+    except OSError:
+        pass  # système de fichiers en lecture seule : on sert sans cache
+    return df
+
+
+def _write_sidecar(path: str, content: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+    os.replace(tmp, path)
+
+
+def dataset_version(key: "str | CsvSpec") -> str:
+    """Version des données d'un CSV (taille et date du fichier)."""
+    sig = _source_signature(source_path(key))
+    return f"{sig['size']}_{sig['mtime_ns']}_{sig['schema']}"
+
+
+_versions_seen: dict[str, str] = {}
+
+
+def _checked_version(spec: CsvSpec) -> str:
+    """Version d'un CSV ; si elle a changé, ses entrées du registre (étiquette csv:<clé>) sont oubliées."""
+    version = dataset_version(spec)
+    with _specs_lock:
+        previous = _versions_seen.get(spec.key)
+        _versions_seen[spec.key] = version
+    if previous is not None and previous != version:
+        STORE.invalidate(f"csv:{spec.key}")
+    return version
+
+
+def preview(key: "str | CsvSpec", nrows: int = 20) -> pd.DataFrame:
+    """Premières lignes brutes : seul le début du fichier est lu."""
+    spec = resolve(key)
+    _checked_version(spec)
+    return STORE.get(f"preview:{spec.key}:{nrows}", lambda: read_csv(spec, nrows=nrows),
+                     tags=(f"csv:{spec.key}",))
+
+
+def _compute_stats(spec: CsvSpec) -> dict:
+    """Lignes, colonnes et valeurs manquantes par colonne, en lisant le CSV par blocs."""
+    rows, nulls = 0, None
+    for chunk in read_csv(spec, chunksize=STATS_CHUNK_ROWS):
+        rows += len(chunk)
+        counts = chunk.isna().sum()
+        nulls = counts if nulls is None else nulls.add(counts, fill_value=0)
+    nulls = {col: int(n) for col, n in (nulls.items() if nulls is not None else [])}
+    return {"rows": rows, "columns": len(nulls), "nulls": nulls,
+            "missing": sum(nulls.values())}
+
+
+def dataset_stats(key: "str | CsvSpec") -> dict:
+    """
+    Statistiques d'un CSV sans le charger : {"rows", "columns", "nulls", "missing"}.
+
+    Calculées par blocs une fois par version du CSV, gardées sur disque à côté
+    du cache Parquet et dans le registre.
+    """
+    spec = resolve(key)
+    version = _checked_version(spec)
+
+    def build():
+        path = os.path.join(CACHE_DIR, f"{spec.key}.stats.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("version") == version:
+                return stored["stats"]
+        except (OSError, ValueError, KeyError):
+            pass
+        stats = _compute_stats(spec)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            _write_sidecar(path, {"version": version, "stats": stats})
+        except OSError:
+            pass
+        return stats
+
+    return STORE.get(f"stats:{spec.key}", build, tags=(f"csv:{spec.key}",))
+
+
+def load_raw(key: "str | CsvSpec") -> pd.DataFrame:
+    """Données brutes d'un CSV, colonnes Web Scraper d'origine."""
+    def build():
+        spec = resolve(key)
+        return _cached(spec, "raw", lambda: read_csv(spec))
+
+    return STORE.get(f"raw:{getattr(key, 'key', key)}", build)
+
+
+def load_dataset(key: "str | CsvSpec") -> pd.DataFrame:
+    """Données d'un CSV au schéma canonique (CANONICAL_COLUMNS)."""
+    def build():
+        spec = resolve(key)
+        return _cached(spec, "canonical", lambda: to_canonical(read_columns(spec), spec))
+
+    return STORE.get(f"canonical:{getattr(key, 'key', key)}", build)
+
+
+def load_all() -> pd.DataFrame:
+    """Tous les CSV au schéma canonique, concaténés dans l'ordre de specs()."""
+    return STORE.get("webscraper", lambda: pd.concat(
+        [load_dataset(spec) for spec in specs().values()], ignore_index=True))
+
+
+def load_all_unique() -> pd.DataFrame:
+    """load_all sans les quasi-doublons (voir utils.neardup) ; la première annonce est gardée."""
+    def build():
+        df = load_all()
+        return df[~near_duplicates(df)].reset_index(drop=True)
+
+    return STORE.get("webscraper:unique", build)
+
+
+# ── Base scrapée (SQLite) ──
+
+def load_scraped(db_path: str = DB_PATH) -> pd.DataFrame:
+    """
+    Annonces de la base au schéma canonique.
+
+    Gardé dans le registre jusqu'à la prochaine sauvegarde qui insère ou
+    modifie des annonces.
+    """
+    def build():
+        conn, lock = get_shared_connection(db_path)
+        with lock:
+            df = query_annonces(conn, limit=None, columns=CANONICAL_COLUMNS)
+        return df.astype({"prix_num": "Int64"})
+
+    return STORE.get(f"scraped:{db_path}", build)
+
+
+_neardup_lock = threading.Lock()
+
+
+def load_neardup_index(db_path: str = DB_PATH) -> NearDupIndex:
+    """
+    Index des quasi-doublons des annonces en base, partagé par le processus.
+
+    Construit une fois puis complété à chaque appel avec les seules annonces
+    sauvegardées depuis (scraped_at), sans reconstruction. À utiliser comme
+    parent d'un index de scraping : NearDupIndex(parent=load_neardup_index()).
+    Les empreintes d'images viennent de la colonne image_phash, sinon du
+    cache de miniatures (sans téléchargement).
+    """
+    index = STORE.get(f"neardup:{db_path}",
+                      lambda: NearDupIndex(image_hashes=partial(image_hashes, fetch_missing=False)))
+    with _neardup_lock:
+        since = getattr(index, "synced_at", 0.0)
+        conn, lock = get_shared_connection(db_path)
+        with lock:
+            new = query_scraped_since(conn, since, [
+                "nom", "prix", "adresse", "image_lien", "image_phash"])
+        if not new.empty:
+            index.add(new)
+            index.synced_at = float(new["scraped_at"].max())
+    return index
+
+
+def load_scraped_cube(db_path: str = DB_PATH) -> pd.DataFrame:
+    """Cube du dashboard pour la base (table annonces_cube, tenue par triggers)."""
+    def build():
+        conn, lock = get_shared_connection(db_path)
+        with lock:
+            return load_cube(conn)
+
+    return STORE.get(f"cube:{db_path}", build, tags=("scraped",))
+
+
+def load_price_medians(by: str = "categorie", window: str = "7D",
+                       db_path: str = DB_PATH) -> pd.DataFrame:
+    """Prix médian glissant par jour (utils.history), recalculé après chaque sauvegarde."""
+    def build():
+        conn, lock = get_shared_connection(db_path)
+        with lock:
+            return rolling_median(conn, by=by, window=window)
+
+    return STORE.get(f"history:{db_path}:{by}:{window}", build, tags=("history",))
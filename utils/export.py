@@ -0,0 +1,191 @@
+"""
+Exports téléchargeables (CSV, CSV gzip, Parquet) partagés par les pages.
+
+Rien n'est encodé au rendu de la page : download_args fournit à
+st.download_button une fonction appelée au clic. Le fichier est écrit par
+blocs dans `.cache/exports/` (pas de chaîne CSV complète en mémoire) et
+réutilisé tant que la version des données ne change pas. Les sessions
+Streamlit partagent ce dossier : chaque écriture passe par un fichier
+temporaire unique, et les KEEP_VERSIONS dernières versions d'un export sont
+gardées (une session peut encore lire la précédente).
+"""
+import gzip
+import hashlib
+import io
+import os
+import re
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # sans pyarrow : pas d'export Parquet
+    pa = pq = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXPORT_DIR = os.path.join(BASE_DIR, ".cache", "exports")
+
+# Format -> (type MIME, extension)
+FORMATS = {
+    "csv":     ("text/csv", ".csv"),
+    "csv.gz":  ("application/gzip", ".csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+FORMAT_LABELS = {"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}
+
+CHUNK_ROWS = 50_000
+KEEP_VERSIONS = 3   # versions gardées par nom d'export
+
+
+def available_formats() -> list[str]:
+    return [fmt for fmt in FORMATS if fmt != "parquet" or pq is not None]
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """Empreinte du contenu (colonnes + valeurs), sert de version par défaut."""
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def blocks(data, chunk_rows: int = CHUNK_ROWS):
+    """Blocs d'un DataFrame (au moins un, même vide), ou d'un itérable de DataFrames tel quel."""
+    if not isinstance(data, pd.DataFrame):
+        yield from data
+        return
+    for start in range(0, max(len(data), 1), chunk_rows):
+        yield data.iloc[start:start + chunk_rows]
+
+
+def empty_frame(dtypes: dict) -> pd.DataFrame:
+    """DataFrame vide aux colonnes et types `dtypes` ({colonne: type pandas})."""
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in dtypes.items()})
+
+
+def write_csv(df, raw, chunk_rows: int = CHUNK_ROWS, dtypes: dict | None = None) -> None:
+    """
+    Écrit le CSV (UTF-8, sans index) par blocs de `chunk_rows` lignes dans un flux binaire.
+
+    `df` peut aussi être un itérable de DataFrames (mode hors mémoire, voir
+    utils.outofcore) ; s'il est vide, seul l'en-tête de `dtypes` est écrit.
+    """
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    header = True
+    for chunk in blocks(df, chunk_rows):
+        chunk.to_csv(text, index=False, header=header)
+        header = False
+    if header and dtypes:
+        empty_frame(dtypes).to_csv(text, index=False)
+    text.flush()
+    text.detach()
+
+
+def write_parquet(df, path: str, chunk_rows: int = CHUNK_ROWS, dtypes: dict | None = None) -> None:
+    """
+    Écrit le Parquet un groupe de lignes par bloc (DataFrame ou itérable de DataFrames).
+
+    Le schéma vient de `dtypes` s'il est donné, sinon du premier bloc : les
+    blocs suivants y sont convertis (une colonne entièrement vide d'un bloc
+    ne change pas le type). Un itérable vide donne un fichier sans ligne.
+    """
+    schema = pa.Schema.from_pandas(empty_frame(dtypes), preserve_index=False) if dtypes else None
+    writer = None
+    try:
+        for chunk in blocks(df, chunk_rows):
+            if schema is None:
+                schema = pa.Schema.from_pandas(chunk.iloc[:0], preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        if writer is None:
+            writer = pq.ParquetWriter(path, schema if schema is not None else pa.schema([]))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _sweep(stem: str, ext: str) -> None:
+    """Supprime les exports `stem` au-delà des KEEP_VERSIONS plus récents."""
+    prefix = f"{stem}-"
+    versions = []
+    for name in os.listdir(EXPORT_DIR):
+        # Pas de "-" dans la version : « a-b » n'est pas une version de l'export « a »
+        if name.startswith(prefix) and name.endswith(ext) and "-" not in name[len(prefix):-len(ext)]:
+            path = os.path.join(EXPORT_DIR, name)
+            try:
+                versions.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                pass
+    for _, old in sorted(versions, reverse=True)[KEEP_VERSIONS:]:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass  # déjà supprimé par une autre session
+
+
+def export_file(df, stem: str, fmt: str = "csv", version: str | None = None,
+                dtypes: dict | None = None) -> str:
+    """
+    Chemin du fichier exporté ; écrit seulement s'il n'existe pas pour cette version.
+
+    `df` est un DataFrame ou un itérable de DataFrames (écrit bloc par bloc,
+    `version` obligatoire, `dtypes` conseillé : schéma Parquet et en-tête
+    d'un export vide). Seules les KEEP_VERSIONS dernières versions d'un même
+    nom sont gardées.
+    """
+    ext = FORMATS[fmt][1]
+    if version is None and not isinstance(df, pd.DataFrame):
+        raise ValueError("Export par blocs : version obligatoire (pas d'empreinte sans tout lire)")
+    # Pas de "-" dans la version : il sépare le nom de la version dans le fichier
+    version = re.sub(r"[^0-9A-Za-z_.]", "_", version or fingerprint(df))
+    path = os.path.join(EXPORT_DIR, f"{stem}-{version}{ext}")
+    try:
+        os.utime(path)   # version servie : la plus récente pour _sweep
+        return path
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    # Fichier temporaire propre à l'écriture : les sessions sont des threads du même processus
+    fd, tmp = tempfile.mkstemp(dir=EXPORT_DIR, prefix=f".{stem}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        if fmt == "parquet":
+            write_parquet(df, tmp, dtypes=dtypes)
+        elif fmt == "csv.gz":
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                write_csv(df, f, dtypes=dtypes)
+        else:
+            with open(tmp, "wb") as f:
+                write_csv(df, f, dtypes=dtypes)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    _sweep(stem, ext)
+    return path
+
+
+def download_args(data, stem: str, fmt: str = "csv", version: str | None = None,
+                  dtypes: dict | None = None) -> dict:
+    """
+    Arguments data / file_name / mime pour st.download_button.
+
+    Args:
+        data    : DataFrame, ou fonction sans argument qui le retourne (chargé au
+                  clic) ; la fonction peut aussi retourner un itérable de blocs
+        stem    : nom du fichier sans extension
+        fmt     : clé de FORMATS
+        version : version des données (défaut : empreinte calculée au clic)
+        dtypes  : types des colonnes d'un export par blocs (voir export_file)
+    """
+    mime, ext = FORMATS[fmt]
+
+    def build() -> bytes:
+        df = data() if callable(data) else data
+        with open(export_file(df, stem, fmt, version, dtypes), "rb") as f:
+            return f.read()
+
+    return {"data": build, "file_name": stem + ext, "mime": mime}
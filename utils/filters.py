@@ -0,0 +1,79 @@
+"""
+Index de filtrage du dashboard (catégorie + fourchette de prix).
+
+Construit une fois par chargement des données : codes de catégorie, positions
+triées par prix. Une requête se résout par recherche dichotomique sur les prix
+puis un masque sur les codes, et renvoie des positions de lignes (pas de copie
+du DataFrame). Les dernières combinaisons de filtres sont gardées en LRU.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CACHE_SIZE = 32
+
+
+class FilterIndex:
+    """
+    Index (catégorie, prix) d'un DataFrame, partageable entre sessions.
+
+    Args:
+        df           : DataFrame indexé (non conservé, seules les colonnes utiles)
+        category_col : colonne catégorielle
+        price_col    : colonne de prix (les lignes sans prix ne sortent jamais)
+    """
+
+    def __init__(self, df: pd.DataFrame, category_col: str = "categorie",
+                 price_col: str = "prix_num", cache_size: int = CACHE_SIZE):
+        codes, uniques = pd.factorize(df[category_col])
+        self.codes = codes.astype(np.int16 if len(uniques) < 2 ** 15 else np.int32)
+        self.categories = {value: code for code, value in enumerate(uniques)}
+
+        prix = df[price_col].to_numpy(dtype="float64", na_value=np.nan)
+        order = np.argsort(prix, kind="stable")
+        order = order[~np.isnan(prix[order])]
+        self.order = order
+        self.sorted_prices = prix[order]
+        self.n = len(df)
+
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def select(self, categories=None, prix_min=None, prix_max=None) -> np.ndarray:
+        """
+        Positions (croissantes, lecture seule) des lignes correspondant aux filtres.
+
+        Args:
+            categories         : valeurs de catégorie à garder (None = toutes)
+            prix_min, prix_max : bornes incluses (None = sans borne)
+        """
+        key = (None if categories is None else frozenset(categories), prix_min, prix_max)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        rows = self._compute(categories, prix_min, prix_max)
+        rows.flags.writeable = False
+        with self._lock:
+            self._cache[key] = rows
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    def _compute(self, categories, prix_min, prix_max) -> np.ndarray:
+        lo = 0 if prix_min is None else np.searchsorted(self.sorted_prices, prix_min, "left")
+        hi = (len(self.order) if prix_max is None
+              else np.searchsorted(self.sorted_prices, prix_max, "right"))
+
+        mask = np.zeros(self.n, dtype=bool)
+        mask[self.order[lo:hi]] = True
+        if categories is not None:
+            allowed = np.zeros(len(self.categories), dtype=bool)
+            allowed[[self.categories[c] for c in categories if c in self.categories]] = True
+            # Catégorie manquante : code -1, qui indexerait la dernière catégorie
+            mask &= (self.codes >= 0) & allowed[self.codes]
+        return np.flatnonzero(mask)
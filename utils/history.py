@@ -0,0 +1,324 @@
+"""
+Historique des prix des annonces suivies (même base SQLite que annonces).
+
+Trois tables, remplies dans la transaction de save_scraped_data :
+
+    prix_releves    une ligne par sauvegarde : releve_id, t (horodatage)
+    prix_suivi      une ligne par annonce (empreinte categorie + listing_key) :
+                    listing_id, ville, dernier prix, première / dernière vue,
+                    nombre de relevés et de changements de prix
+    prix_historique une ligne par (annonce, relevé) : listing_id, releve_id, prix
+
+prix_releves et prix_historique ne sont jamais modifiées (ajout seul). Un
+relevé tient en trois entiers : le prix n'est écrit que s'il a changé depuis
+le relevé précédent de l'annonce, sinon NULL (« inchangé », aucun octet de
+donnée). PRIX_ABSENT code une annonce sans prix numérique.
+
+Lectures : trajectoire d'une annonce par clé primaire (listing_id,
+releve_id) ; fenêtres de temps par l'index sur releve_id (les relevés sont
+numérotés dans l'ordre du temps). Aucune requête ne parcourt toute la table.
+"""
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+PRIX_ABSENT = -1    # annonce relevée sans prix numérique (« Prix sur demande »)
+CHUNK_IDS = 10_000  # identifiants par requête IN (...)
+
+GROUPES = ("categorie", "ville")
+
+
+def init_history(conn: sqlite3.Connection) -> None:
+    """Crée les tables d'historique ; les amorce avec les annonces en base si elles sont neuves."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'prix_historique'"
+    ).fetchone()
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS prix_releves (
+            releve_id INTEGER PRIMARY KEY,
+            t         REAL NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_prix_releves_t ON prix_releves(t);
+
+        CREATE TABLE IF NOT EXISTS prix_suivi (
+            listing_id     INTEGER PRIMARY KEY,
+            categorie      TEXT NOT NULL,
+            listing_key    TEXT NOT NULL,
+            ville          TEXT,
+            dernier_prix   INTEGER,
+            premiere_vue   REAL NOT NULL,
+            derniere_vue   REAL NOT NULL,
+            nb_releves     INTEGER NOT NULL DEFAULT 0,
+            nb_changements INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (categorie, listing_key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_prix_suivi_changements ON prix_suivi(nb_changements);
+
+        CREATE TABLE IF NOT EXISTS prix_historique (
+            listing_id INTEGER NOT NULL,
+            releve_id  INTEGER NOT NULL,
+            prix       INTEGER,
+            PRIMARY KEY (listing_id, releve_id)
+        ) WITHOUT ROWID;
+        -- Index couvrant (avec la clé primaire) : une fenêtre de temps se lit sans la table
+        CREATE INDEX IF NOT EXISTS idx_prix_historique_releve ON prix_historique(releve_id, prix);
+    """)
+    if not exists:
+        # Base existante : un premier relevé par annonce, à sa dernière vue
+        conn.execute(
+            "INSERT OR IGNORE INTO prix_releves (t) SELECT DISTINCT scraped_at FROM annonces ORDER BY 1"
+        )
+        conn.execute(f"""
+            INSERT INTO prix_suivi (categorie, listing_key, ville, dernier_prix,
+                                    premiere_vue, derniere_vue, nb_releves)
+            SELECT categorie, listing_key, ville, COALESCE(prix_num, {PRIX_ABSENT}),
+                   first_seen, scraped_at, 1
+            FROM annonces
+        """)
+        conn.execute("""
+            INSERT INTO prix_historique (listing_id, releve_id, prix)
+            SELECT s.listing_id, r.releve_id, s.dernier_prix
+            FROM prix_suivi AS s JOIN prix_releves AS r ON r.t = s.derniere_vue
+        """)
+
+
+def record_releve(conn: sqlite3.Connection, t: float) -> int:
+    """
+    Ajoute le relevé des annonces sauvegardées à l'instant `t` (scraped_at).
+
+    À appeler dans la transaction de save_scraped_data, après l'upsert.
+
+    Returns:
+        int : nombre de changements de prix enregistrés
+    """
+    releve_id = conn.execute("INSERT INTO prix_releves (t) VALUES (?)", (t,)).lastrowid
+    conn.execute("""
+        INSERT OR IGNORE INTO prix_suivi (categorie, listing_key, premiere_vue, derniere_vue)
+        SELECT categorie, listing_key, first_seen, scraped_at FROM annonces WHERE scraped_at = ?
+    """, (t,))
+    # NULLIF : prix identique au précédent -> NULL ; pas de précédent -> prix écrit
+    conn.execute(f"""
+        INSERT INTO prix_historique (listing_id, releve_id, prix)
+        SELECT s.listing_id, :r, NULLIF(COALESCE(a.prix_num, {PRIX_ABSENT}), s.dernier_prix)
+        FROM annonces AS a
+        JOIN prix_suivi AS s ON s.categorie = a.categorie AND s.listing_key = a.listing_key
+        WHERE a.scraped_at = :t
+    """, {"r": releve_id, "t": t})
+    before = conn.total_changes
+    conn.execute(f"""
+        UPDATE prix_suivi SET
+            nb_changements = nb_changements + (dernier_prix IS NOT NULL),
+            dernier_prix   = COALESCE(a.prix_num, {PRIX_ABSENT})
+        FROM annonces AS a
+        WHERE a.scraped_at = :t
+          AND a.categorie = prix_suivi.categorie AND a.listing_key = prix_suivi.listing_key
+          AND dernier_prix IS NOT COALESCE(a.prix_num, {PRIX_ABSENT})
+    """, {"t": t})
+    changes = conn.total_changes - before
+    conn.execute("""
+        UPDATE prix_suivi SET ville = a.ville, derniere_vue = :t, nb_releves = nb_releves + 1
+        FROM annonces AS a
+        WHERE a.scraped_at = :t
+          AND a.categorie = prix_suivi.categorie AND a.listing_key = prix_suivi.listing_key
+    """, {"t": t})
+    return changes
+
+
+# ── Lecture ──
+
+def _chunks(ids) -> list:
+    ids = [int(i) for i in ids]   # int numpy : non reconnu par sqlite3
+    return [ids[i:i + CHUNK_IDS] for i in range(0, len(ids), CHUNK_IDS)]
+
+
+def _prix(values: pd.Series) -> pd.Series:
+    """Prix décodés : PRIX_ABSENT -> <NA>."""
+    return values.astype("Int64").mask(values == PRIX_ABSENT)
+
+
+def history_summary(conn: sqlite3.Connection) -> dict:
+    """Annonces suivies, relevés, observations, changements de prix et durée en ligne moyenne (jours)."""
+    releves, debut, fin = conn.execute(
+        "SELECT COUNT(*), MIN(t), MAX(t) FROM prix_releves"
+    ).fetchone()
+    annonces, observations, changements, duree = conn.execute("""
+        SELECT COUNT(*), COALESCE(SUM(nb_releves), 0), COALESCE(SUM(nb_changements), 0),
+               AVG(derniere_vue - premiere_vue)
+        FROM prix_suivi
+    """).fetchone()
+    return {
+        "annonces": annonces, "releves": releves, "observations": observations,
+        "changements": changements, "duree_moyenne_jours": (duree or 0.0) / 86400,
+        "debut": debut, "fin": fin,
+    }
+
+
+def most_changed(conn: sqlite3.Connection, limit: int = 20) -> pd.DataFrame:
+    """Annonces dont le prix a le plus changé (index sur nb_changements)."""
+    return pd.read_sql_query(
+        """
+        SELECT s.listing_id, s.categorie, s.listing_key, a.nom, s.ville,
+               s.nb_changements, s.nb_releves, s.premiere_vue, s.derniere_vue
+        FROM prix_suivi AS s
+        LEFT JOIN annonces AS a ON a.categorie = s.categorie AND a.listing_key = s.listing_key
+        WHERE s.nb_changements > 0
+        ORDER BY s.nb_changements DESC LIMIT ?
+        """,
+        conn, params=(limit,),
+    )
+
+
+def trajectory(conn: sqlite3.Connection, categorie: str, listing_key: str) -> pd.DataFrame:
+    """
+    Trajectoire de prix d'une annonce : un point par relevé.
+
+    Returns:
+        DataFrame : colonnes t (datetime), prix_num (Int64, <NA> sans prix), change (bool)
+    """
+    df = pd.read_sql_query(
+        """
+        SELECT r.t, h.prix
+        FROM prix_suivi AS s
+        JOIN prix_historique AS h ON h.listing_id = s.listing_id
+        JOIN prix_releves AS r ON r.releve_id = h.releve_id
+        WHERE s.categorie = ? AND s.listing_key = ?
+        ORDER BY h.releve_id
+        """,
+        conn, params=(categorie, listing_key),
+    )
+    change = df["prix"].notna()
+    return pd.DataFrame({
+        "t": pd.to_datetime(df["t"], unit="s"),
+        "prix_num": _prix(df["prix"].ffill()),
+        "change": change,
+    })
+
+
+def _last_prices(conn: sqlite3.Connection, listing_ids, before: int) -> pd.Series:
+    """Dernier prix écrit de chaque annonce avant le relevé `before` (clé primaire)."""
+    parts = []
+    for ids in _chunks(listing_ids):
+        marks = ", ".join("?" * len(ids))
+        parts.append(pd.read_sql_query(
+            f"""
+            SELECT h.listing_id, h.prix
+            FROM (SELECT listing_id, MAX(releve_id) AS releve_id FROM prix_historique
+                  WHERE listing_id IN ({marks}) AND releve_id < ? AND prix IS NOT NULL
+                  GROUP BY listing_id) AS last
+            JOIN prix_historique AS h USING (listing_id, releve_id)
+            """,
+            conn, params=[*ids, before],
+        ))
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["listing_id", "prix"])
+    return df.set_index("listing_id")["prix"]
+
+
+def observations(conn: sqlite3.Connection, start: float, end: float, by: str = "categorie",
+                 groups=None) -> pd.DataFrame:
+    """
+    Relevés entre `start` et `end` (horodatages), prix reconstitués.
+
+    Les prix « inchangés » (NULL) reprennent le dernier prix écrit, y compris
+    avant `start` (une recherche par annonce sur la clé primaire).
+
+    Returns:
+        DataFrame : colonnes listing_id, t, <by>, prix_num (float, NaN sans prix) ;
+        annonces sans <by> écartées
+    """
+    if by not in GROUPES:
+        raise ValueError(f"Regroupement inconnu : {by!r} (attendu : {', '.join(GROUPES)})")
+    first, last = conn.execute(
+        "SELECT MIN(releve_id), MAX(releve_id) FROM prix_releves WHERE t BETWEEN ? AND ?",
+        (start, end),
+    ).fetchone()
+    columns = ["listing_id", "t", by, "prix_num"]
+    if first is None:
+        return pd.DataFrame(columns=columns)
+    # Entiers seuls, lus dans l'index couvrant ; groupe et date ajoutés ensuite
+    df = pd.read_sql_query(
+        "SELECT listing_id, releve_id, prix FROM prix_historique WHERE releve_id BETWEEN ? AND ?",
+        conn, params=(first, last),
+    )
+    releves = pd.read_sql_query(
+        "SELECT releve_id, t FROM prix_releves WHERE releve_id BETWEEN ? AND ?",
+        conn, params=(first, last), index_col="releve_id",
+    )["t"]
+    where, params = f" WHERE {by} IS NOT NULL", []
+    if groups:
+        params = list(groups)
+        where += f" AND {by} IN ({', '.join('?' * len(params))})"
+    # Une ligne par annonce (table des annonces suivies, pas l'historique)
+    labels = pd.read_sql_query(f"SELECT listing_id, {by} FROM prix_suivi{where}", conn,
+                               params=params, index_col="listing_id")[by].astype("category")
+    df = df[df["listing_id"].isin(labels.index)]
+    df = df.sort_values("listing_id", kind="stable", ignore_index=True)
+    df["t"] = df["releve_id"].map(releves)
+    df[by] = df["listing_id"].map(labels)
+    # Premier relevé de la fenêtre « inchangé » : prix écrit avant la fenêtre
+    head = ~df["listing_id"].duplicated()
+    missing = head & df["prix"].isna()
+    if missing.any():
+        seeds = _last_prices(conn, df.loc[missing, "listing_id"].unique(), first)
+        df.loc[missing, "prix"] = df.loc[missing, "listing_id"].map(seeds)
+    df["prix"] = df.groupby("listing_id")["prix"].ffill()
+    df["prix_num"] = df["prix"].astype("float64").mask(df["prix"] == PRIX_ABSENT)
+    return df[columns]
+
+
+def rolling_median(conn: sqlite3.Connection, by: str = "categorie", window: str = "7D",
+                   freq: str = "1D", start: float | None = None, end: float | None = None,
+                   groups=None) -> pd.DataFrame:
+    """
+    Prix médian glissant par catégorie ou ville.
+
+    Pour chaque pas de la grille (`freq`, daté de son début), médiane des
+    prix des annonces relevées dans la fenêtre `window` qui se termine avec
+    ce pas ; chaque annonce compte une fois, à son dernier prix de la fenêtre.
+
+    Args:
+        by         : "categorie" ou "ville"
+        window     : durée de la fenêtre (pandas, ex : "7D", "30D")
+        freq       : pas de la grille (ex : "1D", "6h")
+        start, end : bornes (horodatages) ; défaut : tout l'historique
+        groups     : catégories / villes à garder (None = toutes)
+
+    Returns:
+        DataFrame : colonnes date, <by>, prix_median, nb_annonces
+    """
+    window_s = pd.Timedelta(window).total_seconds()
+    step = pd.Timedelta(freq).total_seconds()
+    debut, fin = conn.execute("SELECT MIN(t), MAX(t) FROM prix_releves").fetchone()
+    columns = ["date", by, "prix_median", "nb_annonces"]
+    if debut is None:
+        return pd.DataFrame(columns=columns)
+    start = debut if start is None else start
+    end = fin if end is None else end
+
+    df = observations(conn, start - window_s, end, by, groups)
+    df = df[df["prix_num"].notna()]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    # Pas de grille calés sur le calendrier (minuit pour "1D") ; k = pas qui contient t
+    origin = pd.Timestamp(start, unit="s").floor(freq).timestamp()
+    nb = int((end - origin) // step) + 1
+    df = df.assign(bucket=((df["t"].to_numpy() - origin) // step).astype("int64"))
+    df = df.sort_values(["bucket", "t"], kind="stable")
+    # Dernier prix de chaque annonce par pas de grille : la suite ne lit plus que ça
+    df = df.drop_duplicates(["listing_id", "bucket"], keep="last")
+    span_buckets = max(1, int(np.ceil(window_s / step)))
+    buckets = df["bucket"].to_numpy()
+
+    parts = []
+    for k in range(nb):
+        lo, hi = np.searchsorted(buckets, [k - span_buckets + 1, k + 1])
+        if lo == hi:
+            continue
+        part = df.iloc[lo:hi].drop_duplicates("listing_id", keep="last")
+        stats = part.groupby(by)["prix_num"].agg(prix_median="median", nb_annonces="size")
+        parts.append(stats.reset_index().assign(date=origin + k * step))
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    out = pd.concat(parts, ignore_index=True)
+    out["date"] = pd.to_datetime(out["date"], unit="s")
+    return out[columns]
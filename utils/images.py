@@ -0,0 +1,420 @@
+"""
+Miniatures et empreintes perceptuelles des images d'annonces.
+
+Les images (`image_lien`) sont téléchargées sur un pool borné : au plus
+`workers` connexions ouvertes, et le limiteur de débit par hôte du scraper
+(`images.coinafrique.com` a son propre seau). Chaque image est réduite une
+fois en miniature JPEG, rangée dans un cache disque adressé par contenu
+(`.cache/thumbs/ab/abcdef….jpg` : deux URLs de même image partagent un
+fichier), borné en taille avec éviction LRU. Son empreinte dHash (64 bits)
+est écrite à côté de l'annonce (colonne image_phash) ; deux images presque
+identiques ont des empreintes à faible distance de Hamming.
+
+Utilisable sans l'interface Streamlit (cron) :
+
+    python -m utils.images                    # annonces de la base sans empreinte
+    python -m utils.images --limit 500 --workers 8 --rate 10
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+import numpy as np
+import requests
+from PIL import Image
+
+from utils.database import DB_PATH, get_connection, init_db, pending_images, save_image_hashes
+from utils.metrics import span
+from utils.scraper import MAX_RETRIES, FetchStats, fetch
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THUMBS_DIR = os.path.join(BASE_DIR, ".cache", "thumbs")
+
+THUMB_SIZE = 160                     # côté max des miniatures (px)
+THUMB_QUALITY = 75                   # qualité JPEG des miniatures
+HASH_SIZE = 8                        # dHash 8 × 8 -> 64 bits
+IMAGE_WORKERS = 16                   # connexions simultanées au plus
+IMAGE_RATE = 20.0                    # requêtes/s maximum par hôte d'images
+DEFAULT_MAX_BYTES = 100 * 1024 ** 2  # taille max des miniatures avant éviction LRU
+SAVE_EVERY = 200                     # empreintes écrites en base par transaction
+
+
+class ImageDecodeError(ValueError):
+    """Image illisible : format inconnu ou fichier tronqué (échec définitif)."""
+
+
+class ImageInfo(NamedTuple):
+    url: str
+    sha1: str        # empreinte du fichier miniature (nom dans le cache)
+    phash: int       # dHash signé (INTEGER SQLite)
+    width: int       # dimensions de l'image d'origine
+    height: int
+
+
+# ── Empreinte perceptuelle et miniature ──
+
+def dhash(image: Image.Image) -> int:
+    """
+    dHash : signe des différences horizontales d'une réduction 9 × 8 en gris.
+
+    Retourné signé sur 64 bits pour tenir dans un INTEGER SQLite.
+    """
+    gray = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+    px = np.asarray(gray, dtype=np.int16)
+    value = int.from_bytes(np.packbits(px[:, 1:] > px[:, :-1]).tobytes(), "big")
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming(a: int, b: int) -> int:
+    """Nombre de bits différents entre deux empreintes."""
+    return ((a ^ b) & ((1 << 64) - 1)).bit_count()
+
+
+def make_thumbnail(data: bytes) -> tuple[bytes, int, int, int]:
+    """
+    Miniature JPEG et empreinte d'une image.
+
+    Returns:
+        (miniature, dhash, largeur, hauteur d'origine)
+
+    Raises:
+        ImageDecodeError : format non reconnu ou image tronquée
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            # JPEG : décodage directement à une résolution réduite (bien plus rapide)
+            img.draft("RGB", (THUMB_SIZE * 2, THUMB_SIZE * 2))
+            img = img.convert("RGB")
+            phash = dhash(img)
+            img.thumbnail((THUMB_SIZE, THUMB_SIZE))
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=THUMB_QUALITY, optimize=True)
+    except (OSError, SyntaxError) as e:
+        # Tout se passe en mémoire : OSError vient ici du décodeur (UnidentifiedImageError,
+        # « image file is truncated »…), pas du disque ni du réseau
+        raise ImageDecodeError(str(e)) from e
+    return out.getvalue(), phash, width, height
+
+
+# ── Cache disque des miniatures ──
+
+class ThumbnailCache:
+    """
+    Miniatures adressées par contenu, index SQLite des URLs.
+
+    Les fichiers sont nommés par le sha1 de la miniature ; l'index associe
+    chaque URL à son fichier, son empreinte et ses dimensions. L'éviction
+    supprime les fichiers les moins récemment lus mais garde l'index (les
+    empreintes restent connues, seule la miniature est à retélécharger).
+
+    Args:
+        directory : dossier du cache (fichiers et index.db)
+        max_bytes : taille totale max des miniatures
+    """
+
+    def __init__(self, directory: str = THUMBS_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")   # un index perdu se reconstruit
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha1        TEXT PRIMARY KEY,
+                size        INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_blobs_accessed ON blobs(accessed_at);
+            CREATE TABLE IF NOT EXISTS urls (
+                url       TEXT PRIMARY KEY,
+                sha1      TEXT NOT NULL,
+                phash     INTEGER NOT NULL,
+                width     INTEGER,
+                height    INTEGER,
+                stored_at REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def path(self, sha1: str) -> str:
+        return os.path.join(self.directory, sha1[:2], sha1 + ".jpg")
+
+    def get(self, url: str) -> ImageInfo | None:
+        """Métadonnées d'une URL (même si sa miniature a été évincée)."""
+        return self.lookup([url]).get(url)
+
+    def lookup(self, urls: Iterable[str]) -> dict[str, ImageInfo]:
+        """Métadonnées connues d'un lot d'URLs."""
+        urls = list(dict.fromkeys(u for u in urls if u))
+        found = {}
+        with self._lock:
+            for i in range(0, len(urls), 500):
+                chunk = urls[i:i + 500]
+                for row in self._conn.execute(
+                    f"SELECT url, sha1, phash, width, height FROM urls "
+                    f"WHERE url IN ({', '.join('?' * len(chunk))})", chunk,
+                ):
+                    found[row[0]] = ImageInfo(*row)
+        return found
+
+    def read(self, sha1: str) -> bytes | None:
+        """Contenu d'une miniature, None si absente ou évincée."""
+        try:
+            with open(self.path(sha1), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE blobs SET accessed_at = ? WHERE sha1 = ?", (time.time(), sha1))
+            self._conn.commit()
+        return data
+
+    def data_uri(self, url: str, info: ImageInfo | None = None) -> str | None:
+        """Miniature en URI data: (colonne image de st.dataframe), None si absente."""
+        info = info or self.get(url)
+        data = self.read(info.sha1) if info else None
+        return "data:image/jpeg;base64," + base64.b64encode(data).decode("ascii") if data else None
+
+    def put(self, url: str, thumbnail: bytes, phash: int, width: int, height: int) -> ImageInfo:
+        sha1 = hashlib.sha1(thumbnail).hexdigest()
+        path = self.path(sha1)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(thumbnail)
+            os.replace(tmp, path)   # écriture atomique : jamais de fichier partiel
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)", (sha1, len(thumbnail), now)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?, ?, ?)",
+                (url, sha1, phash, width, height, now),
+            )
+            self._evict()
+            self._conn.commit()
+        return ImageInfo(url, sha1, phash, width, height)
+
+    def has_thumbnail(self, info: ImageInfo) -> bool:
+        return os.path.exists(self.path(info.sha1))
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for sha1, size in self._conn.execute(
+            "SELECT sha1, size FROM blobs ORDER BY accessed_at"
+        ).fetchall():
+            self._conn.execute("DELETE FROM blobs WHERE sha1 = ?", (sha1,))
+            try:
+                os.remove(self.path(sha1))
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> dict:
+        with self._lock:
+            urls = self._conn.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+            files, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+        return {"urls": urls, "files": files, "bytes": size}
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_default_cache: ThumbnailCache | None = None
+_default_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Cache partagé par le processus (dossier `.cache/thumbs`)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ThumbnailCache()
+        return _default_cache
+
+
+# ── Téléchargement ──
+
+def fetch_image(url: str, cache: ThumbnailCache, rate: float | None = IMAGE_RATE,
+                stats: FetchStats | None = None, max_retries: int = MAX_RETRIES) -> ImageInfo:
+    """Télécharge une image, la réduit et la range dans le cache."""
+    with span("image_fetch"):
+        data = fetch(url, rate=rate, stats=stats, max_retries=max_retries).content
+    with span("thumbnail", bytes=len(data)):
+        return cache.put(url, *make_thumbnail(data))
+
+
+def is_permanent(error: Exception) -> bool:
+    """Échec définitif (404, image illisible ou tronquée) : inutile de réessayer plus tard."""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return 400 <= error.response.status_code < 500 and error.response.status_code != 429
+    return isinstance(error, (ImageDecodeError, Image.DecompressionBombError))
+
+
+def iter_images(urls: Iterable[str], cache: ThumbnailCache | None = None,
+                workers: int = IMAGE_WORKERS, rate: float | None = IMAGE_RATE,
+                stats: FetchStats | None = None, refresh: bool = False,
+                max_retries: int = MAX_RETRIES) -> Iterator[tuple[str, ImageInfo | None, Exception | None]]:
+    """
+    Miniatures et empreintes d'une suite d'URLs, dans l'ordre d'achèvement.
+
+    Les URLs déjà en cache (avec leur miniature) ne sont pas retéléchargées,
+    sauf `refresh` ; chacune a `max_retries` reprises au plus. Au plus
+    2 × `workers` téléchargements sont en vol ou en attente : la mémoire reste
+    constante quel que soit le nombre d'URLs.
+
+    Yields:
+        (url, ImageInfo ou None, exception ou None)
+    """
+    cache = cache or get_thumbnail_cache()
+    url_iter = iter(dict.fromkeys(urls))
+    pending: dict = {}
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="images")
+
+    def submit_next() -> tuple | None:
+        """Soumet l'URL suivante ; renvoie directement le résultat d'un succès de cache."""
+        url = next(url_iter, None)
+        if url is None:
+            return None
+        info = None if refresh else cache.get(url)
+        if info is not None and cache.has_thumbnail(info):
+            return url, info, None
+        pending[pool.submit(fetch_image, url, cache, rate, stats, max_retries)] = url
+        return ()
+
+    try:
+        while len(pending) < 2 * workers:
+            hit = submit_next()
+            if hit is None:
+                break
+            if hit:
+                yield hit
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = pending.pop(future)
+                error = future.exception()
+                yield url, (None if error else future.result()), error
+            while len(pending) < 2 * workers:
+                hit = submit_next()
+                if hit is None:
+                    break
+                if hit:
+                    yield hit
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def thumbnails(urls: list, cache: ThumbnailCache | None = None, fetch_missing: bool = True,
+               workers: int = IMAGE_WORKERS, rate: float | None = IMAGE_RATE) -> list[str | None]:
+    """
+    Miniatures (URI data:) alignées sur `urls`, None si absente ou en échec.
+
+    Les miniatures manquantes sont téléchargées d'abord si `fetch_missing`,
+    sans reprise (affichage interactif : une image en échec reste vide).
+    """
+    cache = cache or get_thumbnail_cache()
+    valid = [u for u in urls if isinstance(u, str) and u.startswith("http")]
+    if fetch_missing:
+        for _ in iter_images(valid, cache, workers, rate, max_retries=0):
+            pass
+    known = cache.lookup(valid)
+    return [cache.data_uri(u, known[u]) if u in known else None for u in urls]
+
+
+def image_hashes(urls: list, fetch_missing: bool = True, cache: ThumbnailCache | None = None,
+                 workers: int = IMAGE_WORKERS, rate: float | None = IMAGE_RATE) -> dict[str, int]:
+    """
+    Empreintes dHash connues de `urls` ({url: empreinte}), pour NearDupIndex.
+
+    Les empreintes manquantes sont téléchargées d'abord si `fetch_missing`,
+    sans reprise ; une image en échec est simplement absente du résultat.
+    """
+    cache = cache or get_thumbnail_cache()
+    valid = [u for u in urls if isinstance(u, str) and u.startswith("http")]
+    if fetch_missing:
+        missing = [u for u in valid if u not in cache.lookup(valid)]
+        for _ in iter_images(missing, cache, workers, rate, max_retries=0):
+            pass
+    return {url: info.phash for url, info in cache.lookup(valid).items()
+            if info.phash is not None}
+
+
+def hash_listings(conn: sqlite3.Connection, limit: int | None = None,
+                  cache: ThumbnailCache | None = None, workers: int = IMAGE_WORKERS,
+                  rate: float | None = IMAGE_RATE) -> dict:
+    """
+    Calcule les empreintes des annonces de la base qui n'en ont pas encore.
+
+    Les échecs définitifs (404, fichier illisible) sont marqués traités sans
+    empreinte ; les échecs passagers seront repris au prochain appel.
+
+    Returns:
+        dict : {"images", "hashed", "failed", "retry_later", "seconds", "images_per_sec"}
+    """
+    urls = pending_images(conn, limit)
+    stats = FetchStats()
+    batch: dict[str, int | None] = {}
+    counts = {"hashed": 0, "failed": 0, "retry_later": 0}
+    start = time.perf_counter()
+    with span("hash_listings", images=len(urls)) as labels:
+        for url, info, error in iter_images(urls, cache, workers, rate, stats):
+            if info is not None:
+                batch[url] = info.phash
+                counts["hashed"] += 1
+            elif is_permanent(error):
+                batch[url] = None
+                counts["failed"] += 1
+            else:
+                counts["retry_later"] += 1
+            if len(batch) >= SAVE_EVERY:
+                save_image_hashes(conn, batch)
+                batch = {}
+        save_image_hashes(conn, batch)
+        labels.update(counts)
+    seconds = time.perf_counter() - start
+    return {"images": len(urls), **counts, "seconds": round(seconds, 3),
+            "images_per_sec": round(len(urls) / seconds, 2) if seconds else 0.0}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Miniatures et empreintes des images d'annonces")
+    parser.add_argument("--db", default=os.path.join(BASE_DIR, DB_PATH))
+    parser.add_argument("--limit", type=int, help="nombre max d'images à traiter")
+    parser.add_argument("--workers", type=int, default=IMAGE_WORKERS,
+                        help="connexions simultanées au plus")
+    parser.add_argument("--rate", type=float, default=IMAGE_RATE,
+                        help="requêtes/s maximum par hôte d'images")
+    args = parser.parse_args(argv)
+
+    conn = get_connection(args.db)
+    init_db(conn)
+    try:
+        report = hash_listings(conn, args.limit, workers=args.workers, rate=args.rate)
+    finally:
+        conn.close()
+    print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
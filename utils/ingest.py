@@ -0,0 +1,211 @@
+"""
+Registre des CSV Web Scraper de `data/`.
+
+Chaque CSV est inspecté une seule fois par version du fichier : encodage
+(BOM compris), séparateur, correspondance des en-têtes vers le schéma
+(nom, prix, adresse, image_lien) et catégorie. La spécification détectée
+est gardée dans `registry.json` (dossier de cache) ; les lectures suivantes
+ne lisent que les colonnes utiles (usecols, typées en chaînes), sans
+re-détection. Les colonnes de métadonnées Web Scraper (web-scraper-order…)
+ne sont jamais lues.
+
+Un CSV déposé dans `data/` est pris en compte au chargement suivant, sans
+modifier le code, si sa catégorie est reconnue : URL de départ Web Scraper
+(…/categorie/<slug>), sinon mots du nom de fichier (vetement_hommes.csv ->
+vetements-homme).
+"""
+import codecs
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import NamedTuple
+
+import pandas as pd
+
+SAMPLE_BYTES = 64 * 1024    # début de fichier lu pour la détection
+DELIMITERS = ",;\t|"
+REGISTRY_VERSION = 1        # incrémenter si les règles de détection changent
+
+# En-têtes normalisés (minuscules, sans accents ni ponctuation) -> colonne du schéma
+HEADER_PATTERNS = {
+    "nom":        re.compile(r"^(type|nom|titre|title|article)\b"),
+    "prix":       re.compile(r"^(prix|price)\b"),
+    "adresse":    re.compile(r"^(adresse|address|localisation|lieu)\b"),
+    "image_lien": re.compile(r"^(image|img|photo)\b"),
+}
+REQUIRED = ("nom", "prix")
+START_URL = "web scraper start url"
+_CATEGORY_URL = re.compile(r"/categorie/([a-z0-9-]+)")
+
+
+class CsvSpec(NamedTuple):
+    key: str          # identifiant du jeu (nom du fichier sans extension)
+    filename: str
+    categorie: str | None   # None : catégorie non reconnue, fichier ignoré
+    sep: str
+    encoding: str
+    columns: dict     # en-tête d'origine -> colonne du schéma
+    signature: list   # [taille, mtime_ns] du fichier inspecté
+
+
+def normalize_header(header: str) -> str:
+    """« Image-src » -> « image src », « Type chaussure » -> « type chaussure »."""
+    text = unicodedata.normalize("NFKD", header.replace("\ufeff", ""))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[\W_]+", " ", text.casefold()).strip()
+
+
+def _words(text: str) -> set[str]:
+    """Mots au singulier (« chaussures_hommes » -> {chaussure, homme})."""
+    return {w[:-1] if w.endswith("s") else w for w in normalize_header(text).split()}
+
+
+def detect_encoding(sample: bytes) -> str:
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    for encoding in ("utf-8", "cp1252"):
+        try:
+            # Décodage incrémental : un caractère coupé en fin d'échantillon n'est pas une erreur
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            pass
+    return "latin-1"
+
+
+def detect_sep(header_line: str) -> str:
+    """Séparateur le plus fréquent hors guillemets dans l'en-tête (« , » par défaut)."""
+    unquoted = re.sub(r'"[^"]*"', "", header_line)
+    counts = {sep: unquoted.count(sep) for sep in DELIMITERS}
+    best = max(counts, key=counts.get)
+    return best if counts[best] else ","
+
+
+def map_headers(headers: list[str]) -> dict:
+    """En-tête d'origine -> colonne du schéma ; le premier en-tête reconnu l'emporte."""
+    columns = {}
+    for header in headers:
+        name = normalize_header(header)
+        for column, pattern in HEADER_PATTERNS.items():
+            if column not in columns.values() and pattern.match(name):
+                columns[header] = column
+                break
+    return columns
+
+
+def detect_category(filename: str, rows: list[list[str]], categories) -> str | None:
+    """Catégorie d'après l'URL de départ Web Scraper, sinon d'après le nom du fichier."""
+    headers = [normalize_header(h) for h in rows[0]] if rows else []
+    if START_URL in headers:
+        i = headers.index(START_URL)
+        for row in rows[1:]:
+            match = _CATEGORY_URL.search(row[i]) if len(row) > i else None
+            if match and match.group(1) in categories:
+                return match.group(1)
+    words = _words(os.path.splitext(filename)[0])
+    found = [slug for slug in categories if _words(slug) <= words]
+    return max(found, key=lambda slug: len(_words(slug))) if found else None
+
+
+def inspect(path: str, categories) -> CsvSpec:
+    """Détecte la spécification de lecture d'un CSV à partir de son début."""
+    with open(path, "rb") as f:
+        sample = f.read(SAMPLE_BYTES)
+    encoding = detect_encoding(sample)
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample, final=False)
+    text = text.lstrip("\ufeff")
+    sep = detect_sep(text.split("\n", 1)[0])
+    # Lignes complètes seulement : la dernière de l'échantillon peut être coupée
+    complete = text[:text.rfind("\n") + 1] or text
+    rows = list(itertools.islice(csv.reader(io.StringIO(complete), delimiter=sep), 50))
+    filename = os.path.basename(path)
+    columns = map_headers(rows[0]) if rows else {}
+    categorie = detect_category(filename, rows, categories)
+    if not all(c in columns.values() for c in REQUIRED):
+        categorie = None
+    st = os.stat(path)
+    return CsvSpec(os.path.splitext(filename)[0], filename, categorie, sep, encoding,
+                   columns, [st.st_size, st.st_mtime_ns])
+
+
+# ── Registre ──
+
+_lock = threading.Lock()
+_known: dict[str, dict[str, CsvSpec]] = {}   # registry.json -> {fichier: spécification}
+
+
+def _load_registry(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("version") == REGISTRY_VERSION:
+            return {name: CsvSpec(**spec) for name, spec in stored["files"].items()}
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return {}
+
+
+def _save_registry(path: str, specs: dict) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": REGISTRY_VERSION,
+                       "files": {name: spec._asdict() for name, spec in specs.items()}},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # système de fichiers en lecture seule : détection refaite au prochain lancement
+
+
+def discover(data_dir: str, cache_dir: str, categories) -> list[CsvSpec]:
+    """
+    Spécifications de tous les CSV de `data_dir`, triées par nom de fichier.
+
+    Un fichier n'est inspecté que s'il est nouveau ou a changé (taille, date) ;
+    les fichiers ignorés (catégorie ou colonnes non reconnues) sont inclus avec
+    categorie=None.
+    """
+    registry = os.path.join(cache_dir, "registry.json")
+    try:
+        names = sorted(n for n in os.listdir(data_dir) if n.lower().endswith(".csv"))
+    except FileNotFoundError:
+        names = []
+    with _lock:
+        if registry not in _known:
+            _known[registry] = _load_registry(registry)
+        known = _known[registry]
+        specs, changed = {}, False
+        for name in names:
+            path = os.path.join(data_dir, name)
+            st = os.stat(path)
+            spec = known.get(name)
+            if spec is None or spec.signature != [st.st_size, st.st_mtime_ns]:
+                spec, changed = inspect(path, categories), True
+            specs[name] = spec
+        if changed or set(specs) != set(known):
+            _known[registry] = specs
+            _save_registry(registry, specs)
+    return list(specs.values())
+
+
+def read(spec: CsvSpec, data_dir: str, **kwargs):
+    """
+    Lit les seules colonnes utiles d'un CSV, renommées au schéma et typées en
+    chaînes ; kwargs : nrows, chunksize...
+    """
+    frames = pd.read_csv(
+        os.path.join(data_dir, spec.filename), sep=spec.sep, encoding=spec.encoding,
+        usecols=list(spec.columns), dtype={h: "str" for h in spec.columns},
+        on_bad_lines="skip", **kwargs,
+    )
+    if isinstance(frames, pd.DataFrame):
+        return frames.rename(columns=spec.columns)
+    return (chunk.rename(columns=spec.columns) for chunk in frames)
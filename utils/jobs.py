@@ -0,0 +1,294 @@
+"""
+Tâches de scraping en arrière-plan.
+
+Un scraping lancé depuis la page Scraping ne tourne plus dans le thread du
+script Streamlit : il est confié à un pool de threads partagé par le
+processus. Chaque tâche a un identifiant ; son état, sa progression et ses
+lignes sont écrits dans SQLite (tables jobs et job_rows) au fil des pages,
+ce qui permet de suivre, annuler ou récupérer une tâche depuis n'importe
+quelle session, même après avoir quitté la page.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.cache import get_page_cache
+from utils.database import (
+    COLUMNS, DB_PATH, get_connection, init_db, load_known_keys, save_scraped_data,
+)
+from utils.datasets import load_neardup_index
+from utils.images import image_hashes
+from utils.metrics import METRICS
+from utils.neardup import NearDupIndex
+from utils.render import get_renderer_pool
+from utils.scraper import BASE_URL, FetchStats, iter_scrape
+
+MAX_JOBS = 2      # tâches exécutées en parallèle (chacune a ses propres workers HTTP)
+KEEP_JOBS = 50    # tâches terminées conservées en base
+
+ACTIVE = ("queued", "running")
+ACTIVE_SQL = "status IN (?, ?)"   # paramètres : ACTIVE
+STATUS_LABELS = {
+    "queued":    "En attente",
+    "running":   "En cours",
+    "done":      "Terminée",
+    "cancelled": "Annulée",
+    "failed":    "Échec",
+}
+
+
+def init_jobs(conn: sqlite3.Connection) -> None:
+    """Crée les tables jobs / job_rows."""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id      TEXT PRIMARY KEY,
+            categorie   TEXT NOT NULL,
+            pages       INTEGER NOT NULL,
+            options     TEXT NOT NULL,
+            status      TEXT NOT NULL,
+            pages_done  INTEGER NOT NULL DEFAULT 0,
+            rows        INTEGER NOT NULL DEFAULT 0,
+            stats       TEXT,
+            saved       TEXT,
+            error       TEXT,
+            created_at  REAL NOT NULL,
+            started_at  REAL,
+            finished_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS job_rows (
+            job_id     TEXT NOT NULL,
+            page       INTEGER NOT NULL,
+            categorie  TEXT,
+            nom        TEXT,
+            prix       TEXT,
+            adresse    TEXT,
+            image_lien TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_rows_job ON job_rows(job_id);
+    """)
+
+
+class JobManager:
+    """
+    Exécute les scrapings dans un pool de threads et les suit dans SQLite.
+
+    Args:
+        db_path  : base SQLite (la même que les annonces)
+        max_jobs : nombre de tâches simultanées
+    """
+
+    def __init__(self, db_path: str = DB_PATH, max_jobs: int = MAX_JOBS):
+        self.db_path = db_path
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="scrape-job")
+        self._cancel: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._conn = get_connection(db_path)
+        init_db(self._conn)
+        init_jobs(self._conn)
+        # Tâches d'un processus précédent restées actives : elles ne reprendront pas
+        with self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrompue (redémarrage)', "
+                f"finished_at = ? WHERE {ACTIVE_SQL}",
+                (time.time(), *ACTIVE),
+            )
+
+    # ── Lecture ──
+
+    def _query(self, sql: str, params=()) -> pd.DataFrame:
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def list_jobs(self, limit: int = 20) -> pd.DataFrame:
+        """Dernières tâches, plus récentes d'abord."""
+        return self._query(
+            "SELECT job_id, categorie, pages, status, pages_done, rows, created_at, finished_at "
+            "FROM jobs ORDER BY created_at DESC LIMIT ?",
+            (limit,),
+        )
+
+    def status(self, job_id: str) -> dict | None:
+        """État complet d'une tâche (options, stats et sauvegarde décodées)."""
+        df = self._query("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        if df.empty:
+            return None
+        job = df.iloc[0].to_dict()
+        for col in ("options", "stats", "saved"):
+            job[col] = json.loads(job[col]) if isinstance(job[col], str) else None
+        return job
+
+    def results(self, job_id: str) -> pd.DataFrame:
+        """Lignes collectées par une tâche (partielles si elle est en cours)."""
+        return self._query(
+            f"SELECT {', '.join(COLUMNS)} FROM job_rows WHERE job_id = ? ORDER BY rowid",
+            (job_id,),
+        )
+
+    def has_active(self) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT 1 FROM jobs WHERE {ACTIVE_SQL} LIMIT 1", ACTIVE
+            ).fetchone() is not None
+
+    # ── Commandes ──
+
+    def submit(self, slug: str, pages: int, offline: bool = False,
+               incremental: bool = False, auto_save: bool = True,
+               base_url: str = BASE_URL, render: bool = False,
+               near_dedupe: bool = True) -> str:
+        """
+        Lance un scraping en arrière-plan et retourne son identifiant.
+
+        Args:
+            offline     : rejouer uniquement les pages en cache
+            incremental : ne garder que les annonces absentes de la base
+            auto_save   : sauvegarder les annonces en base à la fin de la tâche
+            base_url    : racine du site (serveur local pour les benchmarks)
+            render      : rendre les pages incomplètes dans le pool de navigateurs
+                          partagé (voir utils.render)
+            near_dedupe : écarter les quasi-doublons des annonces en base et de
+                          la tâche (voir utils.neardup)
+        """
+        job_id = uuid.uuid4().hex[:12]
+        options = {"offline": offline, "incremental": incremental, "auto_save": auto_save,
+                   "base_url": base_url, "render": render, "near_dedupe": near_dedupe}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, categorie, pages, options, status, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, slug, pages, json.dumps(options), time.time()),
+            )
+            self._prune()
+        self._cancel[job_id] = threading.Event()
+        self._pool.submit(self._run, job_id, slug, pages, **options)
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Demande l'arrêt d'une tâche : une tâche en attente ne démarre pas, une
+        tâche en cours s'arrête à la fin de la page en cours.
+        """
+        event = self._cancel.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def save(self, job_id: str) -> dict:
+        """Sauvegarde en base les lignes d'une tâche (bouton « Sauvegarder »)."""
+        df = self.results(job_id)
+        with self._lock:
+            res = save_scraped_data(df, self._conn)
+            with self._conn:
+                self._conn.execute("UPDATE jobs SET saved = ? WHERE job_id = ?",
+                                   (json.dumps(res), job_id))
+        return res
+
+    def _prune(self) -> None:
+        old = f"""
+            SELECT job_id FROM jobs WHERE NOT {ACTIVE_SQL}
+            ORDER BY created_at DESC LIMIT -1 OFFSET ?
+        """
+        self._conn.execute(f"DELETE FROM job_rows WHERE job_id IN ({old})", (*ACTIVE, KEEP_JOBS))
+        self._conn.execute(f"DELETE FROM jobs WHERE job_id IN ({old})", (*ACTIVE, KEEP_JOBS))
+
+    # ── Exécution (thread du pool) ──
+
+    def _run(self, job_id: str, slug: str, pages: int, offline: bool,
+             incremental: bool, auto_save: bool, base_url: str, render: bool,
+             near_dedupe: bool) -> None:
+        cancel = self._cancel[job_id]
+        if cancel.is_set():
+            # Annulée avant de démarrer : aucune connexion, aucune requête
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE job_id = ?",
+                    (time.time(), job_id),
+                )
+            self._cancel.pop(job_id, None)
+            return
+        conn = get_connection(self.db_path)
+        stats = FetchStats()
+        status, error, saved = "done", None, None
+        start, t0 = time.time(), time.perf_counter()
+        try:
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE job_id = ?",
+                         (time.time(), job_id))
+            conn.commit()
+            known_keys = load_known_keys(conn, slug) if incremental else None
+            neardup = NearDupIndex(parent=load_neardup_index(self.db_path),
+                                   image_hashes=image_hashes) if near_dedupe else None
+            if cancel.is_set():
+                # Annulée pendant la préparation : la première page n'est pas demandée
+                status = "cancelled"
+            else:
+                batches = iter_scrape(slug, pages, base_url=base_url, stats=stats,
+                                      cache=get_page_cache(offline=offline),
+                                      known_keys=known_keys,
+                                      renderer=get_renderer_pool() if render else None,
+                                      neardup=neardup)
+                try:
+                    for done, (page, batch) in enumerate(batches, start=1):
+                        self._record_page(conn, job_id, page, done, batch, stats)
+                        if cancel.is_set():
+                            status = "cancelled"
+                            break
+                finally:
+                    batches.close()
+
+            if auto_save and status == "done":
+                rows = pd.read_sql_query(
+                    f"SELECT {', '.join(COLUMNS)} FROM job_rows WHERE job_id = ?",
+                    conn, params=(job_id,),
+                )
+                saved = save_scraped_data(rows, conn)
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, stats = ?, saved = ?, finished_at = ? "
+                "WHERE job_id = ?",
+                (status, error, json.dumps(stats.as_dict()),
+                 json.dumps(saved) if saved is not None else None, time.time(), job_id),
+            )
+            conn.commit()
+            conn.close()
+            self._cancel.pop(job_id, None)
+            # Erreur attrapée ci-dessus : la mesure est enregistrée à la main
+            s = stats.as_dict()
+            METRICS.record("scrape_job", time.perf_counter() - t0, error, {
+                "job_id": job_id, "categorie": slug, "pages": pages, "status": status,
+                "requests": s["requests"], "failed_pages": len(s["failed_pages"]),
+            }, start)
+
+    @staticmethod
+    def _record_page(conn: sqlite3.Connection, job_id: str, page: int, done: int,
+                     batch: list[dict], stats: FetchStats) -> None:
+        """Écrit les lignes d'une page et la progression dans une même transaction."""
+        with conn:
+            conn.executemany(
+                f"INSERT INTO job_rows (job_id, page, {', '.join(COLUMNS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(COLUMNS))})",
+                [(job_id, page, *(row.get(col) for col in COLUMNS)) for row in batch],
+            )
+            conn.execute(
+                "UPDATE jobs SET pages_done = ?, rows = rows + ?, stats = ? WHERE job_id = ?",
+                (done, len(batch), json.dumps(stats.as_dict()), job_id),
+            )
+
+
+_managers: dict[str, JobManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_job_manager(db_path: str = DB_PATH) -> JobManager:
+    """Gestionnaire de tâches unique par base, partagé par toutes les sessions."""
+    with _managers_lock:
+        if db_path not in _managers:
+            _managers[db_path] = JobManager(db_path)
+        return _managers[db_path]
@@ -0,0 +1,163 @@
+"""
+Mesures de temps des chemins critiques (scraping, sauvegarde, chargements).
+
+    with span("fetch", categorie=slug):
+        ...
+
+Chaque span ajoute sa durée à un histogramme par nom (compteur, erreurs,
+somme, seaux cumulés façon Prometheus) et un événement au journal récent.
+Les compteurs s'exportent en texte Prometheus ou en JSON lines ; la page
+Diagnostics les affiche. Avec la variable d'environnement
+COINAFRIQUE_METRICS_LOG, chaque événement est aussi ajouté à ce fichier JSONL.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Seaux de l'histogramme (secondes), bornes supérieures incluses
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RECENT_EVENTS = 2000     # événements gardés pour la page Diagnostics
+RECENT_DURATIONS = 500   # durées gardées par span pour p50 / p95
+
+# Spans qui représentent une exécution complète (« runs » de la page Diagnostics)
+RUN_SPANS = ("scrape_categorie", "scrape_job", "crawl")
+
+PREFIX = "coinafrique"
+
+
+class _SpanStats:
+    __slots__ = ("count", "errors", "total", "buckets", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # dernier seau : +Inf
+        self.recent = deque(maxlen=RECENT_DURATIONS)
+
+
+class Metrics:
+    """
+    Registre des spans, partagé par les threads du processus.
+
+    Args:
+        log_path : fichier JSONL où ajouter chaque événement (optionnel)
+    """
+
+    def __init__(self, log_path: str | None = None):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._spans: dict[str, _SpanStats] = {}
+        self._events: deque = deque(maxlen=RECENT_EVENTS)
+
+    def record(self, name: str, seconds: float, error: str | None = None,
+               labels: dict | None = None, start: float | None = None) -> None:
+        """Ajoute une mesure (utilisé par span ; appelable directement)."""
+        event = {"span": name, "start": start or time.time() - seconds,
+                 "seconds": round(seconds, 6), "ok": error is None,
+                 "error": error, **(labels or {})}
+        bucket = next((i for i, le in enumerate(BUCKETS) if seconds <= le), len(BUCKETS))
+        line = json.dumps(event, default=str) + "\n" if self.log_path else None
+        with self._lock:
+            stats = self._spans.setdefault(name, _SpanStats())
+            stats.count += 1
+            stats.errors += error is not None
+            stats.total += seconds
+            stats.buckets[bucket] += 1
+            stats.recent.append(seconds)
+            self._events.append(event)
+            # Sous le verrou : les lignes des threads concurrents ne s'entremêlent pas
+            if line:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Mesure le bloc ; une exception est comptée comme erreur puis propagée.
+
+        Le dict de labels est renvoyé et peut être complété dans le bloc.
+        """
+        start, t0 = time.time(), time.perf_counter()
+        try:
+            yield labels
+        except BaseException as e:
+            self.record(name, time.perf_counter() - t0, f"{type(e).__name__}: {e}", labels, start)
+            raise
+        self.record(name, time.perf_counter() - t0, None, labels, start)
+
+    # ── Lecture ──
+
+    def summary(self) -> list[dict]:
+        """Une ligne par span : count, errors, error_rate, mean, p50, p95, max (s)."""
+        rows = []
+        with self._lock:
+            items = [(name, s.count, s.errors, s.total, sorted(s.recent))
+                     for name, s in self._spans.items()]
+        for name, count, errors, total, recent in sorted(items):
+            def pct(q):
+                return recent[min(len(recent) - 1, int(q * len(recent)))] if recent else 0.0
+            rows.append({
+                "span": name, "count": count, "errors": errors,
+                "error_rate": errors / count if count else 0.0,
+                "mean": total / count if count else 0.0,
+                "p50": pct(0.50), "p95": pct(0.95), "max": recent[-1] if recent else 0.0,
+            })
+        return rows
+
+    def histogram(self, name: str) -> list[tuple[str, int]]:
+        """Seaux non cumulés d'un span : [(borne, nombre)]."""
+        with self._lock:
+            stats = self._spans.get(name)
+            counts = list(stats.buckets) if stats else [0] * (len(BUCKETS) + 1)
+        labels = [f"≤ {le:g} s" for le in BUCKETS] + [f"> {BUCKETS[-1]:g} s"]
+        return list(zip(labels, counts))
+
+    def events(self, spans=None, limit: int | None = None) -> list[dict]:
+        """Événements récents, plus récents d'abord (filtrés par nom de span)."""
+        with self._lock:
+            events = list(self._events)
+        events = [e for e in reversed(events) if spans is None or e["span"] in spans]
+        return events[:limit] if limit else events
+
+    # ── Export ──
+
+    def to_prometheus(self) -> str:
+        """Format texte d'exposition Prometheus (histogramme + compteur d'erreurs par span)."""
+        lines = [
+            f"# HELP {PREFIX}_span_seconds Durée des spans instrumentés.",
+            f"# TYPE {PREFIX}_span_seconds histogram",
+        ]
+        errors = [
+            f"# HELP {PREFIX}_span_errors_total Spans terminés par une exception.",
+            f"# TYPE {PREFIX}_span_errors_total counter",
+        ]
+        with self._lock:
+            items = sorted((name, s.count, s.errors, s.total, list(s.buckets))
+                           for name, s in self._spans.items())
+        for name, count, nb_errors, total, buckets in items:
+            cumul = 0
+            for le, n in zip([f"{b:g}" for b in BUCKETS] + ["+Inf"], buckets):
+                cumul += n
+                lines.append(f'{PREFIX}_span_seconds_bucket{{span="{name}",le="{le}"}} {cumul}')
+            lines.append(f'{PREFIX}_span_seconds_sum{{span="{name}"}} {total:.6f}')
+            lines.append(f'{PREFIX}_span_seconds_count{{span="{name}"}} {count}')
+            errors.append(f'{PREFIX}_span_errors_total{{span="{name}"}} {nb_errors}')
+        return "\n".join(lines + errors) + "\n"
+
+    def to_jsonl(self) -> str:
+        """Événements récents, un objet JSON par ligne (ordre chronologique)."""
+        return "".join(json.dumps(e, default=str) + "\n" for e in reversed(self.events()))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._events.clear()
+
+
+METRICS = Metrics(os.environ.get("COINAFRIQUE_METRICS_LOG"))
+span = METRICS.span
+
@@ -0,0 +1,288 @@
+"""
+Détection des quasi-doublons d'annonces (MinHash + LSH).
+
+Deux annonces sont des quasi-doublons si elles ont le même prix et des
+nom + adresse normalisés presque identiques (similarité de Jaccard estimée
+≥ THRESHOLD sur les trigrammes du nom et les mots de l'adresse) : titre
+retouché, « Pantalon  homme » / « pantalon homme »…
+
+L'identifiant d'image (identifiant CoinAfrique de l'annonce) départage :
+même identifiant, même annonce (clé d'annonce identique) ; deux identifiants
+différents ne suffisent pas au texte. Les titres sont des types d'article
+(« Ensemble homme ») : sur le texte seul, près de la moitié des annonces Web
+Scraper seraient fusionnées à tort. Une annonce republiée (nouvel
+identifiant) est reconnue à son image : dHash (utils.images) à au plus
+PHASH_DISTANCE bits de l'original, en plus du texte et du prix. Les
+empreintes viennent de la colonne image_phash ou de la fonction
+`image_hashes` de l'index ; sans empreinte, deux identifiants différents
+restent deux annonces.
+
+L'index est incrémental : chaque lot est signé (MinHash vectorisé numpy),
+puis comparé aux seules annonces qui partagent un seau LSH avec lui, jamais
+à toute la base. Seule la première annonce d'un groupe est indexée ; les
+suivantes sont signalées comme doublons.
+"""
+import hashlib
+import re
+import threading
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils.normalize import IMAGE_ID, clean_text, listing_keys, on_uniques
+
+NUM_PERM = 64         # fonctions de hachage MinHash
+BANDS = 16            # bandes LSH de NUM_PERM / BANDS valeurs (seuil de candidature ≈ 0,5)
+THRESHOLD = 0.8       # similarité estimée minimale pour un doublon
+CHUNK_SHINGLES = 200_000   # trigrammes hachés par passe numpy (mémoire bornée)
+PHASH_DISTANCE = 7    # bits d'écart au plus entre les images d'une annonce republiée
+# Seaux d'images : un par octet du dHash. Deux empreintes à ≤ 7 bits d'écart ont au
+# moins un octet identique sur 8 (tiroirs) : aucune paire proche n'est manquée.
+PHASH_BANDS = 8
+
+_PRIME = 4_294_967_311    # premier > 2**32 : (a·h + b) tient sur 64 bits
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, 2 ** 31, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64)
+_NON_DIGIT = re.compile(r"\D")
+
+
+def shingles(nom, adresse) -> set[str]:
+    """Trigrammes du nom normalisé et mots de l'adresse (préfixés « @ »)."""
+    text = f" {clean_text(nom)} "
+    grams = {text[i:i + 3] for i in range(max(1, len(text) - 2))}
+    return grams | {"@" + word for word in clean_text(adresse).split()}
+
+
+def _minhash(sets: list[set[str]]) -> np.ndarray:
+    sig = np.empty((len(sets), NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < len(sets):
+        # Lignes jusqu'à CHUNK_SHINGLES trigrammes, hachés en une seule passe
+        stop, total = start, 0
+        while stop < len(sets) and (total == 0 or total + len(sets[stop]) <= CHUNK_SHINGLES):
+            total += len(sets[stop])
+            stop += 1
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for rows in sets[start:stop] for s in rows),
+            dtype=np.uint64, count=total,
+        )
+        offsets = np.cumsum([0] + [len(s) for s in sets[start:stop - 1]])
+        values = (_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME
+        sig[start:stop] = np.minimum.reduceat(values, offsets, axis=1).T
+        start = stop
+    return sig
+
+
+def signatures(df: pd.DataFrame) -> np.ndarray:
+    """Signatures MinHash (n, NUM_PERM) en uint32 des colonnes nom / adresse."""
+    # Titres et adresses se répètent : une signature par couple distinct
+    codes, uniques = pd.factorize(pd.MultiIndex.from_arrays(
+        [df["nom"].astype("string"), df["adresse"].astype("string")]))
+    sig = _minhash([shingles(nom, adresse) for nom, adresse in uniques])
+    return sig[codes]
+
+
+def price_keys(prix: pd.Series) -> list[str]:
+    """Prix comparables : chiffres seuls ("45 000 CFA" -> "45000"), sinon texte normalisé."""
+    def parse(uniques):
+        return uniques.map(lambda p: _NON_DIGIT.sub("", p) or clean_text(p), na_action="ignore")
+    return on_uniques(prix, parse).fillna("").tolist()
+
+
+def band_keys(prix: pd.Series, sig: np.ndarray) -> list[list[bytes]]:
+    """
+    Clés LSH de chaque ligne : empreinte du prix + valeurs de la bande.
+
+    Le prix fait partie de la clé : seules les annonces de même prix sont candidates.
+    """
+    codes, uniques = pd.factorize(pd.Series(price_keys(prix)))
+    digests = np.frombuffer(b"".join(
+        hashlib.blake2b(p.encode("utf-8"), digest_size=8).digest() for p in uniques
+    ), dtype=np.uint32).reshape(-1, 2)
+    rows = NUM_PERM // BANDS
+    keys = np.empty((len(sig), BANDS, 2 + rows), dtype=np.uint32)
+    keys[:, :, :2] = digests[codes][:, None, :]
+    keys[:, :, 2:] = sig.reshape(len(sig), BANDS, rows)
+    return np.ascontiguousarray(keys).view(f"V{4 * (2 + rows)}")[..., 0].tolist()
+
+
+def price_digests(prix: pd.Series) -> list[bytes]:
+    """Empreinte de 8 octets du prix comparable de chaque ligne."""
+    codes, uniques = pd.factorize(pd.Series(price_keys(prix)))
+    digests = [hashlib.blake2b(p.encode("utf-8"), digest_size=8).digest() for p in uniques]
+    return [digests[c] for c in codes]
+
+
+def phash_band_keys(prix: pd.Series, phashes: list[int | None]) -> list[list[bytes] | None]:
+    """Clés des seaux d'images : prix + rang et valeur de chaque octet du dHash (None sans empreinte)."""
+    keys = []
+    for digest, phash in zip(price_digests(prix), phashes):
+        if phash is None:
+            keys.append(None)
+            continue
+        raw = (phash & (2 ** 64 - 1)).to_bytes(8, "big")
+        keys.append([digest + bytes((i, raw[i])) for i in range(PHASH_BANDS)])
+    return keys
+
+
+def image_ids(df: pd.DataFrame) -> np.ndarray:
+    """Identifiants d'annonce tirés des URLs d'image (-1 si absent)."""
+    images = df["image_lien"] if "image_lien" in df else pd.Series(pd.NA, index=df.index)
+    ids = images.astype("string").str.extract(IMAGE_ID, expand=False)
+    return pd.to_numeric(ids, errors="coerce").fillna(-1).astype("int64").to_numpy()
+
+
+def _hamming(a: int, b: int) -> int:
+    return ((a ^ b) & (2 ** 64 - 1)).bit_count()
+
+
+class _Row(NamedTuple):
+    bands: list[bytes]           # seaux LSH du texte (prix compris)
+    sig: np.ndarray
+    image: int                   # identifiant d'annonce de l'image, -1 si absent
+    key: str                     # clé d'annonce
+    image_bands: list | None     # seaux d'images (prix compris), None sans empreinte
+    phash: int | None
+
+
+class NearDupIndex:
+    """
+    Index LSH des annonces déjà vues, complété lot par lot.
+
+    Args:
+        threshold    : similarité estimée minimale pour un doublon
+        parent       : index en lecture seule consulté en plus (ex : la base) ;
+                       une annonce de même clé que le parent n'est pas un doublon
+                       mais une mise à jour de la même annonce
+        image_hashes : fonction [urls] -> {url: dHash} pour les images des
+                       annonces identifiées sans colonne image_phash (voir
+                       utils.images.image_hashes) ; None : pas d'empreinte
+    """
+
+    def __init__(self, threshold: float = THRESHOLD, parent: "NearDupIndex | None" = None,
+                 image_hashes=None):
+        self.threshold = threshold
+        self.parent = parent
+        self.image_hashes = image_hashes
+        self._lock = threading.Lock()
+        self._sigs = np.empty((1024, NUM_PERM), dtype=np.uint32)
+        self._phashes = np.zeros(1024, dtype=np.int64)
+        self._size = 0
+        # Seaux du texte séparés selon que l'annonce a un identifiant d'image : une
+        # annonce identifiée n'y est comparée qu'aux annonces sans identifiant ; entre
+        # identifiants différents, seuls les seaux d'images donnent des candidats
+        self._buckets: dict[bool, list[dict[bytes, list[int]]]] = {
+            has_id: [{} for _ in range(BANDS)] for has_id in (False, True)
+        }
+        self._image_buckets: list[dict[bytes, list[int]]] = [{} for _ in range(PHASH_BANDS)]
+        self._keys: set[str] = set()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def _similar(self, candidates: set[int], sig: np.ndarray) -> np.ndarray:
+        found = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = np.count_nonzero(self._sigs[found] == sig, axis=1) / NUM_PERM
+        return found[similarity >= self.threshold]
+
+    def _matches(self, row: _Row) -> bool:
+        """Un représentant indexé proche de `row` (texte, ou texte et image) ; appelant verrouillé."""
+        groups = (False,) if row.image >= 0 else (False, True)
+        candidates = {i for has_id in groups
+                      for band, key in zip(self._buckets[has_id], row.bands)
+                      for i in band.get(key, ())}
+        if candidates and len(self._similar(candidates, row.sig)):
+            return True
+        if row.image_bands is None:
+            return False
+        candidates = {i for band, key in zip(self._image_buckets, row.image_bands)
+                      for i in band.get(key, ())}
+        return bool(candidates) and any(
+            _hamming(int(self._phashes[i]), row.phash) <= PHASH_DISTANCE
+            for i in self._similar(candidates, row.sig)
+        )
+
+    def _insert(self, row: _Row) -> None:
+        if self._size == len(self._sigs):
+            self._sigs = np.concatenate([self._sigs, np.empty_like(self._sigs)])
+            self._phashes = np.concatenate([self._phashes, np.zeros_like(self._phashes)])
+        self._sigs[self._size] = row.sig
+        for band, key in zip(self._buckets[row.image >= 0], row.bands):
+            band.setdefault(key, []).append(self._size)
+        if row.image_bands is not None:
+            self._phashes[self._size] = row.phash
+            for band, key in zip(self._image_buckets, row.image_bands):
+                band.setdefault(key, []).append(self._size)
+        self._size += 1
+
+    def _rows(self, df: pd.DataFrame) -> list[_Row]:
+        """Lignes préparées d'un lot ; empreintes d'image lues ou demandées à image_hashes."""
+        sigs = signatures(df)
+        images = image_ids(df)
+        n = len(df)
+        phashes: list[int | None] = [None] * n
+        if "image_phash" in df:
+            phashes = [None if pd.isna(p) else int(p) for p in df["image_phash"]]
+        if self.image_hashes is not None and "image_lien" in df:
+            links = df["image_lien"].tolist()
+            wanted = [links[i] for i in range(n) if images[i] >= 0 and phashes[i] is None]
+            if wanted:
+                found = self.image_hashes(wanted)
+                phashes = [p if p is not None or images[i] < 0 else found.get(links[i])
+                           for i, p in enumerate(phashes)]
+        return [_Row(*row) for row in zip(
+            band_keys(df["prix"], sigs), sigs, images, listing_keys(df).tolist(),
+            phash_band_keys(df["prix"], phashes), phashes)]
+
+    def match_other(self, rows: list[_Row]) -> np.ndarray:
+        """
+        Masque des lignes préparées proches d'une annonce indexée de clé
+        différente : même clé = même annonce (mise à jour), pas un doublon.
+        L'index n'est pas modifié.
+        """
+        with self._lock:
+            return np.array([row.key not in self._keys and self._matches(row) for row in rows],
+                            dtype=bool)
+
+    def query(self, df: pd.DataFrame) -> np.ndarray:
+        """Masque des lignes proches d'une annonce indexée (l'index n'est pas modifié)."""
+        if df.empty:
+            return np.zeros(0, dtype=bool)
+        rows = self._rows(df)
+        with self._lock:
+            return np.array([self._matches(row) for row in rows], dtype=bool)
+
+    def add(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Indexe un lot (colonnes nom, prix, adresse, image_lien, et image_phash
+        si connue) et retourne le masque de ses quasi-doublons : lignes proches
+        d'une annonce déjà vue (index, parent ou ligne précédente du lot) ou de
+        même clé que l'une d'elles dans cet index.
+        """
+        if df.empty:
+            return np.zeros(0, dtype=bool)
+        # Empreintes demandées hors verrou (téléchargements possibles)
+        rows = self._rows(df)
+        if self.parent is not None:
+            in_parent = self.parent.match_other(rows)
+        else:
+            in_parent = np.zeros(len(df), dtype=bool)
+        dup = np.zeros(len(df), dtype=bool)
+        with self._lock:
+            for i, row in enumerate(rows):
+                dup[i] = in_parent[i] or row.key in self._keys or self._matches(row)
+                if not dup[i]:
+                    self._insert(row)
+                self._keys.add(row.key)
+        return dup
+
+
+def near_duplicates(df: pd.DataFrame, threshold: float = THRESHOLD) -> np.ndarray:
+    """Masque des quasi-doublons d'un DataFrame (la première annonce de chaque groupe est gardée)."""
+    return NearDupIndex(threshold).add(df)
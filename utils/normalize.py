@@ -0,0 +1,135 @@
+"""
+Normalisation des annonces : identifiant stable, prix numérique, découpage
+de l'adresse.
+"""
+import hashlib
+import re
+
+import pandas as pd
+
+# https://images.coinafrique.com/thumb_5206275_uploaded_image1_1740684650.jpg -> 5206275
+IMAGE_ID = re.compile(r"/(?:thumb_)?(\d+)_uploaded_image")
+_SPACES = re.compile(r"\s+")
+
+
+def image_id(image_lien: str | None) -> str | None:
+    """Identifiant CoinAfrique de l'annonce extrait de l'URL de son image."""
+    if not isinstance(image_lien, str):
+        return None
+    match = IMAGE_ID.search(image_lien)
+    return match.group(1) if match else None
+
+
+def clean_text(value) -> str:
+    """Texte comparable : minuscules, espaces réduits ; "" si manquant."""
+    if value is None or value is pd.NA or value != value:  # None, <NA>, NaN
+        return ""
+    return _SPACES.sub(" ", str(value)).strip().lower()
+
+
+def listing_key_from(nom, prix, adresse, image_lien) -> str:
+    """
+    Clé stable d'une annonce.
+
+    "img:<id>" si l'URL de l'image contient l'identifiant de l'annonce, sinon
+    "h:<sha1>" calculé sur nom, prix et adresse normalisés (casse, espaces).
+    """
+    img = image_id(image_lien)
+    if img:
+        return f"img:{img}"
+    text = "|".join(clean_text(value) for value in (nom, prix, adresse))
+    return "h:" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+def listing_keys(df: pd.DataFrame) -> pd.Series:
+    """Version vectorisée de listing_key_from pour un DataFrame d'annonces."""
+    images = df["image_lien"] if "image_lien" in df else pd.Series(pd.NA, index=df.index)
+    keys = "img:" + images.astype("string").str.extract(IMAGE_ID, expand=False)
+    missing = keys.isna()
+    if missing.any():
+        sub = df.loc[missing].reindex(columns=["nom", "prix", "adresse"])
+        # clean_text sur les valeurs distinctes seulement, puis un sha1 par ligne
+        cleaned = [
+            on_uniques(sub[col], lambda u: u.map(clean_text, na_action=None).astype(object))
+            .fillna("").tolist()
+            for col in ("nom", "prix", "adresse")
+        ]
+        keys = keys.astype(object)
+        keys[missing] = [
+            "h:" + hashlib.sha1(f"{n}|{p}|{a}".encode("utf-8")).hexdigest()[:20]
+            for n, p, a in zip(*cleaned)
+        ]
+    return keys.astype(object)
+
+
+def listing_key(row: dict) -> str:
+    """Clé stable d'une annonce à partir d'une ligne (voir listing_key_from)."""
+    return listing_key_from(row.get("nom"), row.get("prix"), row.get("adresse"),
+                            row.get("image_lien"))
+
+
+# Colonnes ajoutées par normalize_annonces
+NORMALIZED_COLUMNS = ["prix_num", "quartier", "ville", "pays"]
+
+# "Quartier, Ville, Pays" ; quartier et ville optionnels, alignés à droite
+_ADRESSE = (
+    r"^\s*(?:(?:(?P<quartier>.*?)\s*,\s*)?(?P<ville>[^,]*?)\s*,\s*)?"
+    r"(?P<pays>[^,]*?)\s*$"
+)
+
+
+def on_uniques(values: pd.Series, parse) -> pd.DataFrame | pd.Series:
+    """
+    Applique `parse` aux seules valeurs distinctes puis redistribue le résultat.
+
+    Prix et adresses se répètent énormément (quelques centaines de valeurs
+    distinctes pour des dizaines de milliers d'annonces).
+    """
+    codes, uniques = pd.factorize(values.astype("string"))
+    parsed = parse(pd.Series(uniques, dtype="string"))
+    taken = parsed.reindex(codes)  # code -1 (valeur manquante) -> ligne vide
+    taken.index = values.index
+    return taken
+
+
+def prix_to_int(prix: pd.Series) -> pd.Series:
+    """
+    Prix affichés -> entiers nullables (Int64), sans boucle Python.
+
+    "45 000 CFA" -> 45000, "8 000CFA" -> 8000, "Prix sur demande" -> <NA>
+    """
+    def parse(uniques):
+        digits = uniques.str.replace(r"\D", "", regex=True)
+        return pd.to_numeric(digits.mask(digits == ""), errors="coerce").astype("Int64")
+
+    return on_uniques(prix, parse)
+
+
+def split_adresses(adresse: pd.Series) -> pd.DataFrame:
+    """
+    Découpe les adresses en colonnes quartier, ville, pays.
+
+    "Ngor, Dakar, Sénégal" -> Ngor | Dakar | Sénégal
+    "Dakar, Sénégal"       -> <NA> | Dakar | Sénégal
+    "Sénégal"              -> <NA> | <NA>  | Sénégal
+    """
+    def parse(uniques):
+        parts = uniques.str.extract(_ADRESSE)
+        return parts.mask(parts == "")
+
+    return on_uniques(adresse, parse)
+
+
+def normalize_annonces(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ajoute prix_num (Int64), quartier, ville et pays à un DataFrame d'annonces.
+
+    À appeler une fois à l'ingestion (scraping, chargement CSV) : les pages
+    lisent ensuite ces colonnes au lieu de re-parser prix et adresses.
+    """
+    df = df.copy()
+    prix = df["prix"] if "prix" in df else pd.Series(pd.NA, index=df.index)
+    adresse = df["adresse"] if "adresse" in df else pd.Series(pd.NA, index=df.index)
+    df["prix_num"] = prix_to_int(prix)
+    df[["quartier", "ville", "pays"]] = split_adresses(adresse)
+    return df
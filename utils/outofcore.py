@@ -0,0 +1,183 @@
+"""
+Mode hors mémoire : normalisation → nettoyage → agrégation par blocs.
+
+Les chargeurs en mémoire (load_all, load_scraped…) gardent toutes les lignes
+dans un DataFrame. Quand les données dépassent le budget mémoire, les pages
+passent par ce module : les CSV (ou leur Parquet canonique s'il est à jour)
+et la base sont lus par blocs de CHUNK_ROWS lignes, chaque bloc est
+normalisé, nettoyé (usable) puis réduit en cube partiel, et les cubes
+partiels sont fusionnés. Le cube est additif : le résultat est celui de
+build_cube(usable(load_all())), donc les mêmes métriques et figures.
+
+Mémoire : un bloc, le cube (une ligne par catégorie × localité × prix) et,
+si on écarte les quasi-doublons, l'index LSH des annonces uniques.
+"""
+import hashlib
+import itertools
+import os
+
+import pandas as pd
+
+from utils.aggregates import build_cube, merge_cubes, usable
+from utils.database import get_connection, iter_annonces
+from utils.datasets import (
+    CANONICAL_COLUMNS, DB_PATH, CsvSpec, dataset_version, fresh_parquet, read_columns, resolve,
+    source_path, specs, to_canonical,
+)
+from utils.neardup import NearDupIndex
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # sans pyarrow : blocs lus depuis les CSV
+    pq = None
+
+ENV = "COINAFRIQUE_OUT_OF_CORE"              # "1" force le mode, "0" le désactive
+BUDGET_ENV = "COINAFRIQUE_MEMORY_BUDGET_MB"
+MEMORY_BUDGET_MB = 1024
+EXPANSION = 3          # octets en mémoire par octet de CSV (mesuré par bench.bench_outofcore)
+CHUNK_ROWS = 50_000
+MERGE_EVERY = 8        # blocs entre deux fusions des cubes partiels
+
+
+def source_bytes(db_path: str = DB_PATH, avec_base: bool = True) -> int:
+    """Taille sur disque des CSV Web Scraper (et de la base si `avec_base`)."""
+    paths = [source_path(spec) for spec in specs().values()]
+    if avec_base:
+        paths.append(db_path)
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+def enabled(db_path: str = DB_PATH, avec_base: bool = True) -> bool:
+    """
+    Mode hors mémoire : forcé par COINAFRIQUE_OUT_OF_CORE, sinon choisi quand
+    la taille estimée en mémoire dépasse COINAFRIQUE_MEMORY_BUDGET_MB.
+    """
+    forced = os.environ.get(ENV, "").strip().lower()
+    if forced in ("1", "true", "yes", "on"):
+        return True
+    if forced in ("0", "false", "no", "off"):
+        return False
+    budget = float(os.environ.get(BUDGET_ENV) or MEMORY_BUDGET_MB) * 2 ** 20
+    return source_bytes(db_path, avec_base) * EXPANSION > budget
+
+
+# ── Sources par blocs ──
+
+def iter_dataset(key: "str | CsvSpec", chunk_rows: int = CHUNK_ROWS):
+    """Blocs d'un CSV au schéma canonique, depuis le Parquet s'il est à jour."""
+    spec = resolve(key)
+    parquet = fresh_parquet(spec, "canonical") if pq is not None else None
+    if parquet:
+        for batch in pq.ParquetFile(parquet).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+    for chunk in read_columns(spec, chunksize=chunk_rows):
+        yield to_canonical(chunk, spec)
+
+
+def iter_webscraper(unique: bool = False, chunk_rows: int = CHUNK_ROWS):
+    """
+    Blocs de tous les CSV, dans l'ordre de load_all.
+
+    Avec `unique`, les quasi-doublons sont écartés au fil de l'eau : l'index
+    traite les lignes dans l'ordre, le résultat est celui de load_all_unique.
+    """
+    index = NearDupIndex() if unique else None
+    for spec in specs().values():
+        for chunk in iter_dataset(spec, chunk_rows):
+            if index is not None:
+                chunk = chunk[~index.add(chunk)].reset_index(drop=True)
+            yield chunk
+
+
+def iter_scraped(db_path: str = DB_PATH, chunk_rows: int = CHUNK_ROWS):
+    """Blocs de la base au schéma canonique, sur une connexion propre au parcours."""
+    if not os.path.exists(db_path):
+        return
+    conn = get_connection(db_path)
+    try:
+        for chunk in iter_annonces(conn, chunk_rows, columns=CANONICAL_COLUMNS):
+            yield chunk.astype({"prix_num": "Int64"})
+    finally:
+        conn.close()
+
+
+def iter_sources(unique: bool = False, avec_base: bool = False, db_path: str = DB_PATH,
+                 chunk_rows: int = CHUNK_ROWS):
+    """Blocs des données du dashboard : CSV Web Scraper, puis la base si `avec_base`."""
+    sources = [iter_webscraper(unique, chunk_rows)]
+    if avec_base:
+        sources.append(iter_scraped(db_path, chunk_rows))
+    return itertools.chain.from_iterable(sources)
+
+
+def sources_version(unique: bool = False, avec_base: bool = False, filters: tuple = (),
+                    db_path: str = DB_PATH) -> str:
+    """
+    Version des données d'iter_sources (CSV, base et son WAL) sans les lire,
+    pour nommer un export ; `filters` : valeurs des filtres appliqués.
+    """
+    parts = [f"{key}_{dataset_version(spec)}" for key, spec in specs().items()]
+    parts += [str(unique), *map(str, filters)]
+    if avec_base:
+        for path in (db_path, db_path + "-wal"):
+            if os.path.exists(path):
+                st = os.stat(path)
+                parts.append(f"{st.st_size}_{st.st_mtime_ns}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+# ── Agrégats ──
+
+def stream_cube(chunks) -> pd.DataFrame:
+    """Cube (catégorie, localité, prix) -> nb des blocs, identique à build_cube(usable(...))."""
+    cube, partials = None, []
+    for chunk in chunks:
+        partials.append(build_cube(usable(chunk)))
+        if len(partials) >= MERGE_EVERY:
+            cube, partials = merge_cubes(*([cube] if cube is not None else []), *partials), []
+    if partials:
+        cube = merge_cubes(*([cube] if cube is not None else []), *partials)
+    if cube is None:
+        return build_cube(usable(pd.DataFrame(columns=CANONICAL_COLUMNS)))
+    return cube
+
+
+def stream_totals(chunks) -> dict:
+    """{"total", "prix_count", "prix_sum"} des blocs (lignes brutes, comme get_stats)."""
+    total = count = somme = 0
+    for chunk in chunks:
+        prix = chunk["prix_num"].dropna()
+        total += len(chunk)
+        count += len(prix)
+        somme += int(prix.astype("int64").sum())
+    return {"total": total, "prix_count": count, "prix_sum": somme}
+
+
+def stream_rows(chunks, categories=None, prix_min: int | None = None,
+                prix_max: int | None = None, limit: int | None = None):
+    """
+    Lignes nettoyées (usable) filtrées comme FilterIndex.select, bloc par bloc.
+
+    Args:
+        categories         : slugs à garder (None = toutes)
+        prix_min, prix_max : bornes incluses sur le prix numérique
+        limit              : arrêt du parcours après `limit` lignes (None = tout)
+    """
+    for chunk in chunks:
+        chunk = usable(chunk)
+        keep = pd.Series(True, index=chunk.index)
+        if categories is not None:
+            keep &= chunk["categorie"].isin(list(categories))
+        if prix_min is not None:
+            keep &= chunk["prix_num"] >= prix_min
+        if prix_max is not None:
+            keep &= chunk["prix_num"] <= prix_max
+        chunk = chunk[keep.to_numpy(dtype=bool)]
+        if limit is not None:
+            chunk = chunk.head(limit)
+            limit -= len(chunk)
+        if len(chunk):
+            yield chunk.reset_index(drop=True)
+        if limit == 0:
+            return
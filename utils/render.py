@@ -0,0 +1,185 @@
+"""
+Rendu navigateur des pages incomplètes (images chargées en différé, contenu JS).
+
+Le scraper télécharge d'abord chaque page en HTTP simple ; seules les pages
+dont l'extraction paraît incomplète (voir needs_render) sont confiées à un
+pool de moteurs de rendu headless gardés ouverts d'une page à l'autre : le
+démarrage du navigateur n'est payé qu'une fois par moteur et au plus `size`
+pages sont rendues en même temps.
+
+Moteur par défaut : Chromium headless via Playwright (optionnel,
+`pip install playwright && playwright install chromium`). Tout objet ayant
+render(url) -> html et close() convient, par exemple le moteur local de
+bench.stub_server.
+"""
+import atexit
+import queue
+import re
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import span
+
+try:
+    from playwright.sync_api import sync_playwright
+except ImportError:  # sans Playwright : pas de rendu navigateur par défaut
+    sync_playwright = None
+
+RENDER_POOL_SIZE = 2     # navigateurs ouverts au plus (= rendus simultanés)
+RENDER_TIMEOUT = 30      # secondes par page
+MIN_IMAGE_RATIO = 0.5    # en dessous, les images différées n'ont pas été résolues
+# Grille des annonces : présente (vide) sur une page construite en JS, absente
+# au-delà de la dernière page d'une catégorie
+CARD_CONTAINER = re.compile(r"""class=["'][^"']*\badcards\b""")
+
+
+def available() -> bool:
+    """Le moteur par défaut (Playwright) est-il installé ?"""
+    return sync_playwright is not None
+
+
+def needs_render(rows: list[dict], html: str | None = None) -> bool:
+    """
+    Extraction HTTP incomplète : aucune annonce (contenu construit en JS) ou
+    moins de MIN_IMAGE_RATIO des annonces avec une image.
+
+    Une page vide sans grille d'annonces (CARD_CONTAINER dans `html`) est
+    au-delà de la dernière page : elle n'est pas rendue.
+    """
+    if not rows:
+        return html is None or CARD_CONTAINER.search(html) is not None
+    with_image = sum(1 for row in rows if row.get("image_lien"))
+    return with_image < MIN_IMAGE_RATIO * len(rows)
+
+
+class PlaywrightRenderer:
+    """
+    Chromium headless gardé ouvert entre les pages.
+
+    L'API synchrone de Playwright est liée au thread qui l'a démarrée : toutes
+    les commandes passent par un thread dédié au moteur.
+    """
+
+    def __init__(self, timeout: float = RENDER_TIMEOUT, user_agent: str | None = None):
+        if sync_playwright is None:
+            raise RuntimeError("Playwright n'est pas installé (pip install playwright)")
+        self.timeout = timeout
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="renderer")
+        self._thread.submit(self._start, user_agent).result()
+
+    def _start(self, user_agent: str | None) -> None:
+        self._playwright = sync_playwright().start()
+        self._browser = self._playwright.chromium.launch(headless=True)
+        self._page = self._browser.new_page(user_agent=user_agent)
+
+    def _render(self, url: str) -> str:
+        self._page.goto(url, wait_until="networkidle", timeout=self.timeout * 1000)
+        # Défilement jusqu'en bas : déclenche le chargement différé des images
+        self._page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        self._page.wait_for_load_state("networkidle", timeout=self.timeout * 1000)
+        return self._page.content()
+
+    def render(self, url: str) -> str:
+        return self._thread.submit(self._render, url).result()
+
+    def close(self) -> None:
+        def stop():
+            self._browser.close()
+            self._playwright.stop()
+        try:
+            self._thread.submit(stop).result()
+        finally:
+            self._thread.shutdown(wait=False)
+
+
+class RendererPool:
+    """
+    Pool borné de moteurs de rendu, créés à la demande et réutilisés.
+
+    Args:
+        factory : fonction sans argument qui démarre un moteur (render / close)
+        size    : nombre maximum de moteurs, donc de rendus simultanés
+    """
+
+    def __init__(self, factory: Callable = PlaywrightRenderer, size: int = RENDER_POOL_SIZE):
+        self.factory = factory
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._renderers: list = []
+        self.started = 0
+        self.rendered = 0
+        self.failures = 0
+
+    def render(self, url: str) -> str:
+        """HTML de la page après exécution du JS ; attend si tous les moteurs sont occupés."""
+        with self._slots:
+            try:
+                renderer = self._idle.get_nowait()
+            except queue.Empty:
+                with span("render_start"):
+                    renderer = self.factory()
+                with self._lock:
+                    self._renderers.append(renderer)
+                    self.started += 1
+            try:
+                with span("render"):
+                    html = renderer.render(url)
+            except Exception:
+                # Moteur dans un état inconnu (crash, délai dépassé) : remplacé au prochain appel
+                self._discard(renderer)
+                raise
+            self._idle.put(renderer)
+            with self._lock:
+                self.rendered += 1
+            return html
+
+    def _discard(self, renderer) -> None:
+        with self._lock:
+            self.failures += 1
+            if renderer in self._renderers:
+                self._renderers.remove(renderer)
+        try:
+            renderer.close()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "open": len(self._renderers), "started": self.started,
+                    "rendered": self.rendered, "failures": self.failures}
+
+    def close(self) -> None:
+        """Ferme tous les moteurs (les rendus en cours doivent être terminés)."""
+        with self._lock:
+            renderers, self._renderers = self._renderers, []
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for renderer in renderers:
+            try:
+                renderer.close()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_pool: RendererPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_renderer_pool() -> RendererPool:
+    """Pool Playwright partagé par le processus, fermé à la sortie."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from utils.scraper import HEADERS  # import tardif : scraper importe ce module
+            _pool = RendererPool(lambda: PlaywrightRenderer(user_agent=HEADERS["User-Agent"]))
+            atexit.register(_pool.close)
+        return _pool
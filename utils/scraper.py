@@ -1,14 +1,41 @@
+import logging
+import random
+import threading
 import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+
+from utils.cache import CacheMiss, PageCache
+from utils.metrics import span
+from utils.neardup import NearDupIndex
+from utils.normalize import listing_key
+from utils.render import RendererPool, needs_render
+
+log = logging.getLogger(__name__)
+
+try:
+    import brotli  # noqa: F401  (active le décodage "br" dans urllib3)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
 
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
         "AppleWebKit/537.36 (KHTML, like Gecko) "
         "Chrome/120.0.0.0 Safari/537.36"
-    )
+    ),
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
 }
 
 BASE_URL = "https://sn.coinafrique.com/categorie/"
@@ -20,84 +47,637 @@ CATEGORIES = {
     "Chaussures Enfants": "chaussures-enfants",
 }
 
+# Parallélisme et politesse par défaut : 4 pages en vol, 4 requêtes/s par hôte
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 4.0
 
-def scrape_page(slug: str, page: int) -> list[dict]:
+# Reprises : 429 et 5xx, backoff exponentiel borné, Retry-After respecté
+TIMEOUT = 15
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
     """
-    Scrape une seule page d'une catégorie CoinAfrique.
+    Limiteur de débit « token bucket », partagé entre threads.
+
+    Le seau se remplit de `rate` jetons par seconde jusqu'à `capacity` ;
+    chaque requête consomme un jeton et attend s'il n'y en a plus.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_rate_limiter(url: str, rate: float = REQUESTS_PER_SECOND) -> TokenBucket:
+    """
+    Retourne le limiteur partagé de l'hôte de `url`.
+
+    Un seau par hôte, toutes tâches confondues : deux appelants à des débits
+    différents (interface et utils.crawl --rate) partagent le même budget, au
+    plus bas des deux débits demandés. Les images ont leur propre hôte, donc
+    leur propre seau.
+    """
+    host = urlsplit(url).netloc
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(rate)
+        elif rate > 0 and (bucket.rate <= 0 or rate < bucket.rate):
+            with bucket._lock:
+                bucket.rate, bucket.capacity = rate, max(1.0, rate)
+                bucket._tokens = min(bucket._tokens, bucket.capacity)
+        return bucket
+
+
+class FetchStats:
+    """Compteurs d'une exécution : requêtes, reprises, octets, latences, échecs."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.bytes = 0                      # corps reçus sur le réseau (compressés)
+        self.latencies: list[float] = []
+        self.failed_pages: list[tuple[str, int]] = []   # (slug, page)
+        self.cache_hits = 0
+        self.not_modified = 0
+        self.duplicates = 0
+        self.near_duplicates = 0
+        self.rendered = 0
+        self._lock = threading.Lock()
+
+    def record_response(self, latency: float, nbytes: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes += nbytes
+            self.latencies.append(latency)
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def record_cache_hit(self, revalidated: bool = False) -> None:
+        with self._lock:
+            if revalidated:
+                self.not_modified += 1
+            else:
+                self.cache_hits += 1
+
+    def record_render(self) -> None:
+        with self._lock:
+            self.rendered += 1
+
+    def record_failure(self, slug: str, page: int) -> None:
+        with self._lock:
+            self.failed_pages.append((slug, page))
+
+    def as_dict(self) -> dict:
+        lat = sorted(self.latencies)
+
+        def pct(q):
+            return round(lat[min(len(lat) - 1, int(q * len(lat)))], 4) if lat else 0.0
+
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "failed_pages": sorted(self.failed_pages),
+            "cache_hits": self.cache_hits,
+            "not_modified": self.not_modified,
+            "duplicates": self.duplicates,
+            "near_duplicates": self.near_duplicates,
+            "rendered": self.rendered,
+            "latency_mean": round(sum(lat) / len(lat), 4) if lat else 0.0,
+            "latency_p50": pct(0.50),
+            "latency_p95": pct(0.95),
+        }
+
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Session HTTP partagée par tout le processus.
+
+    Le pool urllib3 garde les connexions ouvertes (keep-alive) : seule la
+    première requête vers un hôte paie la poignée de main TCP/TLS.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS * 4)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _retry_delay(response: requests.Response | None, attempt: int) -> float:
+    """Délai avant la prochaine tentative : Retry-After sinon backoff exponentiel + jitter."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = BACKOFF_BASE * 2 ** attempt
+        return min(BACKOFF_MAX, max(0.0, delay))
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt * (1 + random.random() / 2))
+
+
+def wire_bytes(response: requests.Response) -> int:
+    """Taille du corps tel que reçu sur le réseau (avant décompression gzip/br)."""
+    size = len(response.content)
+    try:
+        return response.raw.tell()
+    except AttributeError:
+        return size
+
+
+def fetch(url: str, rate: float | None = None, stats: FetchStats | None = None,
+          max_retries: int = MAX_RETRIES, headers: dict | None = None) -> requests.Response:
+    """
+    GET via la session partagée, avec reprises sur 429/5xx et erreurs réseau.
+
+    Chaque tentative passe par le limiteur de l'hôte si `rate` est fourni.
+    Lève l'exception de la dernière tentative si toutes échouent.
+    """
+    session = get_session()
+    for attempt in range(max_retries + 1):
+        if rate is not None:
+            get_rate_limiter(url, rate).acquire()
+        response = None
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, timeout=TIMEOUT)
+            if stats is not None:
+                stats.record_response(time.perf_counter() - start, wire_bytes(response))
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                return response
+            if attempt == max_retries:
+                response.raise_for_status()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+        if stats is not None:
+            stats.record_retry()
+        time.sleep(_retry_delay(response, attempt))
+    raise RuntimeError("unreachable")
+
+
+try:
+    import lxml.html
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# Backends d'extraction :
+#   html.parser : BeautifulSoup + parseur pur Python de la stdlib (référence)
+#   lxml        : lxml.html natif et XPath précompilés, sans arbre BeautifulSoup
+#   strainer    : SoupStrainer (parseur lxml si installé), seules les cartes
+#                 sont construites en arbre
+#   css         : sélecteurs soupsieve précompilés, un passage par carte
+PARSERS = ("html.parser", "lxml", "strainer", "css")
+DEFAULT_PARSER = "lxml" if HAS_LXML else "strainer"
+
+_TREE_BUILDER = "lxml" if HAS_LXML else "html.parser"
+# Carte d'annonce : div portant au moins ces classes, dans n'importe quel ordre,
+# avec espaces superflus ou classes en plus (même règle pour tous les backends)
+CARD_CLASSES = ("col", "s6", "m4", "l3")
+
+
+def is_card_class(value) -> bool:
+    """Valeur de l'attribut class contenant toutes les CARD_CLASSES."""
+    return value is not None and set(CARD_CLASSES) <= set(value.split())
+
+
+_CARD_STRAINER = SoupStrainer("div", class_=is_card_class)
+_SEL_CARD = soupsieve.compile("div" + "".join(f".{name}" for name in CARD_CLASSES))
+_SEL_TITLE = soupsieve.compile("a[title]")
+_SEL_PRIX = soupsieve.compile("p.ad__card-price")
+_SEL_ADRESSE = soupsieve.compile("p.ad__card-location")
+_SEL_IMG = soupsieve.compile("img.ad__card-img")
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+if HAS_LXML:
+    _XP_CARD = etree.XPath(f"//div[{' and '.join(_has_class(c) for c in CARD_CLASSES)}]")
+    _XP_TITLE = etree.XPath(".//a[@title][1]")
+    _XP_PRIX = etree.XPath(f".//p[{_has_class('ad__card-price')}][1]")
+    _XP_ADRESSE = etree.XPath(f".//p[{_has_class('ad__card-location')}][1]")
+    _XP_IMG = etree.XPath(f".//img[{_has_class('ad__card-img')}][1]")
+
+
+class _LxmlNode:
+    """Adapte un élément lxml à l'interface BeautifulSoup utilisée par _card_record."""
+
+    __slots__ = ("el",)
+
+    def __init__(self, el):
+        self.el = el
+
+    def __getitem__(self, attr):
+        return self.el.attrib[attr]
+
+    def get(self, attr, default=None):
+        return self.el.get(attr, default)
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        parts = (t.strip() if strip else t for t in self.el.itertext())
+        return separator.join(t for t in parts if t or not strip)
+
+
+def _lxml_first(xpath, el):
+    found = xpath(el)
+    return _LxmlNode(found[0]) if found else None
+
+
+def _fields_lxml(card) -> tuple:
+    return (_lxml_first(_XP_TITLE, card), _lxml_first(_XP_PRIX, card),
+            _lxml_first(_XP_ADRESSE, card), _lxml_first(_XP_IMG, card))
+
+
+def _fields_css(card) -> tuple:
+    return (_SEL_TITLE.select_one(card), _SEL_PRIX.select_one(card),
+            _SEL_ADRESSE.select_one(card), _SEL_IMG.select_one(card))
+
+
+def _fields_find(card) -> tuple:
+    return (card.find("a", title=True),
+            card.find("p", class_="ad__card-price"),
+            card.find("p", class_="ad__card-location"),
+            card.find("img", class_="ad__card-img"))
+
+
+def _card_record(slug: str, a_tag, prix_el, adr_el, img_el) -> dict | None:
+    """Construit la ligne d'une carte à partir de ses éléments (None si incomplète)."""
+    nom = a_tag["title"].strip() if a_tag else ""
+    prix = prix_el.get_text(strip=True) if prix_el else ""
+    adresse = (
+        adr_el.get_text(separator=" ", strip=True)
+        .replace("location_on", "")
+        .strip()
+        if adr_el
+        else ""
+    )
+    # Image différée : src est un espace réservé (data:…), la vraie URL est dans data-src
+    src = (img_el.get("src") or "") if img_el else ""
+    image_lien = (
+        ((src if not src.startswith("data:") else "") or img_el.get("data-src") or "")
+        if img_el
+        else ""
+    )
+    if not (nom and prix):
+        return None
+    return {
+        "categorie": slug,
+        "nom": nom,
+        "prix": prix,
+        "adresse": adresse,
+        "image_lien": image_lien,
+    }
+
+
+def extract_annonces(html: str, slug: str, parser: str = DEFAULT_PARSER) -> list[dict]:
+    """
+    Extrait les annonces d'une page de catégorie.
+
+    Args:
+        html  : contenu de la page
+        slug  : identifiant de la catégorie
+        parser: backend d'extraction, voir PARSERS (résultat identique pour tous)
 
     Returns:
         list[dict] avec les clés : categorie, nom, prix, adresse, image_lien
     """
-    url = f"{BASE_URL}{slug}?page={page}"
-    data = []
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        containers = soup.find_all("div", class_="col s6 m4 l3")
+    if parser not in PARSERS or (parser == "lxml" and not HAS_LXML):
+        raise ValueError(f"Backend indisponible : {parser!r} (attendu : {', '.join(PARSERS)})")
+
+    # parse : construction de l'arbre et sélection des cartes ; extract : champs
+    with span("parse", parser=parser):
+        if parser == "lxml":
+            containers, fields = _XP_CARD(lxml.html.fromstring(html)), _fields_lxml
+        elif parser == "css":
+            containers, fields = _SEL_CARD.select(BeautifulSoup(html, _TREE_BUILDER)), _fields_css
+        else:
+            if parser == "strainer":
+                soup = BeautifulSoup(html, _TREE_BUILDER, parse_only=_CARD_STRAINER)
+            else:
+                soup = BeautifulSoup(html, "html.parser")
+            containers, fields = soup.find_all("div", class_=is_card_class), _fields_find
 
+    data = []
+    with span("extract", parser=parser) as labels:
         for container in containers:
             try:
-                a_tag = container.find("a", title=True)
-                nom = a_tag["title"].strip() if a_tag else ""
-
-                prix_el = container.find("p", class_="ad__card-price")
-                prix = prix_el.get_text(strip=True) if prix_el else ""
-
-                adr_el = container.find("p", class_="ad__card-location")
-                adresse = (
-                    adr_el.get_text(separator=" ", strip=True)
-                    .replace("location_on", "")
-                    .strip()
-                    if adr_el
-                    else ""
-                )
-
-                img_el = container.find("img", class_="ad__card-img")
-                image_lien = (
-                    (img_el.get("src") or img_el.get("data-src") or "")
-                    if img_el
-                    else ""
-                )
-
-                if nom and prix:
-                    data.append({
-                        "categorie": slug,
-                        "nom": nom,
-                        "prix": prix,
-                        "adresse": adresse,
-                        "image_lien": image_lien,
-                    })
+                record = _card_record(slug, *fields(container))
             except Exception:
                 continue
+            if record:
+                data.append(record)
+        labels["rows"] = len(data)
+    return data
+
+
+def _render_rows(url: str, slug: str, html: str, parser: str,
+                 renderer: RendererPool | None, stats: FetchStats | None) -> list[dict]:
+    """Extrait la page, repassée par le navigateur si l'extraction HTTP est incomplète."""
+    rows = extract_annonces(html, slug, parser)
+    if renderer is None or not needs_render(rows, html):
+        return rows
+    try:
+        rendered = extract_annonces(renderer.render(url), slug, parser)
+    except Exception:
+        if not rows:
+            raise
+        return rows  # rendu impossible : on garde les lignes HTTP, même partielles
+    if stats is not None:
+        stats.record_render()
+    return rendered if len(rendered) >= len(rows) else rows
+
+
+def _fetch_rows(url: str, slug: str, rate: float | None, stats: FetchStats | None,
+                cache: PageCache | None, parser: str,
+                renderer: RendererPool | None = None) -> list[dict]:
+    """Télécharge et parse une page, en passant par le cache s'il est fourni."""
+    if cache is None:
+        with span("fetch", categorie=slug):
+            response = fetch(url, rate=rate, stats=stats)
+        return _render_rows(url, slug, response.text, parser, renderer, stats)
+
+    entry = cache.get(url)
+    if entry is not None and (cache.offline or entry.is_fresh(cache.ttl)):
+        if stats is not None:
+            stats.record_cache_hit()
+        return entry.rows if entry.rows is not None else extract_annonces(entry.text, slug, parser)
+    if cache.offline:
+        raise CacheMiss(f"{url} absente du cache (mode hors-ligne)")
+
+    with span("fetch", categorie=slug) as labels:
+        response = fetch(url, rate=rate, stats=stats,
+                         headers=entry.validators() if entry is not None else None)
+        labels["status"] = response.status_code
+    if response.status_code == 304 and entry is not None:
+        cache.touch(url)
+        if stats is not None:
+            stats.record_cache_hit(revalidated=True)
+        return entry.rows if entry.rows is not None else extract_annonces(entry.text, slug, parser)
+
+    rows = _render_rows(url, slug, response.text, parser, renderer, stats)
+    cache.put(url, response.content, rows,
+              etag=response.headers.get("ETag"),
+              last_modified=response.headers.get("Last-Modified"))
+    return rows
+
+
+def scrape_page(slug: str, page: int, base_url: str = BASE_URL,
+                rate: float | None = None, stats: FetchStats | None = None,
+                cache: PageCache | None = None, parser: str = DEFAULT_PARSER,
+                renderer: RendererPool | None = None) -> list[dict]:
+    """
+    Scrape une seule page d'une catégorie CoinAfrique.
+
+    La page est téléchargée en HTTP simple ; si l'extraction paraît incomplète
+    (voir utils.render.needs_render) et qu'un `renderer` est fourni, elle est
+    rendue par un navigateur headless du pool.
+
+    Args:
+        slug    : identifiant de la catégorie
+        page    : numéro de page
+        base_url: racine des URLs de catégorie (serveur de test possible)
+        rate    : requêtes/s autorisées sur l'hôte (None = pas de limite)
+        stats   : compteurs de l'exécution en cours (optionnel)
+        cache   : cache disque des pages (GET conditionnel, mode hors-ligne)
+        parser  : backend d'extraction, voir PARSERS
+        renderer: pool de rendu navigateur pour les pages incomplètes (optionnel)
 
+    Returns:
+        list[dict] avec les clés : categorie, nom, prix, adresse, image_lien
+    """
+    url = f"{base_url}{slug}?page={page}"
+    try:
+        # L'erreur est enregistrée par le span (page Diagnostics) avant d'être absorbée
+        with span("scrape_page", categorie=slug, page=page) as labels:
+            rows = _fetch_rows(url, slug, rate, stats, cache, parser, renderer)
+            labels["rows"] = len(rows)
+        return rows
     except Exception as e:
-        print(f"  [!] Erreur page {page} ({slug}) : {e}")
+        log.warning("Erreur page %s (%s) : %s", page, slug, e)
+        if stats is not None:
+            stats.record_failure(slug, page)
+        return []
 
-    return data
 
+def row_key(row: dict) -> int:
+    """Empreinte d'une ligne pour le dédoublonnage incrémental (toutes colonnes)."""
+    return hash(tuple(row.values()))
+
+
+def iter_pages(tasks: Iterable[tuple[str, int]], workers: int = MAX_WORKERS,
+               rate: float = REQUESTS_PER_SECOND, base_url: str = BASE_URL,
+               cache: PageCache | None = None, parser: str = DEFAULT_PARSER,
+               stats: FetchStats | None = None, lookahead: int | None = None,
+               renderer: RendererPool | None = None) -> Iterator[tuple[str, int, list[dict]]]:
+    """
+    Exécute des tâches (slug, page) sur un pool borné et produit leurs lignes.
+
+    Les tâches sont téléchargées en parallèle mais produites dans l'ordre
+    d'entrée ; au plus `lookahead` (2 × `workers` par défaut) tâches sont en
+    vol ou en attente, la mémoire reste donc constante quel que soit le
+    nombre de pages. Fermer le générateur annule les tâches non commencées.
 
-def scrape_categorie(slug: str, nb_pages: int = 9, progress_callback=None) -> pd.DataFrame:
+    Yields:
+        (slug, page, lignes de la page)
+    """
+    task_iter = iter(tasks)
+    window = lookahead or 2 * max(1, workers)
+    pending: dict = {}
+    ready: dict[tuple[str, int], list[dict]] = {}
+    order: deque[tuple[str, int]] = deque()
+    pool = ThreadPoolExecutor(max_workers=max(1, workers))
+
+    def submit_next() -> bool:
+        task = next(task_iter, None)
+        if task is None:
+            return False
+        slug, page = task
+        pending[pool.submit(scrape_page, slug, page, base_url, rate, stats, cache, parser,
+                            renderer)] = task
+        order.append(task)
+        return True
+
+    try:
+        while len(pending) < window and submit_next():
+            pass
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                ready[pending.pop(future)] = future.result()
+            while order and order[0] in ready:
+                task = order.popleft()
+                yield task[0], task[1], ready.pop(task)
+            while len(pending) + len(ready) < window and submit_next():
+                pass
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def dedupe_rows(rows: list[dict], seen: set[int]) -> list[dict]:
+    """Retire les lignes dont l'empreinte est déjà dans `seen` (mis à jour sur place)."""
+    batch = []
+    for row in rows:
+        key = row_key(row)
+        if key not in seen:
+            seen.add(key)
+            batch.append(row)
+    return batch
+
+
+def iter_scrape(slug: str, pages: int | Iterable[int] = 9,
+                workers: int = MAX_WORKERS, rate: float = REQUESTS_PER_SECOND,
+                base_url: str = BASE_URL, cache: PageCache | None = None,
+                parser: str = DEFAULT_PARSER, stats: FetchStats | None = None,
+                seen: set[int] | None = None, known_keys: set[str] | None = None,
+                renderer: RendererPool | None = None,
+                neardup: NearDupIndex | None = None) -> Iterator[tuple[int, list[dict]]]:
+    """
+    Scrape une catégorie page par page et produit les lignes au fil de l'eau.
+
+    Les pages sont produites dans l'ordre dès qu'elles sont prêtes (voir
+    iter_pages). Les doublons déjà vus (toutes colonnes identiques) sont
+    retirés au passage via un ensemble d'empreintes, puis les quasi-doublons
+    si un index `neardup` est fourni (voir utils.neardup).
+
+    Mode incrémental (`known_keys` fourni) : seules les annonces dont la clé
+    (voir utils.normalize.listing_key) est inconnue sont produites, et le
+    parcours s'arrête à la première page entièrement connue. Une seule page
+    est préchargée d'avance pour limiter les requêtes inutiles.
+
+    Args:
+        slug      : identifiant de la catégorie
+        pages     : nombre de pages (1..pages) ou itérable de numéros de page
+        seen      : ensemble d'empreintes partagé (dédoublonnage sur plusieurs appels)
+        known_keys: clés des annonces déjà en base (complété au fil du parcours)
+        neardup   : index des quasi-doublons, complété au fil du parcours
+        autres arguments : voir scrape_categorie
+
+    Yields:
+        (page, lignes nouvelles de la page)
+    """
+    numbers = range(1, pages + 1) if isinstance(pages, int) else pages
+    seen = set() if seen is None else seen
+    tasks = ((slug, page) for page in numbers)
+    lookahead = 2 if known_keys is not None else None
+    for _, page, rows in iter_pages(tasks, workers=workers, rate=rate, base_url=base_url,
+                                    cache=cache, parser=parser, stats=stats,
+                                    lookahead=lookahead, renderer=renderer):
+        with span("dedupe", categorie=slug):
+            batch = dedupe_rows(rows, seen)
+            if stats is not None:
+                stats.duplicates += len(rows) - len(batch)
+            if neardup is not None and batch:
+                near = neardup.add(pd.DataFrame(batch))
+                batch = [row for row, dup in zip(batch, near) if not dup]
+                if stats is not None:
+                    stats.near_duplicates += int(near.sum())
+            if known_keys is not None:
+                keys = [listing_key(row) for row in batch]
+                batch = [row for row, key in zip(batch, keys) if key not in known_keys]
+                known_keys.update(keys)
+        if known_keys is not None and rows and not batch:
+            yield page, batch
+            return
+        yield page, batch
+
+
+def scrape_categorie(slug: str, nb_pages: int = 9, progress_callback=None,
+                     workers: int = MAX_WORKERS, rate: float = REQUESTS_PER_SECOND,
+                     base_url: str = BASE_URL, return_stats: bool = False,
+                     cache: PageCache | None = None, parser: str = DEFAULT_PARSER,
+                     known_keys: set[str] | None = None,
+                     renderer: RendererPool | None = None,
+                     neardup: NearDupIndex | None = None):
     """
     Scrape toutes les pages d'une catégorie.
 
+    Les pages sont téléchargées en parallèle par `workers` threads, sous un
+    débit limité à `rate` requêtes/s pour l'hôte. Les lignes sont remises dans
+    l'ordre des pages : le résultat est identique à un parcours séquentiel.
+    Pour traiter les lignes au fil de l'eau, utiliser iter_scrape.
+
     Args:
         slug             : identifiant de la catégorie
         nb_pages         : nombre de pages à scraper
-        progress_callback: fonction(page, total) appelée après chaque page
+        progress_callback: fonction(page, total) appelée après chaque page,
+                           toujours depuis le thread appelant (compatible Streamlit)
+        workers          : nombre de pages téléchargées simultanément (1 = séquentiel)
+        rate             : requêtes/s maximum vers l'hôte
+        base_url         : racine des URLs de catégorie
+        return_stats     : renvoie aussi les compteurs réseau de l'exécution
+        cache            : cache disque des pages (voir utils.cache)
+        parser           : backend d'extraction, voir PARSERS
+        known_keys       : active le mode incrémental (voir iter_scrape) ; seules
+                           les annonces nouvelles sont renvoyées
+        renderer         : pool de rendu navigateur pour les pages incomplètes
+                           (voir utils.render)
+        neardup          : index des quasi-doublons à écarter (voir utils.neardup)
 
     Returns:
-        pd.DataFrame
+        pd.DataFrame, ou (pd.DataFrame, dict) si return_stats
     """
-    all_data = []
-    for page in range(1, nb_pages + 1):
-        rows = scrape_page(slug, page)
-        all_data.extend(rows)
-        if progress_callback:
-            progress_callback(page, nb_pages)
-        time.sleep(1)
+    stats = FetchStats()
+    start = time.perf_counter()
+    all_data, done = [], 0
+    with span("scrape_categorie", categorie=slug, pages=nb_pages) as labels:
+        batches = iter_scrape(slug, nb_pages, workers=workers, rate=rate, base_url=base_url,
+                              cache=cache, parser=parser, stats=stats, known_keys=known_keys,
+                              renderer=renderer, neardup=neardup)
+        for done, (_, rows) in enumerate(batches, start=1):
+            all_data.extend(rows)
+            if progress_callback:
+                progress_callback(done, nb_pages)
+        labels.update(rows=len(all_data), failed_pages=len(stats.failed_pages))
+
+    if progress_callback and done < nb_pages:
+        progress_callback(nb_pages, nb_pages)
 
     df = pd.DataFrame(all_data)
-    if not df.empty:
-        df = df.drop_duplicates().reset_index(drop=True)
+    if return_stats:
+        return df, {"pages": done, "duration": round(time.perf_counter() - start, 3),
+                    **stats.as_dict()}
     return df